@@ -0,0 +1,21 @@
+import os
+import shutil
+from 批量转换 import batch_convert, AUTO_DETECT
+from 分组检测 import GROUP_SAMPLES
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'gbk')
+
+def test_short_gbk_files_infer_group_encoding(tmp_path):
+    # 每个文件只有一行几十字节的 GBK 文本，chardet 的置信度都在 0.5 以下
+    src = tmp_path / 'src'
+    shutil.copytree(FIXTURES, src)
+    file_paths = sorted(str(path) for path in src.iterdir())
+    results = list(batch_convert(file_paths, AUTO_DETECT, 'utf-8', str(tmp_path / 'out'), workers=1,
+                                 group_detect=True))
+    assert all(result['success'] for result in results)
+    samples, rest = results[:GROUP_SAMPLES], results[GROUP_SAMPLES:]
+    assert all(result['tier'] == 'chardet' and result['confidence'] < 0.5 for result in samples)
+    assert rest and all(result['tier'] == 'group' for result in rest)
+    for result in results:
+        with open(result['file'], 'rb') as f, open(result['output'], 'rb') as out:
+            assert out.read().decode('utf-8') == f.read().decode('gbk')
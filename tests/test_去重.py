@@ -0,0 +1,36 @@
+import os
+from 去重 import HashCache, DEDUP_LINK, file_hash
+from 增量转换 import content_hash
+from 重命名 import METHOD_HARDLINK
+from 重命名计划 import plan_rename
+
+def test_duplicate_target_becomes_hardlink(tmp_path):
+    (tmp_path / 'a.txt').write_text('相同的内容')
+    (tmp_path / 'a.log').write_text('相同的内容')
+    (tmp_path / 'b.txt').write_text('B')
+    (tmp_path / 'b.log').write_text('不同的内容')
+    file_paths = [str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')]
+    plan = plan_rename(file_paths, ['.txt'], '.log', dedup=DEDUP_LINK, cache_path=str(tmp_path / 'cache.db'))
+    results = {os.path.basename(result['file']): result for result in plan.apply()}
+    assert results['a.txt']['method'] == METHOD_HARDLINK and results['a.txt']['error'] is None
+    assert results['a.txt']['output'] == str(tmp_path / 'a.log')
+    assert os.path.samefile(tmp_path / 'a.txt', tmp_path / 'a.log')
+    # 内容不同的已有文件不动，新文件换一个名字
+    assert results['b.txt']['output'] != str(tmp_path / 'b.log')
+    assert (tmp_path / 'b.log').read_text() == '不同的内容'
+    assert not os.path.samefile(tmp_path / 'b.txt', tmp_path / 'b.log')
+
+def test_hash_cache_invalidated_when_file_changes(tmp_path):
+    cache = HashCache(str(tmp_path / 'cache.db'))
+    path = tmp_path / 'a.txt'
+    path.write_text('旧内容')
+    digest = file_hash(str(path), cache)
+    assert cache.get(str(path)) == digest
+    path.write_text('新的内容')
+    assert cache.get(str(path)) is None
+    assert file_hash(str(path), cache) == content_hash(str(path)) != digest
+    # 大小不变，只有修改时间变化
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert cache.get(str(path)) is None
+    cache.close()
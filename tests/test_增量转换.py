@@ -0,0 +1,69 @@
+import os
+import pytest
+from 批量转换 import batch_convert
+from 文件遍历 import iter_files
+from 流水线转换 import iter_pipeline_convert
+
+def convert(folder, manifest_path, pipeline=False, verify_hash=False):
+    file_paths = iter_files(folder)
+    if pipeline:
+        return list(iter_pipeline_convert(file_paths, 'utf-8', 'utf-16', manifest_path=manifest_path,
+                                          verify_hash=verify_hash))
+    return list(batch_convert(file_paths, 'utf-8', 'utf-16', workers=1, manifest_path=manifest_path,
+                              verify_hash=verify_hash))
+
+def skipped(results):
+    return {os.path.basename(result['file']): result['skipped'] for result in results}
+
+def touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_second_run_in_source_folder_converts_nothing(tmp_path, pipeline):
+    folder = tmp_path / 'src'
+    folder.mkdir()
+    for i in range(3):
+        (folder / f'{i}.txt').write_text(f'第 {i} 行', encoding='utf-8')
+    manifest_path = str(tmp_path / 'manifest.db')
+    first = convert(str(folder), manifest_path, pipeline)
+    assert len(first) == 3 and not any(result['skipped'] for result in first)
+    # 上次的新文件写在源文件旁边，不能再当作源文件
+    second = convert(str(folder), manifest_path, pipeline)
+    assert len(second) == 3 and all(result['skipped'] for result in second)
+    assert len(os.listdir(folder)) == 6
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_changed_source_is_reconverted(tmp_path, pipeline):
+    folder = tmp_path / 'src'
+    folder.mkdir()
+    for name in ('a.txt', 'b.txt'):
+        (folder / name).write_text('旧内容', encoding='utf-8')
+    manifest_path = str(tmp_path / 'manifest.db')
+    convert(str(folder), manifest_path, pipeline)
+    (folder / 'a.txt').write_text('新的内容', encoding='utf-8')
+    assert skipped(convert(str(folder), manifest_path, pipeline)) == {'a.txt': False, 'b.txt': True}
+    assert (folder / 'a_utf-16.txt').read_text(encoding='utf-16') == '新的内容'
+    assert skipped(convert(str(folder), manifest_path, pipeline)) == {'a.txt': True, 'b.txt': True}
+
+def test_modified_output_is_reconverted(tmp_path):
+    folder = tmp_path / 'src'
+    folder.mkdir()
+    (folder / 'a.txt').write_text('内容', encoding='utf-8')
+    manifest_path = str(tmp_path / 'manifest.db')
+    convert(str(folder), manifest_path)
+    (folder / 'a_utf-16.txt').write_text('被改过', encoding='utf-16')
+    assert skipped(convert(str(folder), manifest_path)) == {'a.txt': False}
+    assert (folder / 'a_utf-16.txt').read_text(encoding='utf-16') == '内容'
+
+@pytest.mark.parametrize('verify_hash', [False, True])
+def test_touched_source_with_same_content(tmp_path, verify_hash):
+    folder = tmp_path / 'src'
+    folder.mkdir()
+    (folder / 'a.txt').write_text('内容', encoding='utf-8')
+    manifest_path = str(tmp_path / 'manifest.db')
+    convert(str(folder), manifest_path, verify_hash=verify_hash)
+    # 只有 mtime 变化：比较内容哈希时内容相同仍算最新，否则重新转换
+    touch(folder / 'a.txt')
+    assert skipped(convert(str(folder), manifest_path, verify_hash=verify_hash)) == {'a.txt': verify_hash}
+    assert skipped(convert(str(folder), manifest_path, verify_hash=verify_hash)) == {'a.txt': True}
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import pytest
+from 批量转换 import batch_convert, AUTO_DETECT
+from 分组检测 import GROUP_SAMPLES
+from 文件遍历 import iter_files
+from 流水线转换 import iter_pipeline_convert
+
+def make_tree(tmp_path):
+    for sub, text in (('a', '甲'), ('b', '乙')):
+        folder = tmp_path / 'src' / sub
+        folder.mkdir(parents=True)
+        (folder / 'readme.txt').write_text(text, encoding='gbk')
+    return str(tmp_path / 'src'), str(tmp_path / 'out')
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_recursive_batch_keeps_subfolders_under_output_folder(tmp_path, workers):
+    src, out = make_tree(tmp_path)
+    results = list(batch_convert(iter_files(src), 'gbk', 'utf-8', out, delete_original=True, workers=workers,
+                                 source_roots=[src]))
+    assert all(result['success'] for result in results)
+    with open(os.path.join(out, 'a', 'readme_utf-8.txt'), encoding='utf-8') as f:
+        assert f.read() == '甲'
+    with open(os.path.join(out, 'b', 'readme_utf-8.txt'), encoding='utf-8') as f:
+        assert f.read() == '乙'
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_duplicate_output_path_is_rejected_and_source_kept(tmp_path, pipeline):
+    src, out = make_tree(tmp_path)
+    file_paths = [os.path.join(src, 'a', 'readme.txt'), os.path.join(src, 'b', 'readme.txt')]
+    if pipeline:
+        results = list(iter_pipeline_convert(file_paths, 'gbk', 'utf-8', out, delete_original=True))
+    else:
+        results = list(batch_convert(file_paths, 'gbk', 'utf-8', out, delete_original=True, workers=1))
+    failed = [result for result in results if not result['success']]
+    assert len(failed) == 1
+    # 没有转换的文件不能被删除，先写出的新文件也没有被替换
+    assert os.path.exists(failed[0]['file'])
+    with open(os.path.join(out, 'readme_utf-8.txt'), encoding='utf-8') as f:
+        assert f.read() == ('甲' if failed[0]['file'] == file_paths[1] else '乙')
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_group_inference_waits_for_samples_and_is_not_cached(tmp_path, pipeline):
+    src = tmp_path / 'src'
+    src.mkdir()
+    text = '这是一首关于春天的歌，我们在河边唱歌，风吹过山岗，太阳照在大地上。'
+    for i in range(30):
+        (src / f'{i:02}.txt').write_text(text * (5 + i % 7) + str(i), encoding='gbk')
+    file_paths = sorted(str(path) for path in src.iterdir())
+    out, cache_path = str(tmp_path / 'out'), str(tmp_path / 'cache.db')
+    if pipeline:
+        results = list(iter_pipeline_convert(file_paths, AUTO_DETECT, 'utf-8', out, cache_path=cache_path,
+                                             cpu_threads=4, group_detect=True))
+    else:
+        results = list(batch_convert(file_paths, AUTO_DETECT, 'utf-8', out, workers=4, cache_path=cache_path,
+                                     group_detect=True))
+    tiers = [result['tier'] for result in results]
+    # 样本出结果之前不提交组内其余文件，只有样本需要 chardet
+    assert tiers.count('chardet') == GROUP_SAMPLES
+    assert tiers.count('group') == len(file_paths) - GROUP_SAMPLES
+    with sqlite3.connect(cache_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM detection").fetchone()[0] == GROUP_SAMPLES
@@ -0,0 +1,21 @@
+from 文件遍历 import iter_files
+from 进度 import CancelToken
+
+def make_files(tmp_path, count):
+    for i in range(count):
+        (tmp_path / f'{i}.txt').write_text('')
+
+def test_streaming_yields_same_files(tmp_path):
+    make_files(tmp_path, 20)
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'a.txt').write_text('')
+    assert sorted(iter_files(str(tmp_path), snapshot=False)) == sorted(iter_files(str(tmp_path)))
+
+def test_cancel_stops_between_entries(tmp_path):
+    make_files(tmp_path, 20)
+    cancel = CancelToken()
+    found = []
+    for file_path in iter_files(str(tmp_path), snapshot=False, cancel=cancel):
+        found.append(file_path)
+        cancel.cancel()
+    assert len(found) == 1
@@ -0,0 +1,37 @@
+import os
+from 断点续传 import BatchJournal, TEMP_SUFFIX, START_GROUP
+
+PARAMS = {'op': 'convert'}
+
+def output_for(file_path):
+    return os.path.join(os.path.dirname(file_path), 'out', os.path.basename(file_path))
+
+def test_files_named_like_temp_files_are_still_processed(tmp_path):
+    file_paths = [str(tmp_path / 'movie.part'), str(tmp_path / 'a.txt.1.renaming')]
+    journal = BatchJournal(str(tmp_path / 'journal'), PARAMS)
+    assert list(journal.pending(file_paths)) == file_paths
+    journal.close()
+
+def test_planned_outputs_are_not_sources(tmp_path):
+    sources = [str(tmp_path / f'{i}.txt') for i in range(START_GROUP)]
+    journal = BatchJournal(str(tmp_path / 'journal'), PARAMS)
+
+    def walk():
+        yield from sources
+        # 输出文件夹在遍历的源文件夹中，之后遍历到本批次已交出的文件的新文件（及其临时文件）
+        yield output_for(sources[0])
+        yield output_for(sources[0]) + TEMP_SUFFIX
+
+    assert list(journal.pending(walk(), output_for)) == sources
+    journal.close()
+
+def test_resume_skips_own_outputs_and_temp_files(tmp_path):
+    source = str(tmp_path / 'a.txt')
+    journal_file = str(tmp_path / 'journal')
+    journal = BatchJournal(journal_file, PARAMS)
+    list(journal.pending([source], output_for))
+    journal.close()
+    journal = BatchJournal(journal_file, PARAMS, resume=True)
+    other = str(tmp_path / 'b.txt.part')
+    assert list(journal.pending([output_for(source) + TEMP_SUFFIX, source, other])) == [source, other]
+    journal.close()
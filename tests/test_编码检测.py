@@ -0,0 +1,21 @@
+from 编码转换 import detect_encoding_tiered, TIER_ASCII, TIER_UTF8, BUDGET_UTF8_CONFIDENCE
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_ascii_within_budget(tmp_path):
+    path = write(tmp_path, 'a.txt', b'hello world\n' * 100)
+    assert detect_encoding_tiered(path, max_bytes=4096) == ('ascii', 1.0, TIER_ASCII)
+
+def test_non_ascii_after_budget_is_not_reported_as_ascii(tmp_path):
+    # 前 4096 字节都是 ASCII，之后才出现 UTF-8 中文
+    path = write(tmp_path, 'log.txt', b'a' * 4096 + '中文日志\n'.encode('utf-8'))
+    encoding, confidence, tier = detect_encoding_tiered(path, chunk_size=1024, max_bytes=4096)
+    assert (encoding, tier) == ('utf-8', TIER_UTF8)
+    assert confidence == BUDGET_UTF8_CONFIDENCE
+
+def test_file_exactly_at_budget_is_fully_checked(tmp_path):
+    path = write(tmp_path, 'a.txt', b'a' * 4096)
+    assert detect_encoding_tiered(path, max_bytes=4096) == ('ascii', 1.0, TIER_ASCII)
@@ -0,0 +1,47 @@
+import os
+import pytest
+from 编码缓存 import DetectionCache
+from 编码转换 import detect_encoding_tiered, TIER_CACHE
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DetectionCache(str(tmp_path / 'cache.db'))
+    yield cache
+    cache.close()
+
+def write(path, text):
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+def test_unchanged_file_hits_cache(tmp_path, cache):
+    file_path = write(tmp_path / 'a.txt', '中文内容')
+    first = detect_encoding_tiered(file_path, cache=cache)
+    assert first[2] != TIER_CACHE
+    assert detect_encoding_tiered(file_path, cache=cache) == (first[0], first[1], TIER_CACHE)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+def test_cache_survives_reopen(tmp_path, cache):
+    file_path = write(tmp_path / 'a.txt', '中文内容')
+    detect_encoding_tiered(file_path, cache=cache)
+    cache.close()
+    reopened = DetectionCache(cache.db_path)
+    assert detect_encoding_tiered(file_path, cache=reopened)[2] == TIER_CACHE
+    reopened.close()
+
+def test_size_change_misses_cache(tmp_path, cache):
+    file_path = write(tmp_path / 'a.txt', 'ascii')
+    detect_encoding_tiered(file_path, cache=cache)
+    write(tmp_path / 'a.txt', 'ascii 之后加上中文')
+    encoding, _, tier = detect_encoding_tiered(file_path, cache=cache)
+    assert tier != TIER_CACHE and encoding == 'utf-8'
+    assert cache.misses == 2
+
+def test_mtime_change_misses_cache(tmp_path, cache):
+    file_path = write(tmp_path / 'a.txt', '中文')
+    detect_encoding_tiered(file_path, cache=cache)
+    st = os.stat(file_path)
+    # 大小不变，只有修改时间变化
+    os.utime(file_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert cache.get(file_path) is None
+    assert detect_encoding_tiered(file_path, cache=cache)[2] != TIER_CACHE
+    assert detect_encoding_tiered(file_path, cache=cache)[2] == TIER_CACHE
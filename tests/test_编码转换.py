@@ -0,0 +1,43 @@
+import io
+import codecs
+import pytest
+from 编码转换 import transcode_stream, detect_encoding_tiered, TIER_BOM
+
+TEXT = '第一行中文\n第二行：编码转换测试。\n'
+
+def transcode(data, src_encoding, target_encoding, chunk_size):
+    out = io.BytesIO()
+    transcode_stream(io.BytesIO(data), out, src_encoding, target_encoding, chunk_size=chunk_size, strict=True)
+    return out.getvalue()
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 4096])
+def test_multibyte_sequence_split_across_chunks(chunk_size):
+    # GBK 每个汉字两字节、UTF-8 三字节，小块时多字节序列必然被拆在块边界上
+    assert transcode(TEXT.encode('gbk'), 'gbk', 'utf-8', chunk_size) == TEXT.encode('utf-8')
+    assert transcode(TEXT.encode('utf-8'), 'utf-8', 'gbk', chunk_size) == TEXT.encode('gbk')
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 4096])
+def test_source_bom_is_dropped(chunk_size):
+    data = codecs.BOM_UTF8 + TEXT.encode('utf-8')
+    assert transcode(data, 'utf-8', 'gbk', chunk_size) == TEXT.encode('gbk')
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 4096])
+def test_target_bom_is_written_once(chunk_size):
+    data = codecs.BOM_UTF8 + TEXT.encode('utf-8')
+    output = transcode(data, 'utf-8', 'utf-16', chunk_size)
+    assert output == TEXT.encode('utf-16')
+    assert output.decode('utf-16') == TEXT
+
+@pytest.mark.parametrize('encoding, bom', [('utf-8-sig', codecs.BOM_UTF8), ('utf-16', codecs.BOM_UTF16_LE),
+                                           ('utf-16', codecs.BOM_UTF16_BE), ('utf-32', codecs.BOM_UTF32_LE)])
+def test_bom_detection(tmp_path, encoding, bom):
+    path = tmp_path / 'bom.txt'
+    body = TEXT.encode({codecs.BOM_UTF8: 'utf-8', codecs.BOM_UTF16_LE: 'utf-16-le',
+                        codecs.BOM_UTF16_BE: 'utf-16-be', codecs.BOM_UTF32_LE: 'utf-32-le'}[bom])
+    path.write_bytes(bom + body)
+    detected, confidence, tier = detect_encoding_tiered(str(path))
+    assert (detected, confidence, tier) == (encoding, 1.0, TIER_BOM)
+    with open(path, 'rb') as f:
+        out = io.BytesIO()
+        transcode_stream(f, out, detected, 'utf-8', chunk_size=3)
+    assert out.getvalue() == TEXT.encode('utf-8')
@@ -0,0 +1,41 @@
+import random
+import pytest
+from 重命名 import SuffixMatcher
+
+def linear_match(file_name, src_exts):
+    """逐个比较的旧实现：按长度降序尝试每个后缀，去掉开头的点号后不区分大小写比较"""
+    for ext in sorted(src_exts, key=len, reverse=True):
+        check_ext = ext[1:] if ext.startswith('.') else ext
+        if file_name.lower().endswith(check_ext.lower()):
+            return check_ext or None
+    return None
+
+SUFFIX_LISTS = [
+    ['txt'],
+    ['.txt', '_utf-8.txt'],
+    ['.TXT', '.txt', 'Txt'],
+    ['.tar.gz', 'gz', '.GZ', 'tar.gz'],
+    ['.log', '.', '.txt.log'],
+    ['.', '.txt'],
+    ['.中文', '文', '.md'],
+]
+NAMES = ['a.txt', 'A.TXT', 'b_utf-8.txt', 'b_UTF-8.TXT', 'txt', 'c.tar.gz', 'c.TAR.GZ', 'd.gz', 'e.txt.log',
+         'f.log', 'g.中文', 'h文', 'README', '.txt', 'x', '']
+
+@pytest.mark.parametrize('src_exts', SUFFIX_LISTS)
+def test_matches_linear_check(src_exts):
+    matcher = SuffixMatcher(src_exts)
+    for name in NAMES:
+        assert matcher.match(name) == linear_match(name, src_exts), name
+
+def test_matches_linear_check_on_random_inputs():
+    rng = random.Random(0)
+    alphabet = 'aAbB.中_'
+
+    def word(max_length):
+        return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length)))
+
+    for _ in range(2000):
+        src_exts = [word(4) for _ in range(rng.randint(1, 5))]
+        name = word(8)
+        assert SuffixMatcher(src_exts).match(name) == linear_match(name, src_exts), (name, src_exts)
@@ -0,0 +1,24 @@
+import os
+import sqlite3
+import pytest
+from 重命名规则 import RenameRule, plan_rule_rename
+
+def test_superscript_digits_are_not_formatted_as_numbers(tmp_path):
+    # '²'、'①' 的 isdigit 为 True，但不能用 int 转换
+    rule = RenameRule(r'^(\w+)\.', '{1:03}{ext}')
+    assert rule.new_name(str(tmp_path / '①.txt')) == '①00.txt'
+    assert rule.new_name(str(tmp_path / 'x².txt')) == 'x²0.txt'
+    assert rule.new_name(str(tmp_path / '7.txt')) == '007.txt'
+
+def test_superscript_field_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RenameRule('', '{²}')
+
+def test_encoding_field_uses_given_cache(tmp_path):
+    (tmp_path / 'a.txt').write_text('hello', encoding='utf-8')
+    cache_path = str(tmp_path / 'cache.db')
+    plan = plan_rule_rename([str(tmp_path / 'a.txt')], RenameRule('', '{name}_{encoding}{ext}'),
+                            cache_path=cache_path)
+    assert os.path.basename(plan.outputs[0]) == 'a_ascii.txt'
+    with sqlite3.connect(cache_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM detection").fetchone()[0] == 1
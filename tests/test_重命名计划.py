@@ -0,0 +1,94 @@
+import os
+import threading
+import pytest
+from 断点续传 import BatchJournal
+from 重命名计划 import plan_rename, build_plan
+from 重命名规则 import RenameRule, plan_rule_rename
+
+PARAMS = {'op': 'swap'}
+
+def interrupted_cycle(tmp_path, second_step):
+    """模拟 a.txt <-> b.txt 循环改名在 a.txt 改成临时名字后（second_step 为 True 时 b.txt 也已改为 a.txt 后）崩溃"""
+    a, b = str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')
+    for path, text in ((a, 'A'), (b, 'B')):
+        with open(path, 'w') as f:
+            f.write(text)
+    journal_file = str(tmp_path / 'journal')
+    journal = BatchJournal(journal_file, PARAMS, delete_original=True)
+    list(journal.pending([a, b]))
+    temp_path = a + '.1.renaming'
+    journal.record_temp(a, temp_path, b)
+    os.replace(a, temp_path)
+    if second_step:
+        os.replace(b, a)
+    journal.close()
+    return a, b, temp_path, BatchJournal(journal_file, PARAMS, resume=True, delete_original=True)
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+def test_resume_rolls_back_cycle_stopped_on_temp_name(tmp_path):
+    a, b, temp_path, journal = interrupted_cycle(tmp_path, second_step=False)
+    assert not os.path.exists(temp_path)
+    assert read(a) == 'A' and read(b) == 'B'
+    # 撤回后两个文件都要重新处理
+    assert list(journal.pending([a, b, temp_path])) == [a, b]
+    journal.close()
+
+def test_resume_finishes_cycle_when_target_is_free(tmp_path):
+    a, b, temp_path, journal = interrupted_cycle(tmp_path, second_step=True)
+    assert not os.path.exists(temp_path)
+    assert read(a) == 'B' and read(b) == 'A'
+    assert a in journal.completed
+    journal.close()
+
+def test_target_equal_to_source_is_skipped(tmp_path):
+    (tmp_path / 'a.txt').write_text('A')
+    (tmp_path / 'b.txt').write_text('B')
+    file_paths = [str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')]
+    for plan in (plan_rename(file_paths, ['.txt'], '.txt', delete_original=True, cache_path=None),
+                 plan_rule_rename(file_paths, RenameRule(case='lower'), delete_original=True, cache_path=None)):
+        results = list(plan.apply())
+        assert all(result['skipped'] and result['error'] is None for result in results)
+    assert sorted(os.listdir(tmp_path)) == ['a.txt', 'b.txt']
+
+@pytest.mark.parametrize('ignore_case', [False, True], ids=['posix', 'nocase'])
+def test_case_only_rename(tmp_path, monkeypatch, ignore_case):
+    if ignore_case:
+        # 模拟 Windows 上的路径比较，大小写不同的文件名视为同一个文件
+        monkeypatch.setattr(os.path, 'normcase', str.lower)
+        monkeypatch.setattr(os.path, 'lexists', lambda path: os.path.basename(path).lower() in (
+            name.lower() for name in os.listdir(os.path.dirname(path))))
+    (tmp_path / 'A.TXT').write_text('A')
+    plan = plan_rule_rename([str(tmp_path / 'A.TXT')], RenameRule(case='lower'), delete_original=True,
+                            cache_path=None)
+    results = list(plan.apply())
+    assert results[0]['success'] and not results[0]['skipped'], results[0]['error']
+    assert os.listdir(tmp_path) == ['a.TXT']
+
+def test_closing_threaded_apply_stops_workers(tmp_path):
+    # 结果多于队列容量，提前关闭生成器后工作线程不能一直阻塞在队列上
+    for i in range(1100):
+        (tmp_path / f'{i}.txt').write_text('')
+    file_paths = sorted(str(path) for path in tmp_path.iterdir())
+    before = threading.active_count()
+    results = plan_rename(file_paths, ['.txt'], '.log', delete_original=True, cache_path=None).apply(workers=2)
+    next(results)
+    results.close()
+    assert threading.active_count() == before
+
+def test_closing_apply_in_cycle_finishes_cycle(tmp_path):
+    a, b, c = (str(tmp_path / name) for name in ('a.txt', 'b.txt', 'c.txt'))
+    for path, text in ((a, 'A'), (b, 'B'), (c, 'C')):
+        with open(path, 'w') as f:
+            f.write(text)
+    # a -> b -> c -> a
+    plan = build_plan([(a, str(tmp_path), 'b', '.txt'), (b, str(tmp_path), 'c', '.txt'),
+                       (c, str(tmp_path), 'a', '.txt')], delete_original=True, cache_path=None)
+    assert plan.cycles == 1
+    results = plan.apply()
+    next(results)
+    results.close()
+    assert sorted(os.listdir(tmp_path)) == ['a.txt', 'b.txt', 'c.txt']
+    assert (read(a), read(b), read(c)) == ('C', 'A', 'B')
@@ -0,0 +1,146 @@
+import os
+import codecs
+from 编码转换 import TIER_CHARDET
+
+# 每组用来推断编码的样本数（需要 chardet 完整检测的文件）
+GROUP_SAMPLES = 3
+# 样本的最低置信度，只排除几乎是随机猜测的结果。推断主要依据几个样本的编码一致：
+# chardet 对几十字节的 GBK 短文本（歌词、字幕的一行）给出的置信度常只有 0.15~0.4，门槛高了组内永远凑不齐样本
+GROUP_MIN_CONFIDENCE = 0.1
+# 推断出编码后，组内按该编码校验失败的文件数达到这个值时放弃推断，之后组内的文件逐个完整检测
+GROUP_MAX_MISSES = 3
+
+def group_key(file_path):
+    """文件所属的组：(所在文件夹, 小写的后缀)"""
+    folder, name = os.path.split(file_path)
+    return folder, os.path.splitext(name)[1].lower()
+
+def is_permissive(encoding):
+    """任何字节序列都能解码的编码（如 latin-1）无法通过严格解码校验，不用于推断"""
+    try:
+        codecs.decode(bytes(range(256)), encoding)
+    except UnicodeDecodeError:
+        return False
+    except LookupError:
+        pass
+    return True
+
+class _Group:
+    __slots__ = ('samples', 'guess', 'misses', 'mixed')
+
+    def __init__(self):
+        self.samples = []   # [(编码, 置信度), ...]
+        self.guess = None   # 推断出的 (编码, 置信度)
+        self.misses = 0
+        self.mixed = False  # 样本不一致或校验失败过多，组内文件逐个完整检测
+
+class EncodingGroups:
+    """
+    按 (文件夹, 后缀) 分组推断编码：同一来源的文件（如一个文件夹中的几千个 GBK 歌词、字幕）几乎总是同一种编码，
+    每组最先完整检测的几个文件作为样本，编码全部一致时（置信度只需超过很低的门槛）作为该组的推断结果；
+    组内其余文件只按推断的编码严格解码校验（编码转换.detect_encoding_tiered 的 guess 参数），校验失败的才用 chardet
+    BOM、纯 ASCII、UTF-8 的文件本来就不需要 chardet，不参与推断
+    注意：严格解码只能发现不合法的字节序列，字节范围重叠的编码（如 GBK 文件夹中混入的 Big5 文件）无法区分，
+    同一组中确实混有这类编码时不要使用分组推断
+    用法：处理文件前调用 guess 取得推断结果，得到检测结果后调用 observe；
+    同时处理多个文件时（多进程、流水线），先用 admit 判断文件现在能否开始，避免组内文件在样本出结果之前全部开始
+    """
+
+    def __init__(self, samples=GROUP_SAMPLES, min_confidence=GROUP_MIN_CONFIDENCE, max_misses=GROUP_MAX_MISSES):
+        self.samples = samples
+        self.min_confidence = min_confidence
+        self.max_misses = max_misses
+        self._groups = {}
+        self._guessed = set()   # 已交出推断结果、还没有收到检测结果的文件
+        self._admitted = {}     # 组 -> [正在处理的文件数, 额外放行的文件数]（还没推断出编码的组）
+        self._candidates = set()  # 由 admit 放行、可能成为样本的文件
+
+    def admit(self, file_path):
+        """
+        判断文件现在能否开始处理：所在组已推断出编码或已改为逐个检测时总是可以；
+        否则组内同时处理的文件数不超过还缺的样本数，每收到一个没有成为样本的结果（如纯 ASCII）多放行一个，
+        其余文件等样本的检测结果出来后再开始，这样也能用上推断结果
+        :return: True 表示可以开始（之后必须对其结果调用 observe），False 表示稍后再试
+        """
+        key = group_key(file_path)
+        group = self._groups.get(key)
+        if group is not None and (group.guess is not None or group.mixed):
+            return True
+        admitted = self._admitted.setdefault(key, [0, 0])
+        if admitted[0] >= self.samples - self._sampled(key) + admitted[1]:
+            return False
+        admitted[0] += 1
+        self._candidates.add(file_path)
+        return True
+
+    def guess(self, file_path):
+        """返回文件所在组推断出的 (编码, 置信度)，还没有推断结果时返回 None"""
+        group = self._groups.get(group_key(file_path))
+        if group is None or group.guess is None:
+            return None
+        self._guessed.add(file_path)
+        return group.guess
+
+    def observe(self, result):
+        """
+        根据检测结果更新分组：chardet 的检测结果在推断出编码之前作为样本，
+        之后说明该文件没有通过推断编码的校验
+        :param result: 批量转换的结果字典（用到 'file'、'tier'、'src_encoding'、'confidence'）
+        """
+        guessed = result['file'] in self._guessed
+        self._guessed.discard(result['file'])
+        key = group_key(result['file'])
+        candidate = result['file'] in self._candidates
+        self._candidates.discard(result['file'])
+        sampled = self._sampled(key)
+        self._update(key, result, guessed)
+        if candidate:
+            admitted = self._admitted[key]
+            admitted[0] -= 1
+            if self._sampled(key) == sampled:
+                # 没有成为样本（如纯 ASCII），不会让组更快推断出编码，多放行一个文件保持并行
+                admitted[1] += 1
+
+    def _sampled(self, key):
+        group = self._groups.get(key)
+        return len(group.samples) if group is not None else 0
+
+    def _update(self, key, result, guessed):
+        if result['tier'] != TIER_CHARDET or not result['confidence']:
+            return
+        group = self._groups.setdefault(key, _Group())
+        if group.mixed:
+            return
+        if group.guess is not None:
+            if guessed:
+                group.misses += 1
+                if group.misses >= self.max_misses:
+                    group.guess = None
+                    group.mixed = True
+            # 多进程时推断出编码之前已经提交的文件仍会完整检测，不算校验失败
+            return
+        if result['confidence'] < self.min_confidence:
+            return
+        group.samples.append((result['src_encoding'], result['confidence']))
+        if len(group.samples) < self.samples:
+            return
+        names = set()
+        for encoding, _ in group.samples:
+            try:
+                names.add(codecs.lookup(encoding).name)
+            except LookupError:
+                names.add(encoding)
+        encoding = group.samples[0][0]
+        if len(names) == 1 and not is_permissive(encoding):
+            group.guess = (encoding, min(confidence for _, confidence in group.samples))
+        else:
+            group.mixed = True
+
+    def stats(self):
+        """返回分组统计 {'groups': 组数, 'inferred': 推断出编码的组数, 'mixed': 逐个检测的组数}"""
+        groups = self._groups.values()
+        return {
+            'groups': len(self._groups),
+            'inferred': sum(1 for group in groups if group.guess is not None),
+            'mixed': sum(1 for group in groups if group.mixed),
+        }
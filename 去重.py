@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+from 编码缓存 import CACHE_FILE, file_identity
+from 增量转换 import content_hash
+from 重命名 import METHOD_DUPLICATE, METHOD_HARDLINK
+
+# 去重方式：新文件名已被内容相同的文件占用时跳过，或者跳过并把该文件换成源文件的硬链接
+DEDUP_SKIP = 'skip'
+DEDUP_LINK = 'link'
+DEDUP_MODES = (DEDUP_SKIP, DEDUP_LINK)
+# 建立硬链接时的临时文件名后缀，完成后原子替换为目标文件
+LINK_TEMP_SUFFIX = '.linking'
+
+class HashCache:
+    """
+    以文件身份 (路径, 大小, mtime_ns, inode) 为键缓存内容哈希，文件没有变化时不再重新读取计算
+    与编码检测缓存存放在同一个数据库中
+    """
+
+    def __init__(self, db_path=CACHE_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS content_hash ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, hash TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, file_path):
+        """文件未变化时返回缓存的哈希，否则返回 None"""
+        path, size, mtime_ns, inode = file_identity(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, hash FROM content_hash WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or row[:3] != (size, mtime_ns, inode):
+            return None
+        return row[3]
+
+    def put(self, file_path, digest, identity=None):
+        """
+        记录文件的内容哈希
+        :param identity: 计算哈希之前取得的文件身份；计算期间文件被修改时，下次按新的身份重新计算
+        """
+        path, size, mtime_ns, inode = identity or file_identity(file_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO content_hash VALUES (?, ?, ?, ?, ?)", (path, size, mtime_ns, inode, digest)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM content_hash")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# 每个进程各自持有的实例（sqlite 连接不能跨进程共享）
+_process_hash_caches = {}
+
+def open_hash_cache(db_path=CACHE_FILE):
+    """返回当前进程中 db_path 对应的哈希缓存实例"""
+    key = (os.getpid(), db_path)
+    cache = _process_hash_caches.get(key)
+    if cache is None:
+        cache = HashCache(db_path)
+        _process_hash_caches[key] = cache
+    return cache
+
+def file_hash(file_path, cache=None):
+    """返回文件内容哈希，传入 cache（HashCache）时文件没有变化就直接使用缓存的结果"""
+    if cache is None:
+        return content_hash(file_path)
+    digest = cache.get(file_path)
+    if digest is None:
+        identity = file_identity(file_path)
+        digest = content_hash(file_path)
+        cache.put(file_path, digest, identity)
+    return digest
+
+def same_content(file_path, other_path, cache=None):
+    """
+    判断两个文件内容是否相同：同一个文件（硬链接）直接相同，大小不同直接不同，
+    否则分块计算两者的内容哈希比较
+    """
+    st = os.stat(file_path)
+    other = os.stat(other_path)
+    if (st.st_dev, st.st_ino) == (other.st_dev, other.st_ino):
+        return True
+    if st.st_size != other.st_size:
+        return False
+    return file_hash(file_path, cache) == file_hash(other_path, cache)
+
+def link_duplicate(src_path, dst_path):
+    """
+    把内容与 src_path 相同的 dst_path 换成 src_path 的硬链接，两者共用一份数据
+    先在临时文件名上建立硬链接再原子替换，失败时 dst_path 保持不变；
+    不在同一文件系统或文件系统不支持硬链接时不做改动
+    :return: METHOD_HARDLINK，没有建立硬链接（包括两者已经是同一个文件）时为 METHOD_DUPLICATE
+    """
+    if os.path.samefile(src_path, dst_path):
+        return METHOD_DUPLICATE
+    temp_path = dst_path + LINK_TEMP_SUFFIX
+    try:
+        os.link(src_path, temp_path)
+    except OSError:
+        return METHOD_DUPLICATE
+    try:
+        os.replace(temp_path, dst_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return METHOD_HARDLINK
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+无界面的批量编码转换 / 批量重命名命令行，每处理一个文件输出一行 JSON
+
+用法：
+    python 命令行.py convert 路径或通配符或文件夹... [-t utf-8] [-o 输出文件夹] [-j 4] [--dry-run]
+    python 命令行.py rename 路径或通配符或文件夹... --src-ext .txt _utf-8.txt --target-ext .md [-j 4] [--dry-run]
+    python 命令行.py rename-rule 路径或通配符或文件夹... [--pattern 正则表达式] --template 模板 [--case lower] [--dry-run]
+    rename / rename-rule 加上 --dedup skip（或 link）时，新文件名已被内容相同的文件占用则不再复制出 name_1.ext
+
+按一次 Ctrl+C 取消批次（不再开始新的文件，正在处理的文件停止且不留下不完整的输出），再按一次立即退出
+中断后以相同参数加上 --resume 重新运行，只处理上次没有完成的文件
+"""
+import os
+import sys
+import glob
+import json
+import signal
+import argparse
+from 批量转换 import batch_convert, AUTO_DETECT, DEFAULT_WORKERS
+from 编码转换 import output_path, mirror_folder
+from 流水线转换 import iter_pipeline_convert
+from 编码缓存 import CACHE_FILE
+from 文件遍历 import iter_files
+from 重命名计划 import plan_rename
+from 重命名规则 import RenameRule, plan_rule_rename, CASE_TRANSFORMS
+from 去重 import DEDUP_MODES
+from 断点续传 import open_journal
+from 进度 import CancelToken, ProgressMeter, format_progress
+
+def expand_paths(paths, recursive=False, include=None, exclude=None):
+    """
+    逐个展开命令行中的路径：文件原样产出，通配符用 glob 展开，文件夹用 iter_files 遍历
+    不存在的路径原样产出，由后续处理报告错误
+    """
+    max_depth = None if recursive else 0
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_files(path, include=include, exclude=exclude, max_depth=max_depth)
+        elif any(char in path for char in '*?['):
+            for match in glob.iglob(path, recursive=True):
+                if os.path.isfile(match):
+                    yield match
+        else:
+            yield path
+
+def batch_params(args, **extra):
+    """用于识别同一批次的参数，续传时必须一致"""
+    params = {
+        'paths': [os.path.abspath(path) for path in args.paths],
+        'recursive': args.recursive,
+        'include': args.include,
+        'exclude': args.exclude,
+        'output_folder': os.path.abspath(args.output_folder) if args.output_folder else None,
+        'delete_original': args.delete_original,
+    }
+    params.update(extra)
+    return params
+
+def emit(op, result):
+    print(json.dumps(dict(result, op=op), ensure_ascii=False), flush=True)
+
+def print_progress(progress):
+    print(f"\r{format_progress(progress)}", end='', file=sys.stderr, flush=True)
+
+def cancel_on_interrupt():
+    """第一次 Ctrl+C 只设置取消标记，之后恢复默认处理（再按一次立即退出），返回取消标记"""
+    cancel = CancelToken()
+
+    def handler(signum, frame):
+        cancel.cancel()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print("\n正在取消，等待正在处理的文件停止（再按一次 Ctrl+C 立即退出）...", file=sys.stderr)
+
+    signal.signal(signal.SIGINT, handler)
+    return cancel
+
+def run_convert(args):
+    file_paths = expand_paths(args.paths, args.recursive, args.include, args.exclude)
+    cache_path = None if args.no_cache else CACHE_FILE
+    manifest_path = CACHE_FILE if args.incremental else None
+    src_encoding = AUTO_DETECT if args.src.lower() == 'auto' else args.src
+    # 指定输出文件夹时，新文件保留相对所遍历文件夹的子文件夹，不同子文件夹中的同名文件不会互相覆盖
+    source_roots = [path for path in args.paths if os.path.isdir(path)]
+    cancel = cancel_on_interrupt()
+    cache_stats = {}
+    journal = None
+    if not args.dry_run:
+        params = batch_params(args, src=src_encoding, target=args.target)
+        journal = open_journal('convert', params, args.resume, args.delete_original)
+        file_paths = journal.pending(file_paths, lambda file_path: output_path(
+            file_path, args.target, mirror_folder(file_path, args.output_folder, source_roots)
+        ))
+    if args.pipeline and not args.dry_run:
+        results = iter_pipeline_convert(
+            file_paths, src_encoding, args.target, args.output_folder,
+            delete_original=args.delete_original, cache_path=cache_path, cpu_threads=args.jobs,
+            manifest_path=manifest_path, verify_hash=args.verify_hash, cancel=cancel, group_detect=args.group_detect,
+            cache_stats=cache_stats, source_roots=source_roots
+        )
+    else:
+        results = batch_convert(
+            file_paths, src_encoding, args.target, args.output_folder,
+            args.delete_original, args.jobs, cache_path, args.dry_run, manifest_path, args.verify_hash, cancel,
+            args.group_detect, cache_stats, source_roots
+        )
+    return report('convert', results, journal, cancel, args.progress, cache_stats=cache_stats)
+
+def run_rename(args):
+    params = batch_params(args, src_ext=args.src_ext, target_ext=args.target_ext, dedup=args.dedup)
+    return apply_plan(args, params, lambda file_paths: plan_rename(
+        file_paths, args.src_ext, args.target_ext, args.output_folder, args.delete_original, args.dedup
+    ))
+
+def run_rename_rule(args):
+    try:
+        rule = RenameRule(args.pattern, args.template, args.case, not args.case_sensitive, args.start, args.step)
+    except ValueError as e:
+        print(f"rename-rule: {str(e)}", file=sys.stderr)
+        return 2
+    params = batch_params(args, pattern=args.pattern, template=args.template, case=args.case,
+                          case_sensitive=args.case_sensitive, start=args.start, step=args.step, dedup=args.dedup)
+    return apply_plan(args, params, lambda file_paths: plan_rule_rename(
+        file_paths, rule, args.output_folder, args.delete_original, args.dedup
+    ))
+
+def apply_plan(args, params, make_plan):
+    """
+    先生成完整的重命名计划（--dry-run 时即为预览），再按计划执行
+    :param make_plan: 文件路径 -> 重命名计划.RenamePlan 的函数
+    """
+    file_paths = expand_paths(args.paths, args.recursive, args.include, args.exclude)
+    journal = None
+    if not args.dry_run:
+        journal = open_journal('rename', params, args.resume, args.delete_original)
+        file_paths = journal.pending(file_paths)
+    plan = make_plan(file_paths)
+    summary = plan.summary()
+    print(f"rename: 计划重命名 {summary['rename']} 个文件，其中 {summary['conflict']} 个新文件名已被占用改用序号，"
+          f"{summary['duplicate']} 个与已有文件内容相同不再复制，"
+          f"{summary['cycles']} 组循环改名，跳过 {summary['skipped']}，无法处理 {summary['error']}", file=sys.stderr)
+    cancel = cancel_on_interrupt()
+    results = plan.apply(args.dry_run, args.jobs, cancel, journal)
+    return report('rename', results, journal, cancel, args.progress, len(plan))
+
+def report(op, results, journal=None, cancel=None, progress=False, total_files=0, cache_stats=None):
+    """
+    逐行输出结果，最后在 stderr 输出汇总，有失败时返回 1，被取消时返回 130
+    传入 journal 时逐个记录结果，批次正常结束且没有失败时删除日志（被取消时保留，可以续传）
+    :param progress: 是否在 stderr 上持续显示进度（文件数、速度和剩余时间）
+    :param total_files: 文件总数，未知时为 0
+    :param cache_stats: 引擎累计的检测缓存命中情况 {'hits', 'misses'}，用过缓存时在汇总中输出
+    """
+    total = failed = skipped = cancelled = 0
+    seconds = saved_seconds = 0.0
+    finished = False
+    if journal:
+        results = journal.track(results)
+    if progress:
+        results = ProgressMeter(total_files, emit=print_progress).track(results)
+    try:
+        for result in results:
+            total += 1
+            seconds += result['seconds']
+            if result.get('skipped'):
+                skipped += 1
+                saved_seconds += result.get('saved_seconds', 0.0)
+            elif result.get('cancelled'):
+                cancelled += 1
+            elif not result['success']:
+                failed += 1
+            emit(op, result)
+        finished = cancel is None or not cancel.cancelled
+    finally:
+        if journal:
+            journal.close(finished)
+    if progress:
+        print(file=sys.stderr)
+    summary = f"{op}: 共 {total} 个文件，失败 {failed}，跳过 {skipped}，累计耗时 {seconds:.2f}s"
+    if saved_seconds:
+        summary += f"，跳过未变化的文件节省约 {saved_seconds:.2f}s"
+    if cache_stats and (cache_stats['hits'] or cache_stats['misses']):
+        summary += f"，编码缓存命中 {cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}"
+    if journal and journal.resumed:
+        summary += f"，续传跳过上次已完成的 {journal.resumed} 个文件"
+    if cancel is not None and cancel.cancelled:
+        summary += f"，已取消（{cancelled} 个文件中途停止，没有留下不完整的输出），以 --resume 重新运行可以接着处理"
+        print(summary, file=sys.stderr)
+        return 130
+    print(summary, file=sys.stderr)
+    return 1 if failed else 0
+
+def add_common_arguments(parser):
+    parser.add_argument("paths", nargs="+", help="文件、通配符（如 'logs/**/*.txt'）或文件夹")
+    parser.add_argument("-o", "--output-folder", help="输出文件夹，默认为源文件所在文件夹")
+    parser.add_argument("-r", "--recursive", action="store_true", help="遍历文件夹时包含子文件夹")
+    parser.add_argument("--include", nargs="+", help="遍历文件夹时只处理匹配这些通配符的文件")
+    parser.add_argument("--exclude", nargs="+", help="遍历文件夹时跳过匹配这些通配符的文件和文件夹")
+    parser.add_argument("--delete-original", action="store_true", help="处理成功后删除原文件")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_WORKERS,
+                        help=f"并行数，默认为 CPU 核数（{DEFAULT_WORKERS}）")
+    parser.add_argument("--dry-run", action="store_true", help="只输出将要进行的操作，不修改任何文件")
+    parser.add_argument("--resume", action="store_true", help="续传：跳过同一批次上次已完成的文件")
+    parser.add_argument("--progress", action="store_true", help="在 stderr 上显示进度、速度和剩余时间")
+
+def add_dedup_argument(parser):
+    parser.add_argument("--dedup", choices=DEDUP_MODES,
+                        help="新文件名已被占用时先比较大小和内容哈希，内容相同则不再复制出加序号的文件："
+                             "skip 跳过，link 把已有文件换成源文件的硬链接（删除原文件时两者都只删除源文件）")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="小工具合集命令行：批量编码转换与批量重命名")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="批量转换文件编码")
+    add_common_arguments(convert_parser)
+    convert_parser.add_argument("-s", "--src", default=AUTO_DETECT, help="源编码，默认（或 auto）为自动检测")
+    convert_parser.add_argument("-t", "--target", default="utf-8", help="目标编码，默认为 utf-8")
+    convert_parser.add_argument("--no-cache", action="store_true", help="不使用编码检测缓存")
+    convert_parser.add_argument("--pipeline", action="store_true",
+                                help="流水线模式：预读、转换、写出重叠进行，适合机械硬盘和网络盘")
+    convert_parser.add_argument("--incremental", action="store_true",
+                                help="增量模式：跳过上次转换后没有变化、新文件也未被改动的文件")
+    convert_parser.add_argument("--verify-hash", action="store_true",
+                                help="增量模式下源文件 mtime 变化但大小相同时，比较内容哈希确认是否真的变化")
+    convert_parser.add_argument("--group-detect", action="store_true",
+                                help="按文件夹和后缀分组推断编码：每组抽样完整检测几个文件，其余文件只校验能否按该编码严格解码")
+    convert_parser.set_defaults(func=run_convert)
+
+    rename_parser = subparsers.add_parser("rename", help="批量重命名文件后缀")
+    add_common_arguments(rename_parser)
+    rename_parser.add_argument("--src-ext", nargs="+", required=True, help="源文件后缀，如 .txt _utf-8.txt")
+    rename_parser.add_argument("--target-ext", required=True, help="目标文件后缀，如 .md")
+    add_dedup_argument(rename_parser)
+    rename_parser.set_defaults(func=run_rename)
+
+    rule_parser = subparsers.add_parser("rename-rule", help="按正则表达式和模板批量重命名")
+    add_common_arguments(rule_parser)
+    rule_parser.add_argument("--pattern", default="", help="在文件名中查找的正则表达式，默认匹配所有文件")
+    rule_parser.add_argument("--template", default="",
+                             help="新文件名模板，如 '{1} E{2:02}{ext}'、'{name}_{n:03}{ext}'、'{date}_{name|lower}{ext}'")
+    rule_parser.add_argument("--case", choices=sorted(CASE_TRANSFORMS), help="新文件名（扩展名之前部分）的大小写转换")
+    rule_parser.add_argument("--case-sensitive", action="store_true", help="正则表达式区分大小写")
+    rule_parser.add_argument("--start", type=int, default=1, help="序号 {n} 的起始值，默认为 1")
+    rule_parser.add_argument("--step", type=int, default=1, help="序号 {n} 的步长，默认为 1")
+    add_dedup_argument(rule_parser)
+    rule_parser.set_defaults(func=run_rename_rule)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from 编码缓存 import CACHE_FILE
+
+# 计算内容哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def content_hash(file_path):
+    """返回文件内容的 blake2b 哈希（十六进制）"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+class ConversionManifest:
+    """
+    记录每个新文件由哪个源文件、以什么参数转换而来，以及当时源文件和新文件的大小、mtime、耗时
+    再次转换时据此判断新文件是否仍是最新的；与编码检测缓存存放在同一个数据库中
+    """
+
+    def __init__(self, db_path=CACHE_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            " output TEXT PRIMARY KEY, source TEXT, src_encoding TEXT, target_encoding TEXT,"
+            " source_size INTEGER, source_mtime_ns INTEGER, source_hash TEXT,"
+            " output_size INTEGER, output_mtime_ns INTEGER, seconds REAL)"
+        )
+        self._conn.commit()
+
+    def check(self, file_path, output, src_encoding, target_encoding, verify_hash=False):
+        """
+        新文件存在、未被改动，且源文件与上次转换时相同时返回上次转换的耗时（秒），否则返回 None
+        源文件大小相同而 mtime 不同时（如被重新复制过），verify_hash 为 True 则比较内容哈希，相同也算未变化
+        :param src_encoding: 转换时指定的源编码（自动检测时为自动检测标记），参数不同的转换不算最新
+        """
+        output = os.path.abspath(output)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, src_encoding, target_encoding, source_size, source_mtime_ns, source_hash,"
+                " output_size, output_mtime_ns, seconds FROM manifest WHERE output = ?",
+                (output,)
+            ).fetchone()
+        if row is None or row[:3] != (os.path.abspath(file_path), src_encoding, target_encoding):
+            return None
+        try:
+            source_stat = os.stat(file_path)
+            output_stat = os.stat(output)
+        except OSError:
+            return None
+        if (output_stat.st_size, output_stat.st_mtime_ns) != (row[6], row[7]):
+            return None
+        if source_stat.st_size != row[3]:
+            return None
+        if source_stat.st_mtime_ns != row[4]:
+            if not (verify_hash and row[5] and content_hash(file_path) == row[5]):
+                return None
+            # 内容没变，记下新的 mtime，下次不必再计算哈希
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE manifest SET source_mtime_ns = ? WHERE output = ?", (source_stat.st_mtime_ns, output)
+                )
+                self._conn.commit()
+        return row[8]
+
+    def is_output(self, file_path):
+        """判断文件是否为记录中某次转换生成的新文件（且生成它的源文件仍然存在）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source FROM manifest WHERE output = ?", (os.path.abspath(file_path),)
+            ).fetchone()
+        return row is not None and row[0] != os.path.abspath(file_path) and os.path.exists(row[0])
+
+    def record(self, file_path, output, src_encoding, target_encoding, seconds, verify_hash=False):
+        """记录一次成功的转换，verify_hash 为 True 时同时记录源文件内容哈希"""
+        source_stat = os.stat(file_path)
+        output_stat = os.stat(output)
+        source_hash = content_hash(file_path) if verify_hash else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(output), os.path.abspath(file_path), src_encoding, target_encoding,
+                 source_stat.st_size, source_stat.st_mtime_ns, source_hash,
+                 output_stat.st_size, output_stat.st_mtime_ns, seconds)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM manifest")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# 每个进程各自持有的实例（sqlite 连接不能跨进程共享）
+_process_manifests = {}
+
+def open_manifest(db_path=CACHE_FILE):
+    """返回当前进程中 db_path 对应的转换记录实例"""
+    key = (os.getpid(), db_path)
+    manifest = _process_manifests.get(key)
+    if manifest is None:
+        manifest = ConversionManifest(db_path)
+        _process_manifests[key] = manifest
+    return manifest
@@ -1,37 +1,53 @@
+import time
+_startup_begin = time.perf_counter()  # 启动计时起点，尽量放在最前面
+
 import sys
 import os
 import logging
+import importlib
+import multiprocessing
+_qt_import_begin = time.perf_counter()
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QPushButton, QVBoxLayout, 
     QHBoxLayout, QStackedWidget, QFrame,
     QMessageBox  # 添加QMessageBox用于显示错误信息
 )
-from 编码转换_ui import EncodingConverterUI
-from 重命名_ui import RenameToolUI  # 新增导入
-import configparser
+from PyQt5.QtCore import QTimer
+_qt_import_seconds = time.perf_counter() - _qt_import_begin
+from 设置 import get_settings
+from 日志 import setup_logging
 
 __version__ = "0.0.2"
 
-# 配置日志系统
+# 日志文件：记录经队列交给后台线程写入，app.log 按大小轮转
 log_file = os.path.join(os.path.dirname(sys.argv[0]), 'app.log')
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# 在主程序入口添加
-CONFIG_FILE = os.path.join(os.path.dirname(sys.argv[0]), "tool_config.ini")
-if not os.path.exists(CONFIG_FILE):
-    config = configparser.ConfigParser()
-    config["main"] = {}
-    config["encoding"] = {}
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        config.write(f)
+# 工具列表：(按钮文字, 界面模块, 界面类)，模块在第一次点击对应按钮时才导入
+# 打包为可执行文件时需要把这些模块加入 hiddenimports
+TOOLS = [
+    ('编码转换工具', '编码转换_ui', 'EncodingConverterUI'),
+    ('文件重命名工具', '重命名_ui', 'RenameToolUI'),
+]
+
+# 启动耗时统计：名称 -> 秒
+startup_timings = {'导入 PyQt5': _qt_import_seconds}
+
+def timed_import(module_name):
+    """导入模块并记录耗时"""
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    startup_timings[f'导入 {module_name}'] = elapsed
+    logger.info(f"导入 {module_name} 耗时 {elapsed * 1000:.1f} ms")
+    return module
+
+def log_startup_report():
+    """记录从程序开始到首个窗口显示的耗时，以及各阶段耗时"""
+    startup_timings['首个窗口显示'] = time.perf_counter() - _startup_begin
+    report = "，".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in startup_timings.items())
+    logger.info(f"启动耗时统计：{report}")
+
 
 class MainUI(QWidget):
     def __init__(self):
@@ -55,15 +71,13 @@ class MainUI(QWidget):
         left_layout = QVBoxLayout()
         left_panel.setLayout(left_layout)
 
-        self.encoding_tool_button = QPushButton('编码转换工具')
-        self.encoding_tool_button.setMinimumHeight(40)
-        self.encoding_tool_button.clicked.connect(self.show_encoding_tool)
-        left_layout.addWidget(self.encoding_tool_button)
-
-        self.rename_tool_button = QPushButton('文件重命名工具')
-        self.rename_tool_button.setMinimumHeight(40)
-        self.rename_tool_button.clicked.connect(self.show_rename_tool)
-        left_layout.addWidget(self.rename_tool_button)
+        self.tool_buttons = []
+        for index, (title, _, _) in enumerate(TOOLS):
+            button = QPushButton(title)
+            button.setMinimumHeight(40)
+            button.clicked.connect(lambda checked=False, index=index: self.show_tool(index))
+            left_layout.addWidget(button)
+            self.tool_buttons.append(button)
 
         left_layout.addStretch()
 
@@ -78,48 +92,57 @@ class MainUI(QWidget):
         self.main_page = QWidget()
         self.stacked_widget.addWidget(self.main_page)
 
-        # 工具实例只创建一次，不销毁
-        self.encoding_tool = EncodingConverterUI()
-        self.encoding_tool.back_button.setText('关闭')
-        self.encoding_tool.back_button.clicked.connect(self.hide_encoding_tool)
-        self.stacked_widget.addWidget(self.encoding_tool)
-
-        self.rename_tool = RenameToolUI()
-        self.rename_tool.back_button.setText('关闭')
-        self.rename_tool.back_button.clicked.connect(self.hide_rename_tool)
-        self.stacked_widget.addWidget(self.rename_tool)
+        # 工具实例在第一次打开时创建，之后不销毁
+        self.tools = {}
 
         main_layout.addWidget(left_panel)
         main_layout.addWidget(self.right_panel)
         logger.info("init_ui 完成")
 
-    def show_encoding_tool(self):
-        logger.info("show_encoding_tool 被调用")
-        self.stacked_widget.setCurrentWidget(self.encoding_tool)
-        self.current_tool = self.encoding_tool
-
-    def hide_encoding_tool(self):
-        logger.info("hide_encoding_tool 被调用")
-        self.stacked_widget.setCurrentWidget(self.main_page)
-        self.current_tool = None
-
-    def show_rename_tool(self):
-        logger.info("show_rename_tool 被调用")
-        self.stacked_widget.setCurrentWidget(self.rename_tool)
-        self.current_tool = self.rename_tool
-
-    def hide_rename_tool(self):
-        logger.info("hide_rename_tool 被调用")
+    def get_tool(self, index):
+        """返回工具界面实例，第一次调用时导入模块并创建"""
+        tool = self.tools.get(index)
+        if tool is None:
+            title, module_name, class_name = TOOLS[index]
+            module = timed_import(module_name)
+            start = time.perf_counter()
+            tool = getattr(module, class_name)()
+            logger.info(f"创建 {title} 耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+            tool.back_button.setText('关闭')
+            tool.back_button.clicked.connect(self.hide_tool)
+            self.stacked_widget.addWidget(tool)
+            self.tools[index] = tool
+        return tool
+
+    def show_tool(self, index):
+        logger.info(f"show_tool 被调用：{TOOLS[index][0]}")
+        tool = self.get_tool(index)
+        self.stacked_widget.setCurrentWidget(tool)
+        self.current_tool = tool
+
+    def hide_tool(self):
+        logger.info("hide_tool 被调用")
         self.stacked_widget.setCurrentWidget(self.main_page)
         self.current_tool = None
 
 # 主程序入口
 if __name__ == "__main__":
+    # 打包为可执行文件后，批量转换的子进程需要此调用
+    multiprocessing.freeze_support()
+    # 只在主进程中配置日志：spawn 方式启动的子进程会重新导入本模块，
+    # 各自打开 app.log 的轮转处理器会使 Windows 上的轮转失败
+    setup_logging(log_file)
     try:
         logger.info("程序启动")
         app = QApplication(sys.argv)
+        # 退出前把尚未写盘的设置写入配置文件
+        app.aboutToQuit.connect(get_settings().flush)
+        start = time.perf_counter()
         main_window = MainUI()
+        startup_timings['创建主窗口'] = time.perf_counter() - start
         main_window.show()
+        # 事件循环处理完显示事件后记录启动耗时
+        QTimer.singleShot(0, log_startup_report)
         sys.exit(app.exec_())
     except Exception as e:
         logger.critical("发生了一个致命错误：", exc_info=True)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+性能测试：生成合成语料，测量编码检测、编码转换和批量重命名的吞吐量与峰值内存，结果写入 JSON
+
+用法：
+    python 性能测试.py -o bench.json
+    python 性能测试.py --scale 0.1 --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import multiprocessing
+
+try:
+    import resource  # Windows 上不可用，此时不记录峰值内存
+except ImportError:
+    resource = None
+
+# 各编码使用的样例文本
+SAMPLE_TEXTS = {
+    'gbk': "这是一段用于性能测试的简体中文文本，包含常见的标点符号和数字 12345。",
+    'big5': "這是一段用於效能測試的繁體中文文字，包含常見的標點符號和數字 12345。",
+    'shift_jis': "これは性能テスト用の日本語テキストです。句読点と数字 12345 を含みます。",
+    'utf-16': "混合编码语料：UTF-16 文本，含有中文、English 和数字 12345。",
+    'utf-8': "混合编码语料：UTF-8 文本，含有中文、English 和数字 12345。",
+}
+ENCODINGS = list(SAMPLE_TEXTS)
+
+def make_text(encoding, size, rng):
+    """生成约 size 字节的指定编码文本"""
+    words = SAMPLE_TEXTS[encoding]
+    lines = []
+    total = 0
+    while total < size:
+        line = words[rng.randrange(len(words)):] + words[:rng.randrange(len(words))] + "\n"
+        lines.append(line)
+        total += len(line.encode(encoding))
+    return "".join(lines).encode(encoding)
+
+def build_corpus(root, scale, seed=0):
+    """
+    在 root 下生成测试语料：
+    small/  大量小文件（混合编码）
+    huge/   少量大文件（混合编码）
+    names/  同名文件分散在多个子文件夹中，重命名到同一文件夹时大量冲突
+    same/   同一来源的大量 GBK 文件（同一文件夹、同一后缀），用于对比逐个检测与分组推断
+    """
+    rng = random.Random(seed)
+    small_dir = os.path.join(root, 'small')
+    huge_dir = os.path.join(root, 'huge')
+    names_dir = os.path.join(root, 'names')
+    same_dir = os.path.join(root, 'same')
+    for folder in (small_dir, huge_dir, names_dir, same_dir):
+        os.makedirs(folder)
+
+    small_count = max(int(2000 * scale), 10)
+    for i in range(small_count):
+        encoding = ENCODINGS[i % len(ENCODINGS)]
+        with open(os.path.join(small_dir, f"small_{i:06d}.txt"), 'wb') as f:
+            f.write(make_text(encoding, rng.randint(512, 8192), rng))
+
+    huge_size = max(int(64 * 1024 * 1024 * scale), 1024 * 1024)
+    for encoding in ('gbk', 'big5', 'shift_jis'):
+        block = make_text(encoding, 1024 * 1024, rng)
+        with open(os.path.join(huge_dir, f"huge_{encoding}.txt"), 'wb') as f:
+            for _ in range(huge_size // len(block) + 1):
+                f.write(block)
+
+    collide_count = max(int(5000 * scale), 10)
+    for i in range(collide_count):
+        sub_folder = os.path.join(names_dir, f"d{i % 50:02d}")
+        os.makedirs(sub_folder, exist_ok=True)
+        with open(os.path.join(sub_folder, f"dup_{i // 50:05d}.txt"), 'wb') as f:
+            f.write(b'x')
+
+    for i in range(small_count):
+        with open(os.path.join(same_dir, f"lyric_{i:06d}.lrc"), 'wb') as f:
+            f.write(make_text('gbk', rng.randint(512, 8192), rng))
+    return small_dir, huge_dir, names_dir, same_dir
+
+# 文件名计划测试中每个文件重复的次数
+NAME_REPEAT = 40
+
+def list_files(folder):
+    paths = []
+    for dir_path, _, file_names in os.walk(folder):
+        paths.extend(os.path.join(dir_path, name) for name in sorted(file_names))
+    return sorted(paths)
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# ---- 各项测试，在独立子进程中运行，以便单独统计峰值内存 ----
+
+def bench_detect(paths, workdir):
+    from 编码转换 import detect_encoding
+    for path in paths:
+        detect_encoding(path)
+
+def bench_convert(paths, workdir):
+    from 编码转换 import detect_encoding, convert_file
+    out_dir = os.path.join(workdir, 'converted')
+    os.makedirs(out_dir, exist_ok=True)
+    for path in paths:
+        encoding, _ = detect_encoding(path)
+        convert_file(path, encoding, 'utf-8', out_dir)
+
+def bench_batch_detect(paths, workdir):
+    """只检测编码（空跑的批量转换，不使用缓存），逐个文件完整检测"""
+    from 批量转换 import batch_convert, AUTO_DETECT
+    for _ in batch_convert(paths, AUTO_DETECT, 'utf-8', workers=1, dry_run=True):
+        pass
+
+def bench_batch_detect_grouped(paths, workdir):
+    from 批量转换 import batch_convert, AUTO_DETECT
+    for _ in batch_convert(paths, AUTO_DETECT, 'utf-8', workers=1, dry_run=True, group_detect=True):
+        pass
+
+def bench_rename(paths, workdir):
+    from 重命名 import batch_rename_files
+    out_dir = os.path.join(workdir, 'renamed')
+    os.makedirs(out_dir, exist_ok=True)
+    batch_rename_files(paths, ['.txt'], '.md', out_dir)
+
+def _rename_twice(paths, workdir, dedup):
+    """同一批文件复制重命名到同一输出文件夹两次，模拟重复运行；哈希缓存放在临时目录中"""
+    from 重命名计划 import plan_rename
+    out_dir = os.path.join(workdir, 'renamed')
+    os.makedirs(out_dir, exist_ok=True)
+    cache_path = os.path.join(workdir, 'hash_cache.db')
+    for _ in range(2):
+        for _ in plan_rename(paths, ['.txt'], '.md', out_dir, dedup=dedup, cache_path=cache_path).apply():
+            pass
+
+def bench_rename_rerun(paths, workdir):
+    _rename_twice(paths, workdir, None)
+
+def bench_rename_rerun_dedup(paths, workdir):
+    _rename_twice(paths, workdir, 'skip')
+
+# 规则重命名测试使用的规则：从文件名中取出编号，补零后加上序号
+BENCH_RULE = (r'^dup_(\d+)\.txt$', 'ep{1:06}_{n:05}{ext|upper}')
+
+def bench_rename_rule(paths, workdir):
+    from 重命名规则 import RenameRule, rule_rename_files
+    out_dir = os.path.join(workdir, 'renamed')
+    os.makedirs(out_dir, exist_ok=True)
+    rule_rename_files(paths, RenameRule(*BENCH_RULE), out_dir)
+
+def bench_plan_suffix(paths, workdir):
+    """只生成重命名计划并空跑，不操作文件，测量大量文件名时的计算开销"""
+    from 重命名计划 import plan_rename
+    for _ in plan_rename(paths, ['.txt'], '.md', workdir).apply(dry_run=True):
+        pass
+
+def bench_plan_rule(paths, workdir):
+    from 重命名规则 import RenameRule, plan_rule_rename
+    for _ in plan_rule_rename(paths, RenameRule(*BENCH_RULE), workdir).apply(dry_run=True):
+        pass
+
+BENCHMARKS = {
+    'detect_encoding': bench_detect,
+    'convert_file': bench_convert,
+    'batch_detect': bench_batch_detect,
+    'batch_detect_grouped': bench_batch_detect_grouped,
+    'batch_rename_files': bench_rename,
+    'rule_rename_files': bench_rename_rule,
+    'rename_rerun': bench_rename_rerun,
+    'rename_rerun_dedup': bench_rename_rerun_dedup,
+    'plan_suffix': bench_plan_suffix,
+    'plan_rule': bench_plan_rule,
+}
+
+def _run_case(bench_name, paths, workdir, queue):
+    start = time.perf_counter()
+    BENCHMARKS[bench_name](paths, workdir)
+    queue.put((time.perf_counter() - start, peak_rss_mb()))
+
+def run_case(name, bench_name, paths, workdir, repeat):
+    """在子进程中运行一项测试 repeat 次，取最快的一次"""
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    best = None
+    ctx = multiprocessing.get_context('spawn')
+    for _ in range(repeat):
+        case_dir = tempfile.mkdtemp(dir=workdir)
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_case, args=(bench_name, paths, case_dir, queue))
+        process.start()
+        seconds, peak = queue.get()
+        process.join()
+        shutil.rmtree(case_dir, ignore_errors=True)
+        if best is None or seconds < best[0]:
+            best = (seconds, peak)
+    seconds, peak = best
+    return {
+        'name': name,
+        'function': bench_name,
+        'files': len(paths),
+        'bytes': total_bytes,
+        'seconds': round(seconds, 4),
+        'mb_per_s': round(total_bytes / (1024 * 1024) / seconds, 2) if seconds else None,
+        'files_per_s': round(len(paths) / seconds, 1) if seconds else None,
+        'peak_rss_mb': round(peak, 1) if peak is not None else None,
+    }
+
+def compare(results, baseline_path):
+    """与之前的结果对比，打印每项的耗时比例"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {item['name']: item for item in json.load(f)['results']}
+    print(f"\n与 {baseline_path} 对比（耗时比例 < 1 表示更快）：")
+    for item in results:
+        old = baseline.get(item['name'])
+        if old and old['seconds']:
+            ratio = item['seconds'] / old['seconds']
+            print(f"  {item['name']:<28} {ratio:6.2f}x  ({old['seconds']}s -> {item['seconds']}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="小工具合集性能测试")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="结果 JSON 文件路径")
+    parser.add_argument("--scale", type=float, default=1.0, help="语料规模倍数，默认为 1.0")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测试重复次数，取最快的一次")
+    parser.add_argument("--seed", type=int, default=0, help="语料随机种子")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="xtool_bench_")
+    try:
+        small_dir, huge_dir, names_dir, same_dir = build_corpus(workdir, args.scale, args.seed)
+        small_files = list_files(small_dir)
+        huge_files = list_files(huge_dir)
+        name_files = list_files(names_dir)
+        same_files = list_files(same_dir)
+        many_names = name_files * NAME_REPEAT
+        cases = [
+            ('detect_small_mixed', 'detect_encoding', small_files),
+            ('detect_huge', 'detect_encoding', huge_files),
+            ('convert_small_mixed', 'convert_file', small_files),
+            ('convert_huge', 'convert_file', huge_files),
+            # 同一来源的文件：逐个完整检测与按文件夹分组推断的对比
+            ('detect_same_folder', 'batch_detect', same_files),
+            ('detect_same_folder_grouped', 'batch_detect_grouped', same_files),
+            ('rename_collisions', 'batch_rename_files', name_files),
+            ('rename_rule_collisions', 'rule_rename_files', name_files),
+            # 重复运行同一批复制重命名：第二次总是复制出 name_1 与按内容去重跳过的对比
+            ('rename_rerun', 'rename_rerun', small_files),
+            ('rename_rerun_dedup', 'rename_rerun_dedup', small_files),
+            # 大量文件名（同一批文件重复多次）：后缀替换与正则 + 模板规则的计划开销对比
+            ('plan_names_suffix', 'plan_suffix', many_names),
+            ('plan_names_rule', 'plan_rule', many_names),
+        ]
+        results = []
+        for name, bench_name, paths in cases:
+            item = run_case(name, bench_name, paths, workdir, args.repeat)
+            results.append(item)
+            print(f"{name:<28} {item['seconds']:>8.3f}s  {item['mb_per_s']} MB/s  "
+                  f"{item['files_per_s']} 文件/s  峰值内存 {item['peak_rss_mb']} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': args.scale,
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import os
+import time
+import signal
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from 编码转换 import detect_encoding_tiered, convert_file, output_path, mirror_folder, TIER_CACHE
+from 编码缓存 import open_cache
+from 分组检测 import EncodingGroups
+from 增量转换 import open_manifest
+from 日志 import log_operation
+from 进度 import CancelToken, Cancelled
+
+# 自动检测源编码时使用的标记（与界面下拉框选项一致）
+AUTO_DETECT = '自动检测'
+# 默认并行进程数
+DEFAULT_WORKERS = os.cpu_count() or 1
+# 多进程时父进程检查取消标记的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+# 子进程中的取消标记，由进程池的初始化函数设置
+_worker_cancel = None
+# 文件路径迭代完的标记
+_EXHAUSTED = object()
+
+def new_result(file_path, src_encoding):
+    """创建单个文件的结果字典，各字段含义见 convert_one"""
+    return {
+        'file': file_path,
+        'success': False,
+        'src_encoding': src_encoding,
+        'confidence': None,
+        'tier': None,
+        'cache_hit': False,
+        'cache_miss': False,
+        'output': None,
+        'bytes': 0,
+        'seconds': 0.0,
+        'stages': {},
+        'skipped': False,
+        'saved_seconds': 0.0,
+        'cancelled': False,
+        'error': None,
+    }
+
+def convert_one(file_path, src_encoding, target_encoding, output_folder=None, delete_original=False,
+                cache_path=None, dry_run=False, manifest_path=None, verify_hash=False, cancel=None, guess=None):
+    """
+    检测并转换单个文件，可在子进程中执行
+    :param cache_path: 编码检测缓存数据库路径，None 表示不使用缓存
+    :param dry_run: 只检测编码并计算新文件路径，不写文件也不删除原文件
+    :param manifest_path: 增量模式使用的转换记录数据库路径，None 表示总是转换
+    :param verify_hash: 增量模式下源文件 mtime 变化但大小未变时，比较内容哈希判断是否真的变化
+    :param cancel: 进度.CancelToken，转换大文件时每块之间检查
+    :param guess: 自动检测时推测的 (编码, 置信度)，见 编码转换.detect_encoding_tiered
+    :return: 结果字典 {'file', 'success', 'src_encoding', 'confidence', 'tier', 'cache_hit', 'cache_miss', 'output',
+             'bytes', 'seconds', 'stages', 'skipped', 'saved_seconds', 'cancelled', 'error'}
+             tier 为自动检测时决定编码的检测方式，手动指定编码时为 None；stages 为各阶段耗时（阶段 -> 秒）
+             使用了检测缓存时 cache_hit / cache_miss 表示是否命中（缓存实例在子进程中，命中统计随结果带回）
+             增量模式下新文件已是最新时 skipped 为 True，saved_seconds 为上次转换该文件的耗时
+             转换中途被取消时 cancelled 为 True，不会留下新文件，也不会删除原文件
+    """
+    if manifest_path and not dry_run:
+        result = skipped_result(file_path, src_encoding, target_encoding, output_folder, manifest_path, verify_hash)
+        if result is not None:
+            return result
+    result = new_result(file_path, src_encoding)
+    start = time.perf_counter()
+    try:
+        _convert_into(result, target_encoding, output_folder, delete_original, cache_path, dry_run, cancel, guess)
+    except Cancelled as e:
+        result['error'] = str(e)
+        result['cancelled'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    if manifest_path and not dry_run:
+        record_conversion(result, src_encoding, target_encoding, manifest_path, verify_hash)
+    return result
+
+def skipped_result(file_path, src_encoding, target_encoding, output_folder, manifest_path, verify_hash=False):
+    """增量模式：新文件已是最新时返回跳过的结果字典，否则返回 None"""
+    start = time.perf_counter()
+    new_file_path = output_path(file_path, target_encoding, output_folder)
+    try:
+        saved = open_manifest(manifest_path).check(
+            file_path, new_file_path, src_encoding, target_encoding, verify_hash
+        )
+    except OSError:
+        return None
+    if saved is None:
+        return None
+    result = new_result(file_path, src_encoding)
+    result['success'] = True
+    result['skipped'] = True
+    result['output'] = new_file_path
+    result['seconds'] = time.perf_counter() - start
+    result['saved_seconds'] = max(saved - result['seconds'], 0.0)
+    return result
+
+def record_conversion(result, src_encoding, target_encoding, manifest_path, verify_hash=False):
+    """
+    增量模式：记录一次成功的转换，供下次判断是否需要重新转换
+    删除了原文件时没有可比较的源文件，不记录；记录失败不影响转换结果
+    """
+    if not result['success'] or not os.path.exists(result['file']):
+        return
+    try:
+        open_manifest(manifest_path).record(
+            result['file'], result['output'], src_encoding, target_encoding, result['seconds'], verify_hash
+        )
+    except Exception:
+        pass
+
+def _convert_into(result, target_encoding, output_folder, delete_original, cache_path, dry_run, cancel=None,
+                  guess=None):
+    """convert_one 的实际处理过程，结果直接写入 result"""
+    file_path = result['file']
+    stages = result['stages']
+    result['bytes'] = os.path.getsize(file_path)
+    if result['src_encoding'] == AUTO_DETECT:
+        cache = open_cache(cache_path) if cache_path else None
+        start = time.perf_counter()
+        detected_encoding, confidence, tier = detect_encoding_tiered(file_path, cache=cache, guess=guess)
+        stages['detect'] = time.perf_counter() - start
+        result['tier'] = tier
+        result['cache_hit'] = tier == TIER_CACHE
+        result['cache_miss'] = cache is not None and tier != TIER_CACHE
+        if not detected_encoding:
+            result['error'] = "无法检测编码"
+            return
+        result['src_encoding'] = detected_encoding
+        result['confidence'] = confidence
+
+    if dry_run:
+        result['output'] = output_path(file_path, target_encoding, output_folder)
+        result['success'] = True
+        return
+
+    # 转换文件
+    start = time.perf_counter()
+    # 要删除原文件时，新文件写盘后才删除，且不允许把无法解码的内容替换掉
+    result['output'] = convert_file(file_path, result['src_encoding'], target_encoding, output_folder,
+                                    durable=delete_original, cancel=cancel, strict=delete_original)
+    stages['convert'] = time.perf_counter() - start
+
+    # 删除原文件
+    if delete_original:
+        start = time.perf_counter()
+        try:
+            os.remove(file_path)
+        except Exception as e:
+            result['error'] = f"删除原文件失败: {str(e)}"
+            return
+        finally:
+            stages['delete'] = time.perf_counter() - start
+    result['success'] = True
+
+def batch_convert(file_paths, src_encoding, target_encoding, output_folder=None,
+                  delete_original=False, workers=None, cache_path=None, dry_run=False,
+                  manifest_path=None, verify_hash=False, cancel=None, group_detect=False, cache_stats=None,
+                  source_roots=None):
+    """
+    批量检测并转换文件，按完成顺序逐个产出结果字典
+    :param file_paths: 文件路径的可迭代对象（可以是生成器）
+    :param src_encoding: 源编码，AUTO_DETECT 表示逐个自动检测
+    :param target_encoding: 目标编码
+    :param output_folder: 输出文件夹，默认为源文件所在文件夹
+    :param delete_original: 转换成功后是否删除原文件
+    :param workers: 并行进程数，默认为 CPU 核数；为 1 时在当前进程内顺序执行
+    :param cache_path: 编码检测缓存数据库路径，None 表示不使用缓存
+    :param dry_run: 只检测编码并计算新文件路径，不写文件
+    :param manifest_path: 增量模式使用的转换记录数据库路径，新文件已是最新的源文件会被跳过，
+                          以前转换生成的新文件不再当作源文件（见 exclude_outputs）
+    :param verify_hash: 增量模式下用内容哈希确认 mtime 变化的源文件是否真的变化
+    :param cancel: 进度.CancelToken；取消后不再开始新的文件，正在转换的文件在块之间停止，
+                   其结果的 cancelled 为 True，已写的部分被删除
+    :param group_detect: 自动检测时按 (文件夹, 后缀) 分组推断编码，组内文件只做严格解码校验，
+                         校验失败的才完整检测（见 分组检测.EncodingGroups）
+    :param cache_stats: 传入字典时累计检测缓存的命中情况 {'hits': 命中数, 'misses': 未命中数}（含所有子进程）
+    :param source_roots: 遍历的源文件夹列表；指定了输出文件夹时，新文件保留相对这些文件夹的子文件夹
+                         （见 编码转换.mirror_folder）
+    新文件路径与本批次中之前的文件相同的文件不转换，结果中记录错误，不会替换掉先写出的新文件
+    """
+    groups = EncodingGroups() if group_detect and src_encoding == AUTO_DETECT else None
+
+    def file_args(file_path):
+        folder = mirror_folder(file_path, output_folder, source_roots)
+        return (src_encoding, target_encoding, folder, delete_original, cache_path, dry_run, manifest_path,
+                verify_hash)
+
+    rejected = []
+    if manifest_path:
+        file_paths = exclude_outputs(file_paths, manifest_path)
+    file_paths = unique_outputs(file_paths, lambda file_path: output_path(
+        file_path, target_encoding, mirror_folder(file_path, output_folder, source_roots)
+    ), rejected)
+    for result in _run_batch(file_paths, workers, cancel, groups, cache_stats, file_args):
+        if groups is not None:
+            groups.observe(result)
+        log_operation('convert', result)
+        yield result
+        yield from duplicate_results(rejected, src_encoding)
+    yield from duplicate_results(rejected, src_encoding)
+
+def exclude_outputs(file_paths, manifest_path):
+    """
+    增量模式：逐个产出不是以前转换生成的新文件的文件
+    新文件默认写在源文件旁边，重新遍历文件夹时会遍历到它们，不排除的话每次运行都会把上次的新文件再转换一遍
+    """
+    manifest = open_manifest(manifest_path)
+    for file_path in file_paths:
+        if not manifest.is_output(file_path):
+            yield file_path
+
+def unique_outputs(file_paths, output_of, rejected):
+    """
+    逐个产出新文件路径与之前的文件都不相同的文件，相同的放入 rejected 列表 [(文件, 新文件路径), ...]
+    避免后转换的文件原子替换掉本批次中先写出的新文件（删除原文件时前一个文件的内容就丢失了）
+    :param output_of: 文件路径 -> 新文件路径的函数
+    """
+    claimed = set()
+    for file_path in file_paths:
+        new_file_path = output_of(file_path)
+        key = os.path.normcase(os.path.abspath(new_file_path))
+        if key in claimed:
+            rejected.append((file_path, new_file_path))
+            continue
+        claimed.add(key)
+        yield file_path
+
+def duplicate_results(rejected, src_encoding):
+    """逐个产出（并清空）rejected 中新文件路径重复的文件的错误结果"""
+    while rejected:
+        file_path, new_file_path = rejected.pop(0)
+        result = new_result(file_path, src_encoding)
+        result['error'] = f"新文件路径与本批次中的另一个文件相同，没有转换: {new_file_path}"
+        log_operation('convert', result)
+        yield result
+
+def _init_worker(cancel_event):
+    global _worker_cancel
+    _worker_cancel = CancelToken(cancel_event)
+    # Ctrl+C 由父进程处理（设置取消标记），子进程忽略，避免进程池被打断
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _convert_in_worker(file_path, guess, *args):
+    return convert_one(file_path, *args, cancel=_worker_cancel, guess=guess)
+
+def count_cache(cache_stats, result):
+    """把结果中的检测缓存命中情况累计到 cache_stats（为 None 时不统计）"""
+    if cache_stats is not None:
+        cache_stats['hits'] = cache_stats.get('hits', 0) + result.get('cache_hit', False)
+        cache_stats['misses'] = cache_stats.get('misses', 0) + result.get('cache_miss', False)
+
+def _run_batch(file_paths, workers, cancel, groups, cache_stats, file_args):
+    """:param file_args: 文件路径 -> convert_one 在文件路径之后的位置参数（在父进程中调用）"""
+    workers = workers or DEFAULT_WORKERS
+
+    if workers <= 1:
+        for file_path in file_paths:
+            if cancel is not None and cancel.cancelled:
+                return
+            guess = groups.guess(file_path) if groups is not None else None
+            result = convert_one(file_path, *file_args(file_path), cancel=cancel, guess=guess)
+            count_cache(cache_stats, result)
+            yield result
+        return
+
+    # 取消标记通过进程池的初始化函数交给子进程（同步对象只能在创建进程时传递）
+    cancel_event = multiprocessing.Event()
+    # 限制同时提交的任务数，避免文件很多时一次性占满内存
+    max_pending = workers * 4
+    iterator = iter(file_paths)
+    exhausted = False
+    # 分组推断时，所在组还在等样本检测结果的文件先留在这里（见 分组检测.EncodingGroups.admit）
+    held = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cancel_event,)) as executor:
+        pending = set()
+
+        def submit(file_path):
+            guess = groups.guess(file_path) if groups is not None else None
+            pending.add(executor.submit(_convert_in_worker, file_path, guess, *file_args(file_path)))
+
+        while True:
+            if cancel is not None and cancel.cancelled and not cancel_event.is_set():
+                # 还没开始的任务直接撤销，正在转换的文件由子进程在块之间停止
+                cancel_event.set()
+                pending = {future for future in pending if not future.cancel()}
+                exhausted = True
+                held = []
+            if held:
+                waiting = []
+                for file_path in held:
+                    if len(pending) < max_pending and groups.admit(file_path):
+                        submit(file_path)
+                    else:
+                        waiting.append(file_path)
+                held = waiting
+            while not exhausted and len(pending) < max_pending and len(held) < max_pending:
+                file_path = next(iterator, _EXHAUSTED)
+                if file_path is _EXHAUSTED:
+                    exhausted = True
+                    break
+                if groups is None or groups.admit(file_path):
+                    submit(file_path)
+                else:
+                    held.append(file_path)
+            if not pending:
+                return
+            # 带超时等待，长时间没有文件完成时也能及时响应取消
+            done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                count_cache(cache_stats, result)
+                yield result
@@ -0,0 +1,77 @@
+import os
+from fnmatch import fnmatch
+from PyQt5.QtCore import QThread, pyqtSignal
+from 文件遍历 import iter_files
+from 结果列表 import ResultBuffer
+from 进度 import CancelToken
+
+def dropped_paths(mime_data):
+    """返回拖放数据中的本地文件 / 文件夹路径"""
+    if not mime_data.hasUrls():
+        return []
+    return [url.toLocalFile() for url in mime_data.urls() if url.isLocalFile()]
+
+class FileCollector(QThread):
+    """
+    在后台线程中展开拖入的文件和文件夹并筛选，接受的文件合并成批通过 files_found 回传
+    progress 参数为 (已检查的文件数, 接受的文件数)；collect_done 参数为 (接受的文件数, 是否被取消)
+    """
+    files_found = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    collect_done = pyqtSignal(int, bool)
+
+    def __init__(self, paths, include=None, accept=None, max_depth=None):
+        """
+        :param paths: 拖入的文件和文件夹路径
+        :param include: 通配符列表 (如 ['*.txt'])，同 文件遍历.iter_files；None 表示不限制
+        :param accept: 文件名 -> 是否接受 的函数（如按后缀筛选）；None 表示都接受
+        :param max_depth: 文件夹的最大遍历深度，同 文件遍历.iter_files
+        """
+        super().__init__()
+        self.paths = paths
+        self.include = include
+        self.accept = accept
+        self.max_depth = max_depth
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """请求停止遍历，不等待；遍历在下一个目录项之前停止，已回传的文件保留"""
+        self.cancel_token.cancel()
+
+    def _candidates(self, path):
+        if os.path.isdir(path):
+            # 只收集文件列表，边读文件夹边产出，取消时不必等整个文件夹读完
+            return iter_files(path, include=self.include, max_depth=self.max_depth, snapshot=False,
+                              cancel=self.cancel_token)
+        if os.path.isfile(path):
+            name = os.path.basename(path)
+            if not self.include or any(fnmatch(name, pattern) for pattern in self.include):
+                return [path]
+        return []
+
+    def run(self):
+        scanned = accepted = 0
+        seen = set()
+
+        def emit(file_paths):
+            self.files_found.emit(file_paths)
+            self.progress.emit(scanned, accepted)
+
+        buffer = ResultBuffer(emit)
+        for path in self.paths:
+            if self.cancel_token.cancelled:
+                break
+            for file_path in self._candidates(path):
+                if self.cancel_token.cancelled:
+                    break
+                scanned += 1
+                # 同时拖入文件夹和其中的文件时只保留一次
+                if file_path in seen:
+                    continue
+                if self.accept is None or self.accept(os.path.basename(file_path)):
+                    seen.add(file_path)
+                    accepted += 1
+                    buffer.add(file_path)
+        buffer.flush()
+        self.progress.emit(scanned, accepted)
+        self.collect_done.emit(accepted, self.cancel_token.cancelled)
@@ -0,0 +1,76 @@
+import os
+from fnmatch import fnmatch
+
+def iter_files(root, include=None, exclude=None, suffixes=None, max_depth=None,
+               follow_symlinks=False, onerror=None, snapshot=True, cancel=None):
+    """
+    用 os.scandir 逐个文件夹遍历，边遍历边产出文件路径，不会先构建整棵目录树的列表
+    :param root: 起始文件夹
+    :param include: 通配符列表 (如 ['*.txt', '*.lrc'])，文件名或相对路径匹配任一项才产出；None 表示不限制
+    :param exclude: 通配符列表，匹配的文件和文件夹都会被跳过
+    :param suffixes: 后缀列表 (如 ['.txt', '_gbk.txt'])，不区分大小写；None 表示不限制
+    :param max_depth: 最大深度，0 表示只看 root 下的文件，None 表示不限制
+    :param follow_symlinks: 是否跟随符号链接（跟随时会跳过已访问过的文件夹，避免循环）
+    :param onerror: 无法读取文件夹时的回调，参数为 OSError；None 表示忽略
+    :param snapshot: True 时先读完当前文件夹再产出，避免处理过程中新生成的文件（如转换输出）被再次遍历到；
+                     False 时 os.scandir 每读到一个文件就产出（只收集文件列表时使用，大文件夹也能立即看到结果）
+    :param cancel: 进度.CancelToken，每读一个目录项检查一次，取消后停止遍历；None 表示不可取消
+    """
+    include = list(include or [])
+    exclude = list(exclude or [])
+    suffixes = tuple(ext.lower() for ext in suffixes) if suffixes else None
+    visited = set()
+    stack = [(root, 0)]
+    while stack:
+        folder, depth = stack.pop()
+        if follow_symlinks:
+            try:
+                st = os.stat(folder)
+            except OSError as e:
+                if onerror:
+                    onerror(e)
+                continue
+            if (st.st_dev, st.st_ino) in visited:
+                continue
+            visited.add((st.st_dev, st.st_ino))
+        try:
+            entries = os.scandir(folder)
+        except OSError as e:
+            if onerror:
+                onerror(e)
+            continue
+        files = []
+        sub_folders = []
+        rel_folder = os.path.relpath(folder, root).replace(os.sep, '/')
+        rel_prefix = '' if rel_folder == '.' else rel_folder + '/'
+        with entries:
+            for entry in entries:
+                if cancel is not None and cancel.cancelled:
+                    return
+                rel_path = rel_prefix + entry.name
+                if exclude and _matches(entry.name, rel_path, exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        if max_depth is None or depth < max_depth:
+                            sub_folders.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=follow_symlinks):
+                        continue
+                except OSError:
+                    continue
+                if include and not _matches(entry.name, rel_path, include):
+                    continue
+                if suffixes and not entry.name.lower().endswith(suffixes):
+                    continue
+                if snapshot:
+                    files.append(entry.path)
+                else:
+                    yield entry.path
+        yield from files
+        # 逆序压栈，使子文件夹按目录顺序处理
+        for sub_folder in reversed(sub_folders):
+            stack.append((sub_folder, depth + 1))
+
+def _matches(name, rel_path, patterns):
+    return any(fnmatch(name, pattern) or fnmatch(rel_path, pattern) for pattern in patterns)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# 批次日志保存的文件夹
+JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "journals")
+# 输出先写到 "目标路径 + TEMP_SUFFIX"，写完后原子替换为目标文件
+TEMP_SUFFIX = ".part"
+# 循环改名（如 a -> b、b -> a）时源文件临时改成的名字：原路径 + 进程号 + 该后缀
+CYCLE_TEMP_SUFFIX = ".renaming"
+# 每次向引擎交出这么多个文件前，先把它们的开始记录一起写盘
+START_GROUP = 64
+# 完成记录最多积累这么多秒后写盘
+SYNC_INTERVAL = 1.0
+
+def fsync_dir(folder):
+    """把文件夹中的改名/删除写盘（Windows 不支持打开文件夹，跳过）"""
+    if os.name != 'posix':
+        return
+    fd = os.open(folder or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _path_key(path):
+    """比较路径时使用的键：规范化的绝对路径"""
+    return os.path.normcase(os.path.abspath(path))
+
+@contextmanager
+def atomic_output(file_path, durable=False):
+    """
+    在临时文件中生成输出，成功后原子替换为 file_path，出错时删除临时文件
+    调用方向 yield 出的临时路径写入内容；durable 为 True 时替换前后都写盘，
+    保证之后删除源文件时输出已经落盘
+    """
+    temp_path = file_path + TEMP_SUFFIX
+    try:
+        yield temp_path
+        if durable:
+            fd = os.open(temp_path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.replace(temp_path, file_path)
+        if durable:
+            fsync_dir(os.path.dirname(file_path))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def journal_path(op, params):
+    """根据操作和批次参数（含源文件）确定日志文件，参数相同的批次使用同一个日志"""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return os.path.join(JOURNAL_DIR, f"{op}-{digest[:16]}.journal")
+
+class BatchJournal:
+    """
+    批次的预写日志，每行一条 JSON：
+    {"header": 批次参数}、{"start": 文件, "output": 预计的新文件}（交给引擎处理前写入）、
+    {"done": 文件, "output": 新文件}、{"temp": 文件, "path": 临时文件名, "output": 新文件}（循环改名前写入）
+    resume 为 True 且日志中的批次参数相同时，读取上次的记录，pending 会跳过已完成的文件，
+    停在临时文件名上的循环改名会先被完成或撤回（见 _recover）；否则清空重新开始。
+    开始记录成组写盘；完成记录立即交给操作系统（进程崩溃不会丢失），按时间间隔写盘，断电时丢失的完成记录只会导致重做
+    """
+
+    def __init__(self, path, params, resume=False, delete_original=False):
+        self.path = path
+        self.delete_original = delete_original
+        self.completed = {}     # 文件 -> 新文件
+        self.outputs = set()    # 本批次生成的新文件（_path_key），重新遍历文件夹时不能再当作源文件
+        self.temp_paths = set()   # 本批次记录过的循环改名临时文件（_path_key）
+        self.interrupted = set()  # 开始了但没有完成记录的文件
+        self.temps = {}         # 文件 -> (临时文件名, 新文件)，循环改名中改成了临时名字的源文件
+        self.resumed = 0        # 本次因已完成而跳过的文件数
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if resume and self._load(params):
+            self._file = open(path, 'a', encoding='utf-8')
+            self._recover()
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._write({'header': params})
+            self.sync()
+
+    def _load(self, params):
+        if not os.path.exists(self.path):
+            return False
+        started = set()
+        with open(self.path, encoding='utf-8') as f:
+            for number, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                if number == 0:
+                    if record.get('header') != params:
+                        return False
+                elif 'done' in record:
+                    self.completed[record['done']] = record.get('output')
+                    self._add_output(record.get('output'))
+                elif 'temp' in record:
+                    self.temps[record['temp']] = (record['path'], record['output'])
+                    self.temp_paths.add(_path_key(record['path']))
+                elif 'start' in record:
+                    started.add(record['start'])
+                    self._add_output(record.get('output'))
+        self.interrupted = started.difference(self.completed)
+        return True
+
+    def _recover(self):
+        """
+        处理上次崩溃时停在临时文件名上的循环改名：新文件名已腾出时改为新文件名并记为完成，
+        否则原文件名空着时改回原文件名（重新处理）；两者都被占用时保留临时文件，记为失败，日志不会被删除
+        """
+        for file_path, (temp_path, output) in self.temps.items():
+            if file_path in self.completed or not os.path.lexists(temp_path):
+                continue
+            if not os.path.lexists(output):
+                os.replace(temp_path, output)
+                self.completed[file_path] = output
+                self._add_output(output)
+                self._write({'done': file_path, 'output': output})
+            elif not os.path.lexists(file_path):
+                os.replace(temp_path, file_path)
+            else:
+                self.failed += 1
+        self.sync()
+
+    def _add_output(self, output):
+        if output:
+            self.outputs.add(_path_key(output))
+
+    def _is_own_file(self, file_path):
+        """文件是本批次生成的新文件，或本批次留下的临时文件（新文件 + TEMP_SUFFIX、循环改名的临时文件名）"""
+        key = _path_key(file_path)
+        if key in self.outputs or key in self.temp_paths:
+            return True
+        return key.endswith(TEMP_SUFFIX) and key[:-len(TEMP_SUFFIX)] in self.outputs
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def is_finished(self, file_path):
+        """
+        判断文件是否在上次已处理完：有完成记录，或者删除源文件模式下已开始且源文件已不存在
+        （源文件只会在输出写盘之后删除）
+        """
+        if file_path in self.completed:
+            return True
+        return self.delete_original and file_path in self.interrupted and not os.path.exists(file_path)
+
+    def pending(self, file_paths, output_for=None):
+        """
+        逐个产出还需要处理的文件，交出前先成组写入并落盘开始记录
+        :param output_for: 能预先确定新文件路径时传入 文件 -> 新文件 的函数，记录在开始记录中，
+                           这样即使完成记录没来得及写入，续传时也不会把新文件当作源文件
+        """
+        group = []
+        for file_path in file_paths:
+            # 本批次的新文件不是源文件；上次崩溃时留下的临时文件会在重做对应文件时被覆盖（或已在续传时处理）。
+            # 名字像临时文件、但不是本批次留下的文件照常处理
+            if self._is_own_file(file_path):
+                continue
+            if self.is_finished(file_path):
+                self.resumed += 1
+                continue
+            group.append(file_path)
+            if len(group) >= START_GROUP:
+                yield from self._start(group, output_for)
+                group = []
+        yield from self._start(group, output_for)
+
+    def _start(self, group, output_for):
+        if not group:
+            return group
+        with self._lock:
+            for file_path in group:
+                record = {'start': file_path}
+                if output_for is not None:
+                    record['output'] = output_for(file_path)
+                    # 输出文件夹在递归遍历的源文件夹中时，本次稍后生成的新文件也不能再当作源文件
+                    self._add_output(record['output'])
+                self._write(record)
+            self.sync()
+        return group
+
+    def record_temp(self, file_path, temp_path, output):
+        """循环改名把源文件改成临时名字之前调用，写盘后才返回，崩溃后续传时据此完成或撤回这一步"""
+        with self._lock:
+            self._write({'temp': file_path, 'path': temp_path, 'output': output})
+            self.temp_paths.add(_path_key(temp_path))
+            self.sync()
+
+    def record(self, result):
+        """记录引擎产出的结果，成功的文件写入完成记录"""
+        with self._lock:
+            if result['success']:
+                self._write({'done': result['file'], 'output': result['output']})
+                self._add_output(result['output'])
+                if time.monotonic() - self._last_sync >= SYNC_INTERVAL:
+                    self.sync()
+                else:
+                    self._file.flush()
+            elif not result.get('skipped'):
+                self.failed += 1
+
+    def track(self, results):
+        """包装引擎的结果迭代器，逐个记录后原样产出"""
+        for result in results:
+            self.record(result)
+            yield result
+
+    def close(self, finished=False):
+        """
+        关闭日志；finished 为 True（批次正常结束）且没有失败的文件时删除日志，
+        否则保留，下次续传时只处理失败和未处理的文件
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self.sync()
+            self._file.close()
+        if finished and not self.failed:
+            os.remove(self.path)
+
+def open_journal(op, params, resume=False, delete_original=False):
+    """打开（或续传）op 操作、批次参数为 params 的日志"""
+    return BatchJournal(journal_path(op, params), params, resume, delete_original)
@@ -0,0 +1,61 @@
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# 日志文件单个最大字节数与保留的旧文件个数
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 逐文件的操作记录，每条消息是一个 JSON 对象，便于从日志中统计吞吐量
+operation_logger = logging.getLogger('xtool.operation')
+
+def setup_logging(log_file, level=logging.INFO, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+    """
+    配置根日志：调用方只把记录放入队列，由后台线程写文件（按大小轮转）和控制台
+    :return: QueueListener，程序退出时自动停止
+    """
+    log_queue = queue.Queue(-1)
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    listener.start()
+    # 退出时先把队列中剩余的记录写完
+    atexit.register(listener.stop)
+    return listener
+
+def log_operation(op, result):
+    """
+    记录一个文件的处理结果，result 为转换或重命名引擎产出的结果字典
+    有 stages（阶段 -> 秒）时每个阶段记一条，否则按 op 记一条
+    """
+    if not operation_logger.isEnabledFor(logging.INFO):
+        return
+    stages = result.get('stages') or {op: result['seconds']}
+    if result.get('skipped'):
+        status = 'skipped'
+    else:
+        status = 'ok' if result.get('success') else 'error'
+    for stage, seconds in stages.items():
+        record = {
+            'op': op,
+            'stage': stage,
+            'file': result['file'],
+            'bytes': result.get('bytes', 0),
+            'duration_ms': round(seconds * 1000, 3),
+            'result': status,
+        }
+        if result.get('error'):
+            record['error'] = result['error']
+        operation_logger.info(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,320 @@
+import io
+import os
+import codecs
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from 编码转换 import detect_encoding_bytes, transcode_stream, output_path, mirror_folder, TIER_CACHE, TIER_GROUP
+from 编码缓存 import open_cache
+from 分组检测 import EncodingGroups
+from 批量转换 import (
+    AUTO_DETECT, DEFAULT_WORKERS, new_result, convert_one, skipped_result, record_conversion, count_cache,
+    exclude_outputs, unique_outputs, duplicate_results
+)
+from 日志 import log_operation
+from 断点续传 import atomic_output
+from 进度 import Cancelled, check_cancel
+
+# 同时在内存中的字节数上限（读入的内容与转换结果合计）
+DEFAULT_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+# 读写文件的线程数
+DEFAULT_IO_THREADS = 4
+# 为一个文件预留的内存按文件大小的倍数估算：原内容 1 份 + 转换结果（逐块写入列表，不再整体复制）
+# 转换结果相对原内容的最大膨胀倍数：无法解码的单个字节被替换为 U+FFFD，UTF-8 中占 3 字节；
+# ASCII / 单字节编码转为 UTF-16 为 2 倍、转为 UTF-32 为 4 倍；GBK、Latin-1 等转为其他编码不超过 2 倍
+UTF8_EXPANSION = 3
+UTF16_EXPANSION = 2
+UTF32_EXPANSION = 4
+DEFAULT_EXPANSION = 2
+
+# iter_pipeline_convert 的后台线程检查消费方是否已停止的间隔（秒）
+STOP_POLL_INTERVAL = 0.1
+
+# 结果队列中表示全部完成的标记
+_FINISHED = object()
+
+def memory_factor(target_encoding):
+    """返回转换为 target_encoding 时单个文件同时在内存中的字节数相对文件大小的最大倍数"""
+    try:
+        name = codecs.lookup(target_encoding).name
+    except LookupError:
+        name = target_encoding
+    if name.startswith('utf-32'):
+        return 1 + UTF32_EXPANSION
+    if name.startswith('utf-16'):
+        return 1 + UTF16_EXPANSION
+    if name.startswith('utf-8'):
+        return 1 + UTF8_EXPANSION
+    return 1 + DEFAULT_EXPANSION
+
+class EncodedChunks(list):
+    """收集转换结果的各块，代替 BytesIO：不需要扩容，也不需要 getvalue 再复制一份"""
+    write = list.append
+
+class ByteBudget:
+    """限制同时在内存中的字节数，超出时 acquire 会等待其他文件释放"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size):
+        async with self._condition:
+            # 没有其他文件占用时总是放行，保证单个文件不会永远等待
+            await self._condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+
+    async def release(self, size):
+        async with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+async def pipeline_convert(file_paths, src_encoding, target_encoding, output_folder=None,
+                           delete_original=False, cache_path=None,
+                           max_inflight_bytes=DEFAULT_MAX_INFLIGHT_BYTES,
+                           io_threads=DEFAULT_IO_THREADS, cpu_threads=DEFAULT_WORKERS,
+                           manifest_path=None, verify_hash=False, cancel=None, group_detect=False,
+                           cache_stats=None, source_roots=None):
+    """
+    流水线方式批量转换：预读后续文件、检测与编码、异步写出同时进行，按完成顺序产出结果字典
+    结果格式与 批量转换.convert_one 相同
+    预估内存超过 max_inflight_bytes 的大文件不整体读入，改用 convert_file 分块转换
+    :param file_paths: 文件路径的可迭代对象（可以是生成器）
+    :param max_inflight_bytes: 同时在内存中的字节数上限
+    :param io_threads: 读写文件的线程数
+    :param cpu_threads: 检测与编码的线程数
+    :param manifest_path: 增量模式使用的转换记录数据库路径，新文件已是最新的源文件会被跳过
+    :param verify_hash: 增量模式下用内容哈希确认 mtime 变化的源文件是否真的变化
+    :param cancel: 进度.CancelToken；取消后不再读入新的文件，已读入的文件不再写出，
+                   分块转换的大文件在块之间停止，这些文件的结果 cancelled 为 True
+    :param group_detect: 自动检测时按 (文件夹, 后缀) 分组推断编码，同 批量转换.batch_convert
+    :param cache_stats: 传入字典时累计检测缓存的命中情况，同 批量转换.batch_convert
+    :param source_roots: 遍历的源文件夹列表，新文件保留相对它们的子文件夹，同 批量转换.batch_convert
+    """
+    loop = asyncio.get_running_loop()
+    io_pool = ThreadPoolExecutor(max_workers=io_threads)
+    cpu_pool = ThreadPoolExecutor(max_workers=cpu_threads)
+    budget = ByteBudget(max_inflight_bytes)
+    # 限制同时处理的文件数，避免大量小文件一次性创建过多任务
+    slots = asyncio.Semaphore(io_threads + cpu_threads * 2)
+    factor = memory_factor(target_encoding)
+    results = asyncio.Queue()
+    groups = EncodingGroups() if group_detect and src_encoding == AUTO_DETECT else None
+    # 每收到一个检测结果通知一次，所在组还在等样本检测结果的文件据此重新判断能否开始
+    observed = asyncio.Condition()
+    rejected = []
+    if manifest_path:
+        file_paths = exclude_outputs(file_paths, manifest_path)
+    file_paths = unique_outputs(file_paths, lambda file_path: output_path(
+        file_path, target_encoding, mirror_folder(file_path, output_folder, source_roots)
+    ), rejected)
+
+    async def process(file_path, reserved):
+        folder = mirror_folder(file_path, output_folder, source_roots)
+        args = (src_encoding, target_encoding, folder, delete_original, cache_path)
+        try:
+            if groups is not None:
+                async with observed:
+                    await observed.wait_for(lambda: groups.admit(file_path))
+            guess = groups.guess(file_path) if groups is not None else None
+            if reserved:
+                result = await _process_in_memory(loop, io_pool, cpu_pool, file_path, *args, cancel, guess)
+                if manifest_path:
+                    await loop.run_in_executor(
+                        io_pool, record_conversion, result, src_encoding, target_encoding, manifest_path, verify_hash
+                    )
+            else:
+                result = await loop.run_in_executor(
+                    io_pool, convert_one, file_path, *args, False, manifest_path, verify_hash, cancel, guess
+                )
+        finally:
+            if reserved:
+                await budget.release(reserved)
+            slots.release()
+        await results.put(result)
+
+    async def produce():
+        tasks = []
+        iterator = iter(file_paths)
+        try:
+            while cancel is None or not cancel.cancelled:
+                # 文件路径可能来自遍历文件夹的生成器，在线程中取下一个，避免阻塞事件循环
+                file_path = await loop.run_in_executor(io_pool, next, iterator, _FINISHED)
+                if file_path is _FINISHED:
+                    break
+                if manifest_path:
+                    # 增量模式：新文件已是最新时不读入文件
+                    skipped = await loop.run_in_executor(
+                        io_pool, skipped_result, file_path, src_encoding, target_encoding,
+                        mirror_folder(file_path, output_folder, source_roots), manifest_path, verify_hash
+                    )
+                    if skipped is not None:
+                        await results.put(skipped)
+                        continue
+                await slots.acquire()
+                try:
+                    size = os.path.getsize(file_path)
+                except OSError:
+                    size = 0
+                reserved = size * factor
+                if reserved > max_inflight_bytes:
+                    reserved = 0
+                else:
+                    await budget.acquire(reserved)
+                tasks.append(asyncio.ensure_future(process(file_path, reserved)))
+                tasks = [task for task in tasks if not task.done()]
+            await asyncio.gather(*tasks)
+        finally:
+            await results.put(_FINISHED)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            result = await results.get()
+            if result is _FINISHED:
+                break
+            if groups is not None:
+                groups.observe(result)
+                async with observed:
+                    observed.notify_all()
+            count_cache(cache_stats, result)
+            log_operation('convert', result)
+            yield result
+            for duplicate in duplicate_results(rejected, src_encoding):
+                yield duplicate
+        for duplicate in duplicate_results(rejected, src_encoding):
+            yield duplicate
+        # 遍历文件路径时出错则抛出
+        await producer
+    finally:
+        producer.cancel()
+        io_pool.shutdown(wait=True)
+        cpu_pool.shutdown(wait=True)
+
+async def _process_in_memory(loop, io_pool, cpu_pool, file_path, src_encoding, target_encoding,
+                             output_folder, delete_original, cache_path, cancel=None, guess=None):
+    """读入 -> 检测与编码 -> 写出，三个阶段分别在读写线程池和计算线程池中执行，写出前检查是否已取消"""
+    result = new_result(file_path, src_encoding)
+    stages = result['stages']
+    start = time.perf_counter()
+    try:
+        data = await loop.run_in_executor(io_pool, _read_file, file_path)
+        result['bytes'] = len(data)
+        stages['read'] = time.perf_counter() - start
+        stage_start = time.perf_counter()
+        encoded = await loop.run_in_executor(
+            cpu_pool, _detect_and_encode, result, data, target_encoding, cache_path, guess, delete_original
+        )
+        stages['convert'] = time.perf_counter() - stage_start
+        del data
+        if encoded is not None:
+            check_cancel(cancel)
+            new_file_path = output_path(file_path, target_encoding, output_folder)
+            stage_start = time.perf_counter()
+            await loop.run_in_executor(io_pool, _write_file, new_file_path, encoded, delete_original)
+            stages['write'] = time.perf_counter() - stage_start
+            result['output'] = new_file_path
+            if delete_original:
+                try:
+                    await loop.run_in_executor(io_pool, os.remove, file_path)
+                except Exception as e:
+                    result['error'] = f"删除原文件失败: {str(e)}"
+            result['success'] = result['error'] is None
+    except Cancelled as e:
+        result['error'] = str(e)
+        result['cancelled'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _read_file(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+def _write_file(file_path, chunks, durable=False):
+    """:param chunks: 转换结果的各块（EncodedChunks）"""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    # 先写临时文件再原子替换，写入失败时不保留写了一半的文件
+    with atomic_output(file_path, durable) as temp_path:
+        with open(temp_path, 'wb') as f:
+            f.writelines(chunks)
+
+def _detect_and_encode(result, data, target_encoding, cache_path, guess=None, strict=False):
+    """
+    检测编码并转换内容，返回转换结果的各块（EncodedChunks），无法检测时在 result 中记录错误并返回 None
+    strict 同 编码转换.convert_file
+    """
+    if result['src_encoding'] == AUTO_DETECT:
+        cache = open_cache(cache_path) if cache_path else None
+        cached = cache.get(result['file']) if cache else None
+        if cached is not None:
+            encoding, confidence, tier = cached[0], cached[1], TIER_CACHE
+        else:
+            encoding, confidence, tier = detect_encoding_bytes(data, guess=guess)
+            # 分组推断的结果不写入缓存，同 编码转换.detect_encoding_tiered
+            if cache and encoding and tier != TIER_GROUP:
+                cache.put(result['file'], encoding, confidence)
+        result['tier'] = tier
+        result['cache_hit'] = tier == TIER_CACHE
+        result['cache_miss'] = cache is not None and tier != TIER_CACHE
+        if not encoding:
+            result['error'] = "无法检测编码"
+            return None
+        result['src_encoding'] = encoding
+        result['confidence'] = confidence
+    output = EncodedChunks()
+    transcode_stream(io.BytesIO(data), output, result['src_encoding'], target_encoding, strict=strict)
+    return output
+
+def iter_pipeline_convert(file_paths, src_encoding, target_encoding, output_folder=None, **kwargs):
+    """
+    pipeline_convert 的同步版本，在后台线程中运行事件循环，可在 QThread 或命令行中直接迭代
+    参数同 pipeline_convert
+    消费方提前停止迭代（break 或关闭生成器）时，后台线程不再开始新的文件，等正在处理的文件结束后退出
+    """
+    results = queue.Queue(maxsize=1024)
+    stop = threading.Event()
+
+    def put(item):
+        # 消费方处理较慢时在这里等待，形成反压；消费方已停止时放弃
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=STOP_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    async def drain():
+        stream = pipeline_convert(file_paths, src_encoding, target_encoding, output_folder, **kwargs)
+        try:
+            async for result in stream:
+                if not await asyncio.get_running_loop().run_in_executor(None, put, result):
+                    break
+        finally:
+            await stream.aclose()
+
+    def run():
+        try:
+            asyncio.run(drain())
+            put(_FINISHED)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _FINISHED:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,252 @@
+import time
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, QTableView, QHeaderView, QAbstractItemView
+)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QSortFilterProxyModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QColor
+
+# 每行的处理状态
+STATUS_PENDING = '待处理'
+STATUS_OK = '成功'
+STATUS_FAILED = '失败'
+STATUS_SKIPPED = '跳过'
+ALL_STATUSES = '全部'
+
+# 排序使用的数据角色：返回原始值（数字按大小排序），而不是显示的文字
+SORT_ROLE = Qt.UserRole
+# 后台线程向界面回传结果的最短间隔（秒），期间的结果合并为一批
+FLUSH_INTERVAL = 0.1
+
+def result_status(row):
+    """
+    根据结果字典判断状态，没有 'success' 的行是还没处理的文件（只有 'file'，或者是重命名计划的预览行，
+    预览行中会被跳过或无法处理的文件分别显示为跳过和失败）；中途被取消的文件没有输出，仍为待处理
+    """
+    if row.get('skipped'):
+        return STATUS_SKIPPED
+    if row.get('cancelled'):
+        return STATUS_PENDING
+    if 'success' not in row:
+        return STATUS_FAILED if row.get('error') else STATUS_PENDING
+    return STATUS_OK if row['success'] else STATUS_FAILED
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+def format_confidence(confidence):
+    return f"{confidence:.2f}"
+
+class ResultTableModel(QAbstractTableModel):
+    """
+    文件列表 / 处理结果表格，每行就是引擎产出的结果字典，不另外复制成字符串
+    columns 为 [(表头, 结果字典的键, 显示格式函数或 None), ...]，键 'status' 表示状态列
+    已在列表中的文件收到结果时原地更新该行，否则追加到末尾；每批结果只发一次插入/更新通知
+    """
+
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self._rows = []
+        self._positions = {}  # 文件路径 -> 行号
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return None
+
+    def row(self, position):
+        return self._rows[position]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        _, key, fmt = self.columns[index.column()]
+        if role == Qt.DisplayRole or role == SORT_ROLE:
+            value = result_status(row) if key == 'status' else row.get(key)
+            if value is None:
+                # 数字列的空值排在最前，文字列用空字符串，避免不同类型混在一起比较
+                return 0 if fmt is not None and role == SORT_ROLE else ''
+            if role == SORT_ROLE or fmt is None:
+                return value
+            return fmt(value)
+        if role == Qt.ForegroundRole:
+            status = result_status(row)
+            if status == STATUS_FAILED:
+                return QColor('red')
+            if status == STATUS_SKIPPED:
+                return QColor('gray')
+        if role == Qt.ToolTipRole:
+            return row.get('error') or row['file']
+        return None
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._positions = {}
+        self.endResetModel()
+
+    def set_files(self, file_paths):
+        """显示待处理的文件列表"""
+        self.beginResetModel()
+        self._rows = [{'file': file_path} for file_path in file_paths]
+        self._positions = {row['file']: position for position, row in enumerate(self._rows)}
+        self.endResetModel()
+
+    def add_results(self, results):
+        """加入一批结果字典"""
+        new_rows = []
+        first = last = None
+        for result in results:
+            position = self._positions.get(result['file'])
+            if position is None:
+                new_rows.append(result)
+                continue
+            self._rows[position] = result
+            first = position if first is None else min(first, position)
+            last = position if last is None else max(last, position)
+        if first is not None:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.columns) - 1))
+        if new_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            for position, result in enumerate(new_rows, start):
+                self._positions.setdefault(result['file'], position)
+            self._rows.extend(new_rows)
+            self.endInsertRows()
+
+class StatusFilterProxy(QSortFilterProxyModel):
+    """按状态和文件名筛选，直接读取源模型中的结果字典，不经过 data()"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.status = None
+        self.text = ''
+        self.setSortRole(SORT_ROLE)
+
+    # 筛选条件变化时用 invalidate 整体重建映射（一次 layoutChanged），
+    # invalidateFilter 会逐段发出行删除通知，几十万行时非常慢
+    def set_status(self, status):
+        self.status = None if status == ALL_STATUSES else status
+        self.invalidate()
+
+    def set_text(self, text):
+        self.text = text.strip().lower()
+        self.invalidate()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        row = self.sourceModel().row(source_row)
+        if self.status is not None and result_status(row) != self.status:
+            return False
+        return not self.text or self.text in row['file'].lower()
+
+class ResultBuffer:
+    """
+    在后台线程中合并结果，间隔 FLUSH_INTERVAL 秒才调用一次 emit(结果列表)
+    避免每个文件都发一次跨线程信号；处理结束时调用 flush 发出剩余的结果
+    """
+
+    def __init__(self, emit, interval=FLUSH_INTERVAL):
+        self.emit = emit
+        self.interval = interval
+        self._items = []
+        self._last = time.monotonic()
+
+    def add(self, result):
+        self._items.append(result)
+        if time.monotonic() - self._last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._items:
+            items, self._items = self._items, []
+            self.emit(items)
+        self._last = time.monotonic()
+
+class ResultView(QWidget):
+    """
+    文件列表与结果表格（两个工具共用）：上方为状态和文件名筛选，下方为表格
+    表格只绘制可见的行，行高固定、不按内容计算列宽，几十万行时也能流畅滚动
+    双击（或回车）某一行时发出 row_activated(该行的结果字典)
+    """
+    row_activated = pyqtSignal(dict)
+
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.model = ResultTableModel(columns, self)
+        self.proxy = StatusFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel('状态:'))
+        self.status_combo = QComboBox()
+        self.status_combo.addItems([ALL_STATUSES, STATUS_PENDING, STATUS_OK, STATUS_FAILED, STATUS_SKIPPED])
+        filter_layout.addWidget(self.status_combo)
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText('按文件路径筛选')
+        filter_layout.addWidget(self.filter_input)
+        self.count_label = QLabel('')
+        filter_layout.addWidget(self.count_label)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setWordWrap(False)
+        self.table.setAlternatingRowColors(True)
+        vertical_header = self.table.verticalHeader()
+        vertical_header.hide()
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(self.table.fontMetrics().height() + 6)
+        horizontal_header = self.table.horizontalHeader()
+        horizontal_header.setSectionResizeMode(QHeaderView.Interactive)
+        horizontal_header.setStretchLastSection(True)
+        horizontal_header.resizeSection(0, 320)
+        # 初始不排序，按处理顺序显示；点击表头后排序
+        horizontal_header.setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+        self.status_combo.currentTextChanged.connect(self.proxy.set_status)
+        self.filter_input.textChanged.connect(self.proxy.set_text)
+        self.table.activated.connect(lambda index: self.row_activated.emit(self._source_row(index)))
+        for signal in (self.proxy.rowsInserted, self.proxy.rowsRemoved, self.proxy.modelReset,
+                       self.proxy.layoutChanged):
+            signal.connect(self.update_count)
+        self.update_count()
+
+    def _source_row(self, index):
+        return self.model.row(self.proxy.mapToSource(index).row())
+
+    def current_row(self):
+        """返回当前选中行的结果字典，没有选中行时返回 None"""
+        index = self.table.currentIndex()
+        return self._source_row(index) if index.isValid() else None
+
+    def set_files(self, file_paths):
+        self.model.set_files(file_paths)
+
+    def add_results(self, results):
+        self.model.add_results(results)
+
+    def clear(self):
+        self.model.clear()
+
+    def update_count(self, *args):
+        total = self.model.rowCount()
+        shown = self.proxy.rowCount()
+        if shown == total:
+            self.count_label.setText(f"共 {total} 项")
+        else:
+            self.count_label.setText(f"显示 {shown} / 共 {total} 项")
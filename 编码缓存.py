@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+from multiprocessing import util
+
+# 缓存数据库路径（与 tool_config.ini 放在同一目录）
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "encoding_cache.db")
+# 缓存最多保留的条目数，超出后按最近使用时间淘汰
+DEFAULT_MAX_ENTRIES = 100000
+# 每写入多少条检查一次是否需要淘汰
+EVICT_CHECK_INTERVAL = 1000
+# 命中时只在内存中记下最近使用时间，累计这么多条后才一次写入数据库
+TOUCH_FLUSH_INTERVAL = 1000
+
+def file_identity(file_path):
+    """返回文件身份 (绝对路径, 大小, mtime_ns, inode)，文件内容变化时至少有一项会变"""
+    st = os.stat(file_path)
+    return os.path.abspath(file_path), st.st_size, st.st_mtime_ns, st.st_ino
+
+class DetectionCache:
+    """
+    持久化的编码检测结果缓存，以文件身份为键，超出容量时淘汰最久未使用的条目
+    命中时不写数据库，最近使用时间攒够 TOUCH_FLUSH_INTERVAL 条、写入新条目或关闭时才批量写入
+    hits / misses 记录本实例的命中与未命中次数（多进程时各子进程各自统计，汇总见 批量转换 的结果）
+    """
+
+    def __init__(self, db_path=CACHE_FILE, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._touched = {}  # 路径 -> 还没写入数据库的最近使用时间
+        self._closed = False
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS detection ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " encoding TEXT, confidence REAL, last_used INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS detection_last_used ON detection(last_used)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT MAX(last_used) FROM detection").fetchone()
+        self._clock = row[0] or 0
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get(self, file_path):
+        """文件未变化时返回缓存的 (编码, 置信度)，否则返回 None"""
+        path, size, mtime_ns, inode = file_identity(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, encoding, confidence FROM detection WHERE path = ?",
+                (path,)
+            ).fetchone()
+            if row is None or row[:3] != (size, mtime_ns, inode):
+                self.misses += 1
+                return None
+            self._touched[path] = self._tick()
+            if len(self._touched) >= TOUCH_FLUSH_INTERVAL:
+                self._flush_touched()
+                self._conn.commit()
+            self.hits += 1
+            return row[3], row[4]
+
+    def _flush_touched(self):
+        """把内存中记下的最近使用时间写入数据库（调用方持有锁并负责提交）"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE detection SET last_used = ? WHERE path = ?",
+                [(tick, path) for path, tick in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def put(self, file_path, encoding, confidence):
+        """记录文件的检测结果"""
+        path, size, mtime_ns, inode = file_identity(file_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detection VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, inode, encoding, confidence, self._tick())
+            )
+            self._touched.pop(path, None)
+            self._puts += 1
+            if self._puts % EVICT_CHECK_INTERVAL == 0:
+                self._evict()
+            self._flush_touched()
+            self._conn.commit()
+
+    def _evict(self):
+        self._flush_touched()
+        count = self._conn.execute("SELECT COUNT(*) FROM detection").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM detection WHERE path IN"
+                " (SELECT path FROM detection ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self):
+        """返回命中统计 {'hits', 'misses', 'entries'}"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM detection").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+    def flush(self):
+        """写入还在内存中的最近使用时间"""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_touched()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM detection")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._evict()
+            self._conn.commit()
+            self._conn.close()
+            self._closed = True
+
+# 每个进程各自持有的缓存实例（sqlite 连接不能跨进程共享）
+_process_caches = {}
+
+def open_cache(db_path=CACHE_FILE):
+    """返回当前进程中 db_path 对应的缓存实例，批量转换的子进程通过它复用连接"""
+    key = (os.getpid(), db_path)
+    cache = _process_caches.get(key)
+    if cache is None:
+        cache = DetectionCache(db_path)
+        _process_caches[key] = cache
+        # 进程退出时写入攒下的最近使用时间；multiprocessing 的退出处理在主进程和进程池的子进程中都会执行
+        util.Finalize(cache, cache.flush, exitpriority=10)
+    return cache
@@ -1,44 +1,268 @@
 #!/usr/bin/env python3
 import os
 import argparse
-import chardet
+import codecs
+import io
+from 断点续传 import atomic_output
+from 进度 import check_cancel
 
-def detect_encoding(file_path):
+# 编码检测每次读取的块大小
+DETECT_CHUNK_SIZE = 64 * 1024
+# 编码检测最多读取的字节数（None 表示不限制）
+DETECT_MAX_BYTES = 4 * 1024 * 1024
+
+# 常见 BOM 与对应编码，utf-32 的 BOM 以 utf-16 的 BOM 开头，需要先判断
+BOM_ENCODINGS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 只读了前 max_bytes 字节就判定为 UTF-8 时的置信度（后面的内容没有校验）
+BUDGET_UTF8_CONFIDENCE = 0.9
+
+# 检测方式：缓存命中、BOM、纯 ASCII、UTF-8 校验、按同组文件推断的编码严格解码、chardet
+TIER_CACHE = 'cache'
+TIER_BOM = 'bom'
+TIER_ASCII = 'ascii'
+TIER_UTF8 = 'utf-8'
+TIER_GROUP = 'group'
+TIER_CHARDET = 'chardet'
+
+def detect_encoding(file_path, chunk_size=DETECT_CHUNK_SIZE, max_bytes=DETECT_MAX_BYTES, cache=None):
     """
     自动检测文件编码格式，返回编码名称和置信度
+    :param file_path: 文件路径
+    :param chunk_size: 每次读取的字节数
+    :param max_bytes: 最多读取的字节数，None 表示读完整个文件
+    :param cache: 编码缓存.DetectionCache 实例，文件未变化时直接返回缓存结果
+    :return: (编码名称, 置信度)
     """
-    with open(file_path, 'rb') as f:
-        raw_data = f.read()
-    result = chardet.detect(raw_data)
-    encoding = result.get('encoding')
-    confidence = result.get('confidence')
+    encoding, confidence, _ = detect_encoding_tiered(file_path, chunk_size, max_bytes, cache)
     return encoding, confidence
 
-def convert_file(file_path, src_encoding, target_encoding):
+def detect_encoding_tiered(file_path, chunk_size=DETECT_CHUNK_SIZE, max_bytes=DETECT_MAX_BYTES, cache=None,
+                           guess=None):
+    """
+    分层检测文件编码：缓存 -> BOM -> 纯 ASCII / 严格 UTF-8 校验 -> 按推测的编码严格解码 -> chardet
+    前面的层能确定结果时就不再调用 chardet
+    :param guess: 推测的 (编码, 置信度)，如按同一文件夹中其他文件推断出的编码（见 分组检测.EncodingGroups），
+                  读取的内容能按该编码严格解码时直接采用，不调用 chardet；这样得到的结果不写入缓存
+    :return: (编码名称, 置信度, 检测方式)，检测方式为 TIER_* 之一
+    """
+    if cache is not None:
+        cached = cache.get(file_path)
+        if cached is not None:
+            return cached[0], cached[1], TIER_CACHE
+
+    with open(file_path, 'rb') as f:
+        encoding, confidence, tier = _detect_stream(f, chunk_size, max_bytes, guess)
+
+    # 按推测的编码校验通过只说明没有不合法的字节，不能当作该文件自己的检测结果长期保存
+    if cache is not None and encoding and tier != TIER_GROUP:
+        cache.put(file_path, encoding, confidence)
+    return encoding, confidence, tier
+
+def detect_encoding_bytes(data, chunk_size=DETECT_CHUNK_SIZE, max_bytes=DETECT_MAX_BYTES, guess=None):
+    """对已读入内存的内容做分层检测，返回 (编码名称, 置信度, 检测方式)，guess 同 detect_encoding_tiered"""
+    return _detect_stream(io.BytesIO(data), chunk_size, max_bytes, guess)
+
+def _detect_stream(f, chunk_size, max_bytes, guess=None):
+    """依次尝试 BOM、ASCII / UTF-8 校验、推测的编码和 chardet，f 为可 seek 的二进制流"""
+    result = sniff_bom(f.read(4))
+    if result is None:
+        f.seek(0)
+        result = _validate_utf8(f, chunk_size, max_bytes)
+    if result is None and guess is not None:
+        f.seek(0)
+        result = _validate_guess(f, guess, chunk_size, max_bytes)
+    if result is None:
+        f.seek(0)
+        result = _chardet_detect(f, chunk_size, max_bytes)
+    return result
+
+def sniff_bom(head):
+    """根据文件开头的字节判断 BOM，返回 (编码, 置信度, 检测方式)，没有 BOM 时返回 None"""
+    for bom, encoding in BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding, 1.0, TIER_BOM
+    return None
+
+def _iter_chunks(f, chunk_size, max_bytes):
+    """按块读取文件，最多读取 max_bytes 字节"""
+    remaining = max_bytes
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk = f.read(size)
+        if not chunk:
+            return
+        yield chunk
+        if remaining is not None:
+            remaining -= len(chunk)
+
+def _validate_utf8(f, chunk_size, max_bytes):
+    """
+    检查内容是否为纯 ASCII 或合法的 UTF-8，是则返回结果，否则返回 None
+    读满 max_bytes 且后面还有内容时结尾可能截断了多字节序列，此时不做结尾检查；
+    没读到的部分可能有非 ASCII 内容，即使读到的都是 ASCII 也只报告为 UTF-8（ASCII 的超集），
+    置信度降为 BUDGET_UTF8_CONFIDENCE
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    is_ascii = True
+    read = 0
+    try:
+        for chunk in _iter_chunks(f, chunk_size, max_bytes):
+            read += len(chunk)
+            if is_ascii and chunk.isascii():
+                continue
+            is_ascii = False
+            decoder.decode(chunk)
+        # 读满 max_bytes 时再读一个字节确认后面是否还有内容
+        truncated = max_bytes is not None and read >= max_bytes and bool(f.read(1))
+        if not truncated:
+            decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return None
+    if truncated:
+        return 'utf-8', BUDGET_UTF8_CONFIDENCE, TIER_UTF8
+    if is_ascii:
+        return 'ascii', 1.0, TIER_ASCII
+    return 'utf-8', 0.99, TIER_UTF8
+
+def _validate_guess(f, guess, chunk_size, max_bytes):
+    """按推测的编码严格解码，全部能解码时返回 (编码, 置信度, TIER_GROUP)，否则返回 None"""
+    encoding, confidence = guess
+    decoder = codecs.getincrementaldecoder(encoding)()
+    read = 0
+    try:
+        for chunk in _iter_chunks(f, chunk_size, max_bytes):
+            read += len(chunk)
+            decoder.decode(chunk)
+        if max_bytes is None or read < max_bytes:
+            decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return None
+    return encoding, confidence, TIER_GROUP
+
+def _chardet_detect(f, chunk_size, max_bytes):
+    """分块读取文件并交给 UniversalDetector，检测器有结论或读满 max_bytes 后即停止"""
+    # chardet 导入较慢，只在前面的检测方式都无法确定时才导入
+    import chardet
+    detector = chardet.UniversalDetector()
+    for chunk in _iter_chunks(f, chunk_size, max_bytes):
+        detector.feed(chunk)
+        if detector.done:
+            break
+    detector.close()
+    result = detector.result
+    return result.get('encoding'), result.get('confidence'), TIER_CHARDET
+
+# 转换时每次读取的块大小
+CONVERT_CHUNK_SIZE = 1024 * 1024
+
+def convert_file(file_path, src_encoding, target_encoding, output_folder=None, chunk_size=CONVERT_CHUNK_SIZE,
+                 durable=False, cancel=None, strict=False):
     """
-    读取原文件内容，并转换为目标编码，生成新文件，新文件名在原文件名后加上源编码后缀
+    读取原文件内容，并转换为目标编码，生成新文件，新文件名在原文件名后加上目标编码后缀
+    使用增量解码器/编码器分块转换，内存占用与文件大小无关
+    新文件先写到临时文件，完成后原子替换，不会留下写了一半的新文件
+    :param file_path: 源文件路径
+    :param src_encoding: 源编码
+    :param target_encoding: 目标编码
+    :param output_folder: 输出文件夹，默认为源文件所在文件夹；不存在时创建
+    :param chunk_size: 每次读取的字节数
+    :param durable: 返回前确保新文件已写盘（之后要删除源文件时使用）
+    :param cancel: 进度.CancelToken，每块之间检查，取消时抛出 进度.Cancelled 并删除临时文件
+    :param strict: 遇到无法按源编码解码的内容时抛出 ValueError（不生成新文件），而不是替换为 U+FFFD；
+                   之后要删除源文件时必须使用，否则被替换的原始字节就再也找不回来了
+    :return: 新文件路径
     """
+    new_file_path = output_path(file_path, target_encoding, output_folder)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+
+    # 分块读取、解码、编码并写入临时文件，失败时临时文件会被删除
+    with atomic_output(new_file_path, durable) as temp_path:
+        with open(file_path, 'rb') as src_file, open(temp_path, 'wb') as dst_file:
+            transcode_stream(src_file, dst_file, src_encoding, target_encoding, chunk_size, cancel, strict)
+    return new_file_path
+
+def output_path(file_path, target_encoding, output_folder=None):
+    """返回转换后的新文件路径：在原文件名后加上目标编码后缀"""
     # 获取路径和文件名信息
-    dir_name = os.path.dirname(file_path)
+    dir_name = output_folder if output_folder else os.path.dirname(file_path)
     base_name = os.path.basename(file_path)
     name, ext = os.path.splitext(base_name)
     # 构造新文件名
     new_filename = f"{name}_{target_encoding}{ext}"
-    new_file_path = os.path.join(dir_name, new_filename)
+    return os.path.join(dir_name, new_filename)
 
-    # 读取内容并写入新文件
-    with open(file_path, 'r', encoding=src_encoding, errors='replace') as f:
-        content = f.read()
-    with open(new_file_path, 'w', encoding=target_encoding) as f:
-        f.write(content)
+def mirror_folder(file_path, output_folder, source_roots=None):
+    """
+    返回文件的输出文件夹：文件在 source_roots 中某个文件夹之下时，在 output_folder 下保留它相对该文件夹的子文件夹
+    （遍历子文件夹时不同子文件夹中的同名文件不会写到同一个新文件）；否则就是 output_folder
+    :param source_roots: 遍历的源文件夹列表，None 表示不保留子文件夹
+    """
+    if not output_folder or not source_roots:
+        return output_folder
+    folder = os.path.dirname(os.path.abspath(file_path))
+    for root in source_roots:
+        try:
+            relative = os.path.relpath(folder, os.path.abspath(root))
+        except ValueError:
+            # Windows 上不在同一个盘
+            continue
+        if relative == os.curdir:
+            return output_folder
+        if relative != os.pardir and not relative.startswith(os.pardir + os.sep):
+            return os.path.join(output_folder, relative)
+    return output_folder
 
-    print(f"转换成功！\n原编码：{src_encoding}\n目标编码：{target_encoding}\n新文件：{new_file_path}")
+def transcode_stream(src_file, dst_file, src_encoding, target_encoding, chunk_size=CONVERT_CHUNK_SIZE, cancel=None,
+                     strict=False):
+    """
+    在两个二进制流之间做编码转换，返回写入的字节数
+    被拆分在块边界上的多字节序列由增量解码器缓存到下一块；
+    源文件开头的 BOM 会被去掉，目标编码需要 BOM 时（如 utf-16）由编码器写入一次
+    传入 cancel（进度.CancelToken）时每块之前检查，已取消则抛出 进度.Cancelled
+    strict 为 True 时遇到无法解码的内容抛出 ValueError，否则替换为 U+FFFD
+    """
+    decoder = codecs.getincrementaldecoder(src_encoding)(errors='strict' if strict else 'replace')
+    encoder = codecs.getincrementalencoder(target_encoding)()
+    written = 0
+    offset = 0
+    at_start = True
+    while True:
+        check_cancel(cancel)
+        chunk = src_file.read(chunk_size)
+        final = not chunk
+        try:
+            text = decoder.decode(chunk, final=final)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"第 {offset + e.start} 字节附近的内容无法按 {src_encoding} 解码，"
+                             f"为避免丢失原内容没有转换") from None
+        offset += len(chunk)
+        if at_start and text:
+            # utf-8 等编码的解码器不会去掉 BOM，这里统一处理
+            if text[0] == '\ufeff':
+                text = text[1:]
+            at_start = False
+        data = encoder.encode(text, final=final)
+        if data:
+            dst_file.write(data)
+            written += len(data)
+        if final:
+            return written
 
 def main():
     parser = argparse.ArgumentParser(description="自动识别并转换TXT文件编码格式")
     parser.add_argument("file", help="TXT 文件路径")
     parser.add_argument("-s", "--src", help="手动指定原文件编码格式，如果不指定则自动检测")
     parser.add_argument("-t", "--target", default="utf-8", help="目标编码格式，默认为 utf-8")
+    parser.add_argument("--max-bytes", type=int, default=DETECT_MAX_BYTES,
+                        help="自动检测时最多读取的字节数，0 表示读取整个文件")
     args = parser.parse_args()
 
     file_path = args.file
@@ -54,14 +278,15 @@ def main():
         src_encoding = args.src
         print(f"手动指定原编码格式为：{src_encoding}")
     else:
-        src_encoding, confidence = detect_encoding(file_path)
+        src_encoding, confidence, tier = detect_encoding_tiered(file_path, max_bytes=args.max_bytes or None)
         if not src_encoding:
             print("无法检测文件编码，请尝试手动指定。")
             return
-        print(f"自动检测到的原编码格式为：{src_encoding}，置信度：{confidence:.2f}")
+        print(f"自动检测到的原编码格式为：{src_encoding}，置信度：{confidence:.2f}，检测方式：{tier}")
 
     # 转换文件编码
-    convert_file(file_path, src_encoding, target_encoding)
+    new_file_path = convert_file(file_path, src_encoding, target_encoding)
+    print(f"转换成功！\n原编码：{src_encoding}\n目标编码：{target_encoding}\n新文件：{new_file_path}")
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,34 @@
 # 导入必要的模块
 import os
-import configparser
 from PyQt5.QtWidgets import (
-    QWidget, QPushButton, QVBoxLayout, QLabel, QLineEdit, QFileDialog, QHBoxLayout, QMessageBox, QComboBox, QCheckBox
+    QWidget, QPushButton, QVBoxLayout, QLabel, QLineEdit, QFileDialog, QHBoxLayout, QMessageBox, QComboBox, QCheckBox,
+    QSpinBox, QTabWidget, QPlainTextEdit, QProgressBar
 )
+from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QColor
-from 编码转换 import detect_encoding, convert_file  # 引入编码转换模块
-
-# 配置文件路径（与重命名 UI 共用）
-CONFIG_FILE = os.path.join(os.path.dirname(__file__), "tool_config.ini")
+from 批量转换 import batch_convert, DEFAULT_WORKERS  # 引入批量转换模块
+from 流水线转换 import iter_pipeline_convert
+from 编码缓存 import CACHE_FILE
+from 文件遍历 import iter_files
+from 设置 import get_settings
+from 结果列表 import ResultView, ResultBuffer, format_ms, format_confidence
+from 断点续传 import open_journal
+from 编码转换 import output_path, mirror_folder
+from 编码预览 import preview_with_detection
+from 拖放导入 import FileCollector, dropped_paths
+from 进度 import CancelToken, ProgressMeter, format_progress, total_size
+
+# 结果表格的列：(表头, 结果字典的键, 显示格式)
+RESULT_COLUMNS = [
+    ('文件', 'file', None),
+    ('状态', 'status', None),
+    ('源编码', 'src_encoding', None),
+    ('置信度', 'confidence', format_confidence),
+    ('检测方式', 'tier', None),
+    ('耗时(ms)', 'seconds', format_ms),
+    ('输出文件', 'output', None),
+    ('错误', 'error', None),
+]
 
 # 定义常用编码格式列表
 SUPPORTED_ENCODINGS = [
@@ -25,10 +45,139 @@ SUPPORTED_ENCODINGS = [
     'iso-8859-1'
 ]
 
+class ConversionWorker(QThread):
+    """
+    在后台线程中运行批量转换，结果合并成批通过 results_ready 回传，进度字典（见 进度.ProgressMeter）
+    限速后通过 progress 回传；调用 cancel 取消批次
+    batch_done 参数为汇总字典 {'success', 'processed', 'failed', 'skipped', 'saved_seconds',
+    'resumed', 'tiers', 'cancelled', 'error'}，tiers 为各检测方式的文件数，
+    cancelled 为是否被取消，error 为中断原因
+    """
+    results_ready = pyqtSignal(list)
+    progress = pyqtSignal(dict)
+    batch_done = pyqtSignal(dict)
+
+    def __init__(self, file_paths, src_encoding, target_encoding, output_folder, delete_original, workers,
+                 pipeline=False, journal_params=None, resume=False, incremental=False, verify_hash=False,
+                 group_detect=False, source_roots=None):
+        """
+        file_paths 可以是列表，也可以是遍历文件夹的生成器（此时总数未知，进度中的总数为 0）
+        pipeline 为 True 时使用流水线模式（读写与转换重叠进行）
+        journal_params 为识别批次的参数，用于记录批次日志；resume 为 True 时跳过上次已完成的文件
+        incremental 为 True 时跳过新文件已是最新的文件，verify_hash 为 True 时用内容哈希确认源文件是否变化
+        group_detect 为 True 时按文件夹和后缀分组推断编码，组内文件只做严格解码校验
+        source_roots 为遍历的源文件夹，新文件在输出文件夹下保留相对它们的子文件夹
+        """
+        super().__init__()
+        self.file_paths = file_paths
+        self.src_encoding = src_encoding
+        self.target_encoding = target_encoding
+        self.output_folder = output_folder
+        self.delete_original = delete_original
+        self.workers = workers
+        self.pipeline = pipeline
+        self.journal_params = journal_params
+        self.resume = resume
+        self.incremental = incremental
+        self.verify_hash = verify_hash
+        self.group_detect = group_detect
+        self.source_roots = source_roots
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """请求取消：不再开始新的文件，正在转换的文件在块之间停止，不留下不完整的新文件"""
+        self.cancel_token.cancel()
+
+    def run(self):
+        stats = {'success': 0, 'processed': 0, 'failed': 0, 'skipped': 0, 'saved_seconds': 0.0,
+                 'resumed': 0, 'tiers': {}, 'cancelled': False, 'error': ''}
+        tier_counts = stats['tiers']
+        processed = 0
+        manifest_path = CACHE_FILE if self.incremental else None
+        buffer = ResultBuffer(self.results_ready.emit)
+        journal = None
+        finished = False
+        try:
+            # 文件列表已知时统计总大小，按字节估算剩余时间
+            if isinstance(self.file_paths, list):
+                meter = ProgressMeter(len(self.file_paths), total_size(self.file_paths), self.progress.emit)
+            else:
+                meter = ProgressMeter(emit=self.progress.emit)
+            file_paths = self.file_paths
+            if self.journal_params is not None:
+                journal = open_journal('convert', self.journal_params, self.resume, self.delete_original)
+                file_paths = journal.pending(file_paths, lambda file_path: output_path(
+                    file_path, self.target_encoding, mirror_folder(file_path, self.output_folder, self.source_roots)
+                ))
+            if self.pipeline:
+                results = iter_pipeline_convert(
+                    file_paths, self.src_encoding, self.target_encoding, self.output_folder,
+                    delete_original=self.delete_original, cache_path=CACHE_FILE, cpu_threads=self.workers,
+                    manifest_path=manifest_path, verify_hash=self.verify_hash, cancel=self.cancel_token,
+                    group_detect=self.group_detect, source_roots=self.source_roots
+                )
+            else:
+                results = batch_convert(
+                    file_paths, self.src_encoding, self.target_encoding,
+                    self.output_folder, self.delete_original, self.workers, CACHE_FILE,
+                    manifest_path=manifest_path, verify_hash=self.verify_hash, cancel=self.cancel_token,
+                    group_detect=self.group_detect, source_roots=self.source_roots
+                )
+            if journal is not None:
+                results = journal.track(results)
+            for done, result in enumerate(meter.track(results), 1):
+                if result['tier']:
+                    tier_counts[result['tier']] = tier_counts.get(result['tier'], 0) + 1
+                if result['skipped']:
+                    stats['skipped'] += 1
+                    stats['saved_seconds'] += result['saved_seconds']
+                elif result['success']:
+                    stats['success'] += 1
+                elif not result['cancelled']:
+                    # 中途被取消的文件没有输出，不算失败
+                    stats['failed'] += 1
+                processed = done
+                buffer.add(result)
+            # 被取消的批次保留日志，勾选续传后可以接着处理剩下的文件
+            finished = not self.cancel_token.cancelled
+        except Exception as e:
+            stats['error'] = str(e)
+        finally:
+            if journal is not None:
+                journal.close(finished)
+        buffer.flush()
+        stats['processed'] = processed
+        stats['resumed'] = journal.resumed if journal is not None else 0
+        stats['cancelled'] = self.cancel_token.cancelled
+        self.batch_done.emit(stats)
+
+class PreviewWorker(QThread):
+    """在后台线程中检测编码并抽样预览文件，preview_ready 参数为 (预览结果, 出错原因)"""
+    preview_ready = pyqtSignal(dict, str)
+
+    def __init__(self, file_path, alternatives):
+        super().__init__()
+        self.file_path = file_path
+        self.alternatives = alternatives
+
+    def run(self):
+        try:
+            preview = preview_with_detection(self.file_path, self.alternatives)
+            preview['file'] = self.file_path
+            self.preview_ready.emit(preview, '')
+        except Exception as e:
+            self.preview_ready.emit({'file': self.file_path}, str(e))
+
 class EncodingConverterUI(QWidget):
     def __init__(self):
         super().__init__()
         self.selected_files = []
+        self.selected_folder = ""
+        self.dropped_paths = []  # 拖入的文件和文件夹，按与选择文件夹相同的方式决定输出位置
+        self.worker = None
+        self.preview_worker = None
+        self.collector = None
+        self.stopping_collectors = set()  # 已取消、还没结束的导入线程
         self.init_ui()
         self.load_settings()
 
@@ -51,11 +200,28 @@ class EncodingConverterUI(QWidget):
         # 修改文件选择部分
         file_label = QLabel('选择源文件(支持多选):')
         self.file_input = QLineEdit()
+        self.file_input.setPlaceholderText('也可以把文件或文件夹拖到窗口中')
         file_button = QPushButton('浏览...')
+        folder_button = QPushButton('选择文件夹...')
+        self.cancel_import_button = QPushButton('取消导入')
+        self.cancel_import_button.hide()
         file_layout = QHBoxLayout()
         file_layout.addWidget(self.file_input)
         file_layout.addWidget(file_button)
+        file_layout.addWidget(folder_button)
+        file_layout.addWidget(self.cancel_import_button)
         layout.addLayout(file_layout)
+        self.setAcceptDrops(True)
+
+        # 文件夹模式的过滤条件
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel('文件过滤:'))
+        self.include_input = QLineEdit()
+        self.include_input.setPlaceholderText('选择文件夹时生效，用空格分隔，如: *.txt *.lrc')
+        filter_layout.addWidget(self.include_input)
+        self.recursive_checkbox = QCheckBox('包含子文件夹')
+        filter_layout.addWidget(self.recursive_checkbox)
+        layout.addLayout(filter_layout)
 
         # 源编码选择
         src_encoding_label = QLabel('源文件编码:')
@@ -96,21 +262,81 @@ class EncodingConverterUI(QWidget):
         self.delete_original_checkbox = QCheckBox("转换后删除原文件")
         layout.addWidget(self.delete_original_checkbox)
 
+        # 并行进程数
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel('并行进程数:'))
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, max(DEFAULT_WORKERS * 2, 1))
+        self.workers_spinbox.setValue(DEFAULT_WORKERS)
+        workers_layout.addWidget(self.workers_spinbox)
+        self.pipeline_checkbox = QCheckBox('流水线模式(适合机械硬盘/网络盘)')
+        workers_layout.addWidget(self.pipeline_checkbox)
+        self.group_detect_checkbox = QCheckBox('按文件夹推断编码')
+        self.group_detect_checkbox.setToolTip('同一文件夹中相同后缀的文件抽样检测几个，其余文件只校验能否按该编码解码，'
+                                              '校验不通过的才完整检测；适合大量同一来源的文件')
+        workers_layout.addWidget(self.group_detect_checkbox)
+        workers_layout.addStretch()
+        layout.addLayout(workers_layout)
+
+        # 续传与增量模式
+        options_layout = QHBoxLayout()
+        self.resume_checkbox = QCheckBox('断点续传(跳过上次中断前已完成的文件)')
+        options_layout.addWidget(self.resume_checkbox)
+        self.incremental_checkbox = QCheckBox('增量模式(跳过未变化的文件)')
+        options_layout.addWidget(self.incremental_checkbox)
+        self.verify_hash_checkbox = QCheckBox('校验内容哈希')
+        self.verify_hash_checkbox.setToolTip('源文件修改时间变化但大小不变时，比较内容确认是否真的变化')
+        options_layout.addWidget(self.verify_hash_checkbox)
+        options_layout.addStretch()
+        layout.addLayout(options_layout)
+
+        # 编码预览：抽样显示文件内容按检测到的编码和备选编码解码的结果
+        preview_layout = QHBoxLayout()
+        preview_layout.addWidget(QLabel('编码预览:'))
+        self.preview_encodings_input = QLineEdit()
+        self.preview_encodings_input.setPlaceholderText('对比的编码，用空格分隔，如: gbk big5 shift-jis')
+        preview_layout.addWidget(self.preview_encodings_input)
+        self.preview_button = QPushButton('预览所选文件')
+        self.preview_button.setToolTip('预览列表中选中的文件（也可以双击列表中的文件）')
+        preview_layout.addWidget(self.preview_button)
+        layout.addLayout(preview_layout)
+
         # 转换按钮
         convert_button = QPushButton('开始转换')
-        layout.addWidget(convert_button)
+        self.convert_button = convert_button
+        self.cancel_button = QPushButton('取消转换')
+        self.cancel_button.hide()
+        convert_layout = QHBoxLayout()
+        convert_layout.addWidget(convert_button, 1)
+        convert_layout.addWidget(self.cancel_button)
+        layout.addLayout(convert_layout)
 
         # 结果显示
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
         self.result_label = QLabel('')
         layout.addWidget(self.result_label)
+        self.result_view = ResultView(RESULT_COLUMNS)
+        layout.addWidget(self.result_view, 1)
+        self.preview_tabs = QTabWidget()
+        self.preview_tabs.setMaximumHeight(240)
+        self.preview_tabs.hide()
+        layout.addWidget(self.preview_tabs)
 
         # 设置窗口布局
         self.setLayout(layout)
 
         # 绑定按钮事件
         file_button.clicked.connect(self.select_file)
+        folder_button.clicked.connect(self.select_folder)
         output_folder_button.clicked.connect(self.select_output_folder)
         convert_button.clicked.connect(self.start_conversion)
+        self.cancel_button.clicked.connect(self.cancel_conversion)
+        self.preview_button.clicked.connect(self.preview_selected)
+        self.cancel_import_button.clicked.connect(lambda: self.cancel_import())
+        self.result_view.row_activated.connect(lambda row: self.start_preview(row['file']))
         self.src_encoding_input.textChanged.connect(self.update_style)
         self.target_encoding_input.textChanged.connect(self.update_style)
         self.delete_original_checkbox.stateChanged.connect(self.on_delete_checkbox_changed)
@@ -126,62 +352,62 @@ class EncodingConverterUI(QWidget):
                 self.delete_original_checkbox.setChecked(False)
 
     def load_settings(self):
-        config = configparser.ConfigParser()
+        settings = get_settings()
         # 断开信号，防止加载时弹窗
         try:
             self.delete_original_checkbox.stateChanged.disconnect(self.on_delete_checkbox_changed)
         except Exception:
             pass
-        if os.path.exists(CONFIG_FILE):
-            config.read(CONFIG_FILE, encoding="utf-8")
-            # 恢复输出文件夹
-            output_folder = config.get("encoding", "output_folder", fallback="")
-            self.output_folder_input.setText(output_folder)
-            # 恢复自定义源编码
-            self.src_encoding_input.setText(config.get("encoding", "src_encoding_input", fallback=""))
-            # 恢复自定义目标编码
-            self.target_encoding_input.setText(config.get("encoding", "target_encoding_input", fallback=""))
-            # 恢复下拉选项
-            self.src_encoding_combo.setCurrentText(config.get("encoding", "src_encoding_combo", fallback="自动检测"))
-            self.target_encoding_combo.setCurrentText(config.get("encoding", "target_encoding_combo", fallback="utf-8"))
-            # 恢复上次源文件夹
-            last_source_folder = config.get("encoding", "last_source_folder", fallback="")
-            self.last_source_folder = last_source_folder
-            if last_source_folder:
-                self.file_input.setText(f"上次源文件夹: {last_source_folder}")
-            # 恢复删除源文件复选框
-            delete_original = config.getboolean("encoding", "delete_original", fallback=False)
-            self.delete_original_checkbox.setChecked(delete_original)
-        else:
-            self.output_folder_input.setText("")
-            self.src_encoding_input.setText("")
-            self.target_encoding_input.setText("")
-            self.src_encoding_combo.setCurrentText("自动检测")
-            self.target_encoding_combo.setCurrentText("utf-8")
-            self.last_source_folder = ""
-            self.delete_original_checkbox.setChecked(False)
+        # 恢复输出文件夹
+        self.output_folder_input.setText(settings.get("encoding", "output_folder"))
+        # 恢复自定义源编码
+        self.src_encoding_input.setText(settings.get("encoding", "src_encoding_input"))
+        # 恢复自定义目标编码
+        self.target_encoding_input.setText(settings.get("encoding", "target_encoding_input"))
+        # 恢复下拉选项
+        self.src_encoding_combo.setCurrentText(settings.get("encoding", "src_encoding_combo", fallback="自动检测"))
+        self.target_encoding_combo.setCurrentText(settings.get("encoding", "target_encoding_combo", fallback="utf-8"))
+        # 恢复上次源文件夹
+        last_source_folder = settings.get("encoding", "last_source_folder")
+        self.last_source_folder = last_source_folder
+        if last_source_folder:
+            self.file_input.setText(f"上次源文件夹: {last_source_folder}")
+        # 恢复删除源文件复选框
+        self.delete_original_checkbox.setChecked(settings.getboolean("encoding", "delete_original"))
+        # 恢复并行进程数
+        self.workers_spinbox.setValue(settings.getint("encoding", "workers", fallback=DEFAULT_WORKERS))
+        # 恢复文件夹模式的过滤条件
+        self.include_input.setText(settings.get("encoding", "include_patterns"))
+        self.recursive_checkbox.setChecked(settings.getboolean("encoding", "include_subfolders"))
+        self.pipeline_checkbox.setChecked(settings.getboolean("encoding", "pipeline"))
+        self.group_detect_checkbox.setChecked(settings.getboolean("encoding", "group_detect"))
+        self.resume_checkbox.setChecked(settings.getboolean("encoding", "resume"))
+        self.incremental_checkbox.setChecked(settings.getboolean("encoding", "incremental"))
+        self.verify_hash_checkbox.setChecked(settings.getboolean("encoding", "verify_hash"))
+        self.preview_encodings_input.setText(settings.get("encoding", "preview_encodings"))
         # 恢复信号连接
         self.delete_original_checkbox.stateChanged.connect(self.on_delete_checkbox_changed)
 
     def save_settings(self):
-        config = configparser.ConfigParser()
-        if os.path.exists(CONFIG_FILE):
-            config.read(CONFIG_FILE, encoding="utf-8")
-        config["encoding"] = {
+        """写入共享设置（内存），由设置模块延迟写盘"""
+        get_settings().update("encoding", {
             "output_folder": self.output_folder_input.text(),
             "src_encoding_input": self.src_encoding_input.text(),
             "target_encoding_input": self.target_encoding_input.text(),
             "src_encoding_combo": self.src_encoding_combo.currentText(),
             "target_encoding_combo": self.target_encoding_combo.currentText(),
             "last_source_folder": getattr(self, "last_source_folder", ""),
-            "delete_original": str(self.delete_original_checkbox.isChecked()),
-        }
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            config.write(f)
-
-    def showEvent(self, event):
-        self.load_settings()
-        super().showEvent(event)
+            "delete_original": self.delete_original_checkbox.isChecked(),
+            "workers": self.workers_spinbox.value(),
+            "include_patterns": self.include_input.text(),
+            "include_subfolders": self.recursive_checkbox.isChecked(),
+            "pipeline": self.pipeline_checkbox.isChecked(),
+            "group_detect": self.group_detect_checkbox.isChecked(),
+            "resume": self.resume_checkbox.isChecked(),
+            "incremental": self.incremental_checkbox.isChecked(),
+            "verify_hash": self.verify_hash_checkbox.isChecked(),
+            "preview_encodings": self.preview_encodings_input.text(),
+        })
 
     def hideEvent(self, event):
         self.save_settings()
@@ -196,16 +422,134 @@ class EncodingConverterUI(QWidget):
             '文本文件 (*.txt);;所有文件 (*)'
         )
         if files:
+            self.cancel_import(discard=True)
             # 显示选中的文件数量和第一个文件的路径
             self.file_input.setText(f"已选择 {len(files)} 个文件: {files[0]}...")
             # 保存文件列表
             self.selected_files = files
+            self.selected_folder = ""
+            self.dropped_paths = []
+            self.result_view.set_files(files)
             # 保存当前源文件夹
             self.last_source_folder = os.path.dirname(files[0])
             # 设置默认输出文件夹为第一个文件所在文件夹
             default_output_folder = os.path.dirname(files[0])
             self.output_folder_input.setText(default_output_folder)
 
+    def select_folder(self):
+        start_dir = getattr(self, "last_source_folder", "")
+        folder_path = QFileDialog.getExistingDirectory(self, '选择源文件夹', start_dir)
+        if folder_path:
+            self.cancel_import(discard=True)
+            self.file_input.setText(f"已选择文件夹: {folder_path}")
+            self.selected_folder = folder_path
+            self.selected_files = []
+            self.dropped_paths = []
+            self.result_view.clear()
+            self.last_source_folder = folder_path
+            self.output_folder_input.setText(folder_path)
+
+    def dragEnterEvent(self, event):
+        if dropped_paths(event.mimeData()):
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = dropped_paths(event.mimeData())
+        if paths:
+            event.acceptProposedAction()
+            self.start_import(paths)
+
+    def start_import(self, paths):
+        """
+        在后台线程中展开拖入的文件和文件夹，按文件过滤条件筛选，找到的文件逐批加入列表
+        """
+        self.cancel_import(discard=True)
+        self.selected_files = []
+        self.selected_folder = ""
+        self.dropped_paths = list(paths)
+        self.result_view.clear()
+        first = paths[0]
+        self.last_source_folder = first if os.path.isdir(first) else os.path.dirname(first)
+        # 与选择文件夹相同：不指定目标文件夹时新文件写在各文件所在的文件夹中
+        self.output_folder_input.clear()
+        patterns = self.include_input.text().split()
+        max_depth = None if self.recursive_checkbox.isChecked() else 0
+        self.collector = FileCollector(paths, include=patterns or None, max_depth=max_depth)
+        self.collector.files_found.connect(self.on_files_found)
+        self.collector.progress.connect(self.on_import_progress)
+        self.collector.collect_done.connect(self.on_import_finished)
+        self.convert_button.setEnabled(False)
+        self.cancel_import_button.show()
+        self.file_input.setText("正在导入拖入的文件...")
+        self.collector.start()
+
+    def cancel_import(self, discard=False):
+        """停止正在进行的导入（不等待线程结束）；discard 为 True 时（重新选择文件）丢弃它还没显示的结果"""
+        if self.collector is None:
+            return
+        if self.collector.isRunning():
+            # 不在界面线程中等待，导入线程在下一个目录项之前停止，结束后由 finished 信号处理
+            self.collector.cancel()
+            if discard:
+                self.keep_until_finished(self.collector)
+        if discard:
+            self.collector = None
+            self.convert_button.setEnabled(True)
+            self.cancel_import_button.hide()
+
+    def keep_until_finished(self, collector):
+        """丢弃仍在停止中的导入线程时保留它的引用，直到 finished，避免 QThread 在运行中被销毁"""
+        self.stopping_collectors.add(collector)
+        collector.finished.connect(lambda: self.stopping_collectors.discard(collector))
+        if collector.isFinished():
+            self.stopping_collectors.discard(collector)
+
+    # 取消后旧的导入线程已经发出、还在排队的信号不再处理
+    def on_files_found(self, file_paths):
+        if self.sender() is not self.collector:
+            return
+        self.selected_files.extend(file_paths)
+        self.result_view.add_results([{'file': file_path} for file_path in file_paths])
+
+    def on_import_progress(self, scanned, accepted):
+        if self.sender() is not self.collector:
+            return
+        self.file_input.setText(f"正在导入：已找到 {accepted} 个文件（已检查 {scanned} 个）...")
+
+    def on_import_finished(self, accepted, cancelled):
+        if self.sender() is not self.collector:
+            return
+        self.convert_button.setEnabled(True)
+        self.cancel_import_button.hide()
+        state = "已取消导入，保留" if cancelled else "已拖入"
+        self.file_input.setText(f"{state} {accepted} 个文件")
+
+    def get_file_source(self):
+        """返回待处理的文件：手动选择的文件列表，或按过滤条件遍历所选文件夹的生成器"""
+        if self.selected_folder:
+            patterns = self.include_input.text().split()
+            max_depth = None if self.recursive_checkbox.isChecked() else 0
+            return iter_files(self.selected_folder, include=patterns or None, max_depth=max_depth)
+        return self.selected_files
+
+    def source_roots(self):
+        """返回选择的文件夹或拖入的文件夹，新文件在目标文件夹下保留相对它们的子文件夹"""
+        if self.selected_folder:
+            return [self.selected_folder]
+        return [path for path in self.dropped_paths if os.path.isdir(path)]
+
+    def batch_params(self, src_encoding, target_encoding, output_folder, delete_original):
+        """用于识别同一批次的参数，续传时必须一致"""
+        if self.selected_folder:
+            source = {'folder': os.path.abspath(self.selected_folder),
+                      'include': self.include_input.text().split(),
+                      'recursive': self.recursive_checkbox.isChecked()}
+        else:
+            source = {'files': list(self.selected_files)}
+        return dict(source, src=src_encoding, target=target_encoding,
+                    output_folder=os.path.abspath(output_folder) if output_folder else None,
+                    delete_original=delete_original)
+
     def select_output_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, '选择目标文件夹')
         if folder_path:
@@ -213,7 +557,7 @@ class EncodingConverterUI(QWidget):
 
     def start_conversion(self):
         try:
-            if not hasattr(self, 'selected_files') or not self.selected_files:
+            if not self.selected_files and not self.selected_folder:
                 QMessageBox.warning(self, '错误', '请选择要转换的文件！')
                 return
 
@@ -221,55 +565,148 @@ class EncodingConverterUI(QWidget):
             src_encoding = self.src_encoding_input.text() or self.src_encoding_combo.currentText()
             target_encoding = self.target_encoding_input.text() or self.target_encoding_combo.currentText()
             output_folder = self.output_folder_input.text()
+            source_roots = self.source_roots()
 
-            if not output_folder or not os.path.isdir(output_folder):
+            if (output_folder and not os.path.isdir(output_folder)) or (not output_folder and not self.dropped_paths):
                 QMessageBox.warning(self, '错误', '请提供有效的目标文件夹路径！')
                 return
 
             delete_original = self.delete_original_checkbox.isChecked()
 
-            success_count = 0
-            failed_files = []
-            for file_path in self.selected_files:
-                try:
-                    current_src_encoding = src_encoding
-                    if src_encoding == '自动检测':
-                        detected_encoding, confidence = detect_encoding(file_path)
-                        if not detected_encoding:
-                            failed_files.append(f"{file_path} (无法检测编码)")
-                            continue
-                        current_src_encoding = detected_encoding
-
-                    # 转换文件
-                    base_name = os.path.basename(file_path)
-                    name, ext = os.path.splitext(base_name)
-                    new_file_path = os.path.join(output_folder, f"{name}_{target_encoding}{ext}")
-                    convert_file(file_path, current_src_encoding, target_encoding)
-                    # 删除原文件
-                    if delete_original:
-                        try:
-                            os.remove(file_path)
-                        except Exception as e:
-                            failed_files.append(f"{file_path} (删除原文件失败: {str(e)})")
-                            continue
-                    success_count += 1
-
-                except Exception as e:
-                    failed_files.append(f"{file_path} ({str(e)})")
-
-            result_message = f"转换完成！\n成功：{success_count}/{len(self.selected_files)} 个文件"
-            if failed_files:
-                result_message += "\n\n转换失败的文件："
-                for failed_file in failed_files:
-                    result_message += f"\n- {failed_file}"
-            
-            self.result_label.setText(result_message)
-            QMessageBox.information(self, '转换结果', result_message)
-            self.save_settings()  # 操作后也保存一次
+            # 拖入时没有指定目标文件夹，或者目标文件夹就是（唯一的）源文件夹时，输出写到各文件所在的文件夹中
+            if not output_folder or len(source_roots) == 1 and os.path.samefile(output_folder, source_roots[0]):
+                output_folder = None
+
+            # 在后台线程中执行，避免界面卡住
+            self.convert_button.setEnabled(False)
+            self.result_label.setText("正在转换...")
+            self.show_progress(True)
+            if self.selected_folder:
+                self.result_view.clear()
+            else:
+                self.result_view.set_files(self.selected_files)
+            self.worker = ConversionWorker(
+                self.get_file_source(), src_encoding, target_encoding,
+                output_folder, delete_original, self.workers_spinbox.value(),
+                self.pipeline_checkbox.isChecked(),
+                self.batch_params(src_encoding, target_encoding, output_folder, delete_original),
+                self.resume_checkbox.isChecked(),
+                self.incremental_checkbox.isChecked(),
+                self.verify_hash_checkbox.isChecked(),
+                self.group_detect_checkbox.isChecked(),
+                source_roots or None
+            )
+            self.worker.results_ready.connect(self.result_view.add_results)
+            self.worker.progress.connect(self.on_conversion_progress)
+            self.worker.batch_done.connect(self.on_conversion_finished)
+            self.worker.start()
 
         except Exception as e:
+            self.convert_button.setEnabled(True)
+            self.show_progress(False)
             QMessageBox.critical(self, '错误', f'发生错误：{str(e)}')
 
+    def preview_selected(self):
+        """预览列表中选中的文件，没有选中时预览第一个已选择的文件"""
+        row = self.result_view.current_row()
+        if row is not None:
+            self.start_preview(row['file'])
+        elif self.selected_files:
+            self.start_preview(self.selected_files[0])
+        else:
+            QMessageBox.warning(self, '错误', '请先在列表中选择要预览的文件！')
+
+    def start_preview(self, file_path):
+        if self.preview_worker is not None and self.preview_worker.isRunning():
+            return
+        # 对比的编码：输入的备选编码，以及手动选择的源编码
+        alternatives = self.preview_encodings_input.text().split()
+        src_encoding = self.src_encoding_input.text() or self.src_encoding_combo.currentText()
+        if src_encoding != '自动检测':
+            alternatives.insert(0, src_encoding)
+        self.preview_button.setEnabled(False)
+        self.preview_worker = PreviewWorker(file_path, alternatives)
+        self.preview_worker.preview_ready.connect(self.on_preview_ready)
+        self.preview_worker.start()
+
+    def on_preview_ready(self, preview, error):
+        self.preview_button.setEnabled(True)
+        self.preview_tabs.clear()
+        self.preview_tabs.show()
+        if error:
+            self.add_preview_tab('错误', f"{preview['file']}\n预览失败：{error}")
+            return
+        for encoding, windows in preview['previews'].items():
+            title = encoding
+            if encoding == preview['detected']:
+                title += f"（检测结果 {preview['confidence']:.2f}）"
+            if isinstance(windows, str):
+                # 无法识别的编码
+                self.add_preview_tab(title, windows)
+                continue
+            errors = sum(count for _, _, count in windows)
+            if errors:
+                title += f" · {errors} 处无法解码"
+            parts = [f"{preview['file']}（共 {preview['size']} 字节，抽样 {len(windows)} 处）"]
+            for offset, text, _ in windows:
+                parts.append(f"\n—— 偏移 {offset} ——\n{text}")
+            self.add_preview_tab(title, "\n".join(parts))
+        if not preview['previews']:
+            self.add_preview_tab('无法检测', f"{preview['file']}\n无法检测编码，请在上方输入要对比的编码")
+
+    def add_preview_tab(self, title, text):
+        view = QPlainTextEdit()
+        view.setReadOnly(True)
+        view.setPlainText(text)
+        self.preview_tabs.addTab(view, title)
+
+    def show_progress(self, running):
+        """显示或隐藏进度条和取消按钮；总数未知时进度条为忙碌状态"""
+        self.progress_bar.setRange(0, 0 if running and self.selected_folder else 1000)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(running)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setVisible(running)
+
+    def cancel_conversion(self):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.result_label.setText("正在取消，等待正在转换的文件停止...")
+
+    def on_conversion_progress(self, progress):
+        if not self.cancel_button.isEnabled():
+            return
+        if progress['percent'] is not None:
+            self.progress_bar.setValue(int(progress['percent'] * 10))
+        self.result_label.setText(f"正在转换 {format_progress(progress)}")
+
+    def on_conversion_finished(self, stats):
+        self.convert_button.setEnabled(True)
+        self.show_progress(False)
+        if stats['cancelled']:
+            result_message = (f"已取消！\n成功：{stats['success']} 个文件，"
+                              "其余文件没有处理，也没有留下不完整的新文件\n"
+                              "勾选“断点续传”后再次开始，可以接着处理剩下的文件")
+        else:
+            result_message = f"转换完成！\n成功：{stats['success']}/{stats['processed']} 个文件"
+        if stats['skipped']:
+            result_message += (f"\n增量：跳过 {stats['skipped']} 个未变化的文件，"
+                               f"节省约 {stats['saved_seconds']:.1f} 秒")
+        if stats['resumed']:
+            result_message += f"\n续传：跳过上次已完成的 {stats['resumed']} 个文件"
+        if stats['tiers']:
+            tiers = "，".join(f"{tier} {count}" for tier, count in sorted(stats['tiers'].items()))
+            result_message += f"\n编码检测方式：{tiers}"
+        if stats['failed']:
+            result_message += f"\n失败：{stats['failed']} 个文件，可在列表中按状态“失败”筛选查看原因"
+        if stats['error']:
+            result_message += f"\n\n批量转换中断：{stats['error']}"
+
+        self.result_label.setText(result_message)
+        QMessageBox.information(self, '转换结果', result_message)
+        self.save_settings()  # 操作后也保存一次
+
     def update_style(self):
         # 判断自定义源编码
         if self.src_encoding_input.text().strip():
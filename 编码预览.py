@@ -0,0 +1,157 @@
+import os
+import re
+import mmap
+import codecs
+import random
+from 编码转换 import detect_encoding_tiered
+from 编码缓存 import open_cache, CACHE_FILE
+
+# 预览文件开头的字节数
+PREVIEW_HEAD_BYTES = 4096
+# 文件中间每个抽样窗口的字节数
+PREVIEW_WINDOW_BYTES = 2048
+# 文件中间的抽样窗口个数
+PREVIEW_SAMPLES = 3
+# 对齐到字符边界时，在抽样起点前后查找的字节数
+ALIGN_SCAN_BYTES = 512
+# 对齐时用来比较各个候选起点的字节数
+ALIGN_PROBE_BYTES = 64
+
+# 多字节编码中只会单独出现、不会是后续字节的字节（换行、空格、常见标点等）
+SAFE_BYTE = re.compile(rb'[\x00-\x2f]')
+# 无法解码的字节被替换成的字符，个数越多说明编码越可能不对
+REPLACEMENT_CHAR = '\ufffd'
+
+# 定长编码：窗口起点按字节宽度对齐
+FIXED_WIDTHS = {
+    'utf-16': 2, 'utf-16-le': 2, 'utf-16-be': 2,
+    'utf-32': 4, 'utf-32-le': 4, 'utf-32-be': 4,
+}
+# 文件开头的 BOM 决定 utf-16 / utf-32 文件中间部分的字节序
+ENDIAN_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32', 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32', 'utf-32-be'),
+    (codecs.BOM_UTF16_LE, 'utf-16', 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16', 'utf-16-be'),
+]
+
+def sample_offsets(size, samples=PREVIEW_SAMPLES, head=PREVIEW_HEAD_BYTES, window=PREVIEW_WINDOW_BYTES):
+    """
+    返回抽样窗口的起点：开头一个窗口，之后在文件其余部分均分成 samples 段，每段中随机取一个起点
+    随机数以文件大小为种子，同一文件每次预览的位置相同
+    """
+    offsets = [0]
+    if size <= head:
+        return offsets
+    rng = random.Random(size)
+    span = (size - head) // samples
+    for index in range(samples):
+        start = head + index * span
+        end = max(start, start + span - window)
+        offset = rng.randint(start, end)
+        if offset < size:
+            offsets.append(offset)
+    return offsets
+
+def _codec_name(encoding):
+    return codecs.lookup(encoding).name
+
+def _aligned_window(view, offset, codec_name, window):
+    """
+    把抽样起点对齐到字符边界，返回 (对齐后的起点, 从该起点开始的 window 字节)
+    定长编码按宽度对齐；UTF-8 跳过开头的后续字节；GBK、Big5、Shift_JIS 等多字节编码的后续字节
+    （GB18030 四字节序列中的数字除外）都不小于 0x30，所以从附近（优先向前找）小于 0x30 的字节
+    （换行、空格、标点等）之后开始；附近都没有时从几个候选起点中选解码出替换字符最少的一个
+    """
+    width = FIXED_WIDTHS.get(codec_name)
+    if width:
+        offset -= offset % width
+        return offset, view[offset:offset + window]
+    if codec_name == 'utf-8':
+        data = view[offset:offset + window + 4]
+        start = 0
+        while start < min(len(data), 4) and 0x80 <= data[start] <= 0xBF:
+            start += 1
+        return offset + start, data[start:start + window]
+    base = max(0, offset - ALIGN_SCAN_BYTES)
+    data = view[base:offset + window + ALIGN_SCAN_BYTES]
+    relative = offset - base
+    for index in range(relative - 1, -1, -1):
+        if data[index] < 0x30:
+            return base + index + 1, data[index + 1:index + 1 + window]
+    found = SAFE_BYTE.search(data, relative, relative + ALIGN_SCAN_BYTES)
+    if found:
+        start = found.end()
+        return base + start, data[start:start + window]
+    best_start, best_errors = relative, None
+    for start in range(relative, min(relative + 4, len(data))):
+        errors = _decode(data[start:start + ALIGN_PROBE_BYTES], codec_name).count(REPLACEMENT_CHAR)
+        if best_errors is None or errors < best_errors:
+            best_start, best_errors = start, errors
+    return base + best_start, data[best_start:best_start + window]
+
+def _decode(data, encoding):
+    # final=False：窗口结尾被截断的多字节字符留在解码器中，不显示为替换字符
+    return codecs.getincrementaldecoder(encoding)(errors='replace').decode(data, final=False)
+
+def preview_file(file_path, encodings, samples=PREVIEW_SAMPLES,
+                 head=PREVIEW_HEAD_BYTES, window=PREVIEW_WINDOW_BYTES):
+    """
+    用内存映射读取文件中的几个小窗口（开头 + samples 个随机位置），按每种编码分别解码
+    只访问窗口所在的页，内存占用和耗时与文件大小无关
+    :param encodings: 要对比的编码列表
+    :return: {'size': 文件大小, 'offsets': 抽样起点, 'previews': {编码: [(窗口起点, 文本, 替换字符数), ...]}}
+             无法识别的编码对应的值为错误信息字符串
+    """
+    size = os.path.getsize(file_path)
+    offsets = sample_offsets(size, samples, head, window)
+    previews = {}
+    with open(file_path, 'rb') as f:
+        # 空文件不能映射
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            for encoding in encodings:
+                try:
+                    codec_name = _codec_name(encoding)
+                except LookupError:
+                    previews[encoding] = f"未知的编码: {encoding}"
+                    continue
+                previews[encoding] = _preview_windows(view, offsets, codec_name, head, window)
+        finally:
+            if size:
+                view.close()
+    return {'size': size, 'offsets': offsets, 'previews': previews}
+
+def _preview_windows(view, offsets, codec_name, head, window):
+    middle_codec = codec_name
+    for bom, name, endian_name in ENDIAN_BOMS:
+        if codec_name == name and view[:len(bom)] == bom:
+            # 文件中间没有 BOM，按开头 BOM 的字节序解码
+            middle_codec = endian_name
+            break
+    windows = []
+    for offset in offsets:
+        if offset == 0:
+            text = _decode(view[:head], codec_name)
+            if text.startswith('\ufeff'):
+                text = text[1:]
+        else:
+            offset, data = _aligned_window(view, offset, middle_codec, window)
+            text = _decode(data, middle_codec)
+        windows.append((offset, text, text.count(REPLACEMENT_CHAR)))
+    return windows
+
+def preview_with_detection(file_path, alternatives=(), cache_path=CACHE_FILE, **kwargs):
+    """
+    检测文件编码（使用编码检测缓存，与转换时的检测结果一致），再按检测结果和备选编码预览
+    :return: preview_file 的结果，另加 'detected'、'confidence'、'tier'
+    """
+    cache = open_cache(cache_path) if cache_path else None
+    encoding, confidence, tier = detect_encoding_tiered(file_path, cache=cache)
+    encodings = [encoding] if encoding else []
+    for alternative in alternatives:
+        if alternative and alternative not in encodings:
+            encodings.append(alternative)
+    preview = preview_file(file_path, encodings, **kwargs)
+    preview.update(detected=encoding, confidence=confidence, tier=tier)
+    return preview
@@ -0,0 +1,111 @@
+import os
+import atexit
+import threading
+import configparser
+
+# 配置文件路径（所有工具共用）
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_config.ini")
+# 旧版重命名工具单独使用的配置文件，首次加载时合并到 CONFIG_FILE 的 [main] 中
+LEGACY_RENAME_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rename_config.ini")
+# 修改后延迟写盘的秒数，期间的多次修改合并为一次写入
+DEFAULT_WRITE_DELAY = 2.0
+
+class SettingsStore:
+    """
+    进程内共享的设置，启动时读取一次配置文件，之后各工具只读写内存
+    修改会延迟合并后原子写回磁盘（先写临时文件再替换），程序退出时保证写入
+    """
+
+    def __init__(self, path=CONFIG_FILE, write_delay=DEFAULT_WRITE_DELAY, legacy_files=None):
+        self.path = path
+        self.write_delay = write_delay
+        self._lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        self._config = configparser.ConfigParser(interpolation=None)
+        if os.path.exists(path):
+            self._config.read(path, encoding="utf-8")
+        for section, legacy_path in (legacy_files or {}).items():
+            self._migrate(section, legacy_path)
+
+    def _migrate(self, section, legacy_path):
+        """目标分区还没有内容时，从旧配置文件的 [main] 中导入"""
+        if self._config.has_section(section) and self._config.items(section):
+            return
+        if not os.path.exists(legacy_path):
+            return
+        legacy = configparser.ConfigParser(interpolation=None)
+        legacy.read(legacy_path, encoding="utf-8")
+        if legacy.has_section("main"):
+            self.update(section, dict(legacy.items("main")))
+
+    def get(self, section, key, fallback=""):
+        with self._lock:
+            return self._config.get(section, key, fallback=fallback)
+
+    def getboolean(self, section, key, fallback=False):
+        with self._lock:
+            try:
+                return self._config.getboolean(section, key, fallback=fallback)
+            except ValueError:
+                return fallback
+
+    def getint(self, section, key, fallback=0):
+        with self._lock:
+            try:
+                return self._config.getint(section, key, fallback=fallback)
+            except ValueError:
+                return fallback
+
+    def has_section(self, section):
+        with self._lock:
+            return self._config.has_section(section)
+
+    def update(self, section, values):
+        """更新一个分区中的若干项，内容有变化时安排延迟写盘"""
+        with self._lock:
+            if not self._config.has_section(section):
+                self._config.add_section(section)
+            changed = False
+            for key, value in values.items():
+                value = str(value)
+                if self._config.get(section, key, fallback=None) != value:
+                    self._config.set(section, key, value)
+                    changed = True
+            if changed:
+                self._dirty = True
+                self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.write_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """立即写盘（没有未保存的修改时什么也不做）"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                self._config.write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._dirty = False
+
+_settings = None
+_settings_lock = threading.Lock()
+
+def get_settings():
+    """返回进程内共享的设置实例，第一次调用时读取配置文件"""
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            _settings = SettingsStore(legacy_files={"main": LEGACY_RENAME_CONFIG})
+            atexit.register(_settings.flush)
+        return _settings
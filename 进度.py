@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+
+# 进度事件的最短间隔（秒），期间的进度合并为一次
+PROGRESS_INTERVAL = 0.25
+# 取消后，文件被中断的结果中的错误信息
+CANCELLED_MESSAGE = "已取消"
+
+class Cancelled(Exception):
+    """批次被取消；在输出写完之前抛出，atomic_output 会删除临时文件，不留下写了一半的输出"""
+
+class CancelToken:
+    """
+    批次的取消标记，引擎在文件之间和大文件的块之间检查
+    event 默认为 threading.Event；多进程时传入 multiprocessing.Event，子进程中也能检查
+    """
+
+    def __init__(self, event=None):
+        self.event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def check(self):
+        """已取消时抛出 Cancelled"""
+        if self.event.is_set():
+            raise Cancelled(CANCELLED_MESSAGE)
+
+def check_cancel(cancel):
+    """cancel 可以为 None（不可取消）"""
+    if cancel is not None:
+        cancel.check()
+
+class ProgressMeter:
+    """
+    统计已完成的文件数和字节数，计算速度和剩余时间，间隔 interval 秒才调用一次 emit(进度字典)
+    总数未知（如遍历文件夹的生成器）时传 0，此时没有百分比和剩余时间
+    进度字典：{'files', 'total_files', 'bytes', 'total_bytes', 'seconds', 'files_per_s', 'mb_per_s',
+              'percent', 'eta'}，percent 为 0~100 或 None，eta 为剩余秒数或 None
+    """
+
+    def __init__(self, total_files=0, total_bytes=0, emit=None, interval=PROGRESS_INTERVAL):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.emit = emit
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self._start = time.monotonic()
+        self._last = self._start
+
+    def add(self, result):
+        """记录一个已完成的文件（结果字典中的 'bytes' 为其大小）"""
+        self.files += 1
+        self.bytes += result.get('bytes') or 0
+        now = time.monotonic()
+        if self.emit is not None and now - self._last >= self.interval:
+            self._last = now
+            self.emit(self.snapshot(now))
+
+    def track(self, results):
+        """包装引擎的结果迭代器，逐个记录后原样产出，结束时发出最后一次进度"""
+        for result in results:
+            self.add(result)
+            yield result
+        self.finish()
+
+    def finish(self):
+        if self.emit is not None:
+            self.emit(self.snapshot())
+
+    def snapshot(self, now=None):
+        seconds = (now or time.monotonic()) - self._start
+        files_per_s = self.files / seconds if seconds > 0 else 0.0
+        bytes_per_s = self.bytes / seconds if seconds > 0 else 0.0
+        percent = eta = None
+        # 有总字节数时按字节估算（大小文件混合时更准），否则按文件数估算
+        if self.total_bytes and self.bytes:
+            percent = min(self.bytes / self.total_bytes, 1.0) * 100
+            eta = max(self.total_bytes - self.bytes, 0) / bytes_per_s if bytes_per_s else None
+        elif self.total_files:
+            percent = min(self.files / self.total_files, 1.0) * 100
+            if self.files:
+                eta = max(self.total_files - self.files, 0) / files_per_s if files_per_s else None
+        return {
+            'files': self.files,
+            'total_files': self.total_files,
+            'bytes': self.bytes,
+            'total_bytes': self.total_bytes,
+            'seconds': seconds,
+            'files_per_s': files_per_s,
+            'mb_per_s': bytes_per_s / (1024 * 1024),
+            'percent': percent,
+            'eta': eta,
+        }
+
+def format_duration(seconds):
+    """把秒数格式化为 “1 小时 2 分”、“3 分 4 秒”、“5 秒”"""
+    seconds = int(seconds + 0.5)
+    if seconds >= 3600:
+        return f"{seconds // 3600} 小时 {seconds % 3600 // 60} 分"
+    if seconds >= 60:
+        return f"{seconds // 60} 分 {seconds % 60} 秒"
+    return f"{seconds} 秒"
+
+def format_progress(progress):
+    """把进度字典格式化为一行文字"""
+    if progress['total_files']:
+        text = f"{progress['files']}/{progress['total_files']} 个文件"
+    else:
+        text = f"已处理 {progress['files']} 个文件"
+    text += f"，{progress['files_per_s']:.1f} 文件/s，{progress['mb_per_s']:.1f} MB/s"
+    if progress['eta'] is not None:
+        text += f"，剩余约 {format_duration(progress['eta'])}"
+    return text
+
+def total_size(file_paths):
+    """返回文件的总字节数，无法访问的文件按 0 计"""
+    total = 0
+    for file_path in file_paths:
+        try:
+            total += os.path.getsize(file_path)
+        except OSError:
+            pass
+    return total
@@ -1,75 +1,175 @@
 import os
+from 断点续传 import atomic_output
+from 进度 import check_cancel
 
-def batch_rename_files(file_paths, src_exts, target_ext, output_folder=None, delete_original=False):
+try:
+    import fcntl  # 仅 Linux/Unix 可用，用于 reflink
+except ImportError:
+    fcntl = None
+
+# Linux FICLONE ioctl，在 btrfs/xfs 等文件系统上共享数据块完成复制
+FICLONE = 0x40049409
+# 内核复制/缓冲复制每次处理的字节数
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 文件的落地方式
+METHOD_RENAME = 'rename'
+METHOD_REFLINK = 'reflink'
+METHOD_COPY_FILE_RANGE = 'copy_file_range'
+METHOD_SENDFILE = 'sendfile'
+METHOD_BUFFER = 'buffer'
+METHOD_DRY_RUN = 'dry-run'
+# 新文件名已被内容相同的文件占用（见 去重.py）：不复制，或把该文件换成源文件的硬链接
+METHOD_DUPLICATE = 'duplicate'
+METHOD_HARDLINK = 'hardlink'
+
+def batch_rename_files(file_paths, src_exts, target_ext, output_folder=None, delete_original=False, timings=None,
+                       dedup=None):
     """
     批量重命名文件后缀
     :param file_paths: 文件路径列表
-    :param src_exts: 源文件后缀列表 (如 ['txt', '_utf-8.txt'])
+    :param src_exts: 源文件后缀列表 (如 ['txt', '_utf-8.txt'])，也可以是编译好的 SuffixMatcher
     :param target_ext: 目标文件后缀 (如 '.txt')
     :param output_folder: 输出文件夹路径
+    :param delete_original: 是否删除原文件；与目标在同一文件系统时直接改名，不复制数据
+    :param timings: 如果传入列表，则为每个文件追加 (文件路径, 落地方式, 耗时秒数)
+    :param dedup: 新文件名已被内容相同的文件占用时的处理（去重.DEDUP_SKIP / DEDUP_LINK），
+                  None 表示总是改用加序号的文件名，见 重命名计划.build_plan
     :return: (成功列表, 失败列表)
     """
+    # 先生成完整的重命名计划再执行，新文件名可以使用本批次中会被移走的源文件的名字
+    from 重命名计划 import plan_rename  # 重命名计划 依赖本模块，在这里导入避免循环导入
+    plan = plan_rename(file_paths, src_exts, target_ext, output_folder, delete_original, dedup)
+    return collect_results(plan.apply(), timings)
+
+def collect_results(results, timings=None):
+    """把结果字典汇总为 (成功列表, 失败列表)，timings 同 batch_rename_files"""
     success_files = []
     failed_files = []
-    
-    # 只处理目标后缀的点号
-    target_ext = target_ext if target_ext.startswith('.') else f'.{target_ext}'
-    
-    for file_path in file_paths:
-        try:
-            # 检查文件是否存在
-            if not os.path.isfile(file_path):
-                failed_files.append((file_path, "文件不存在"))
+    for result in results:
+        if result['skipped']:
+            continue
+        if result['output']:
+            success_files.append((result['file'], result['output']))
+            if timings is not None:
+                timings.append((result['file'], result['method'], result['seconds']))
+        if result['error']:
+            failed_files.append((result['file'], result['error']))
+    return success_files, failed_files
+
+def suffix_base_name(file_name, matcher, target_ext):
+    """
+    返回文件名去掉匹配到的源后缀后的基本名，新文件名为 基本名 + target_ext；没有匹配的后缀时返回 None
+    """
+    matched_ext = matcher.match(file_name)
+    if not matched_ext:
+        return None
+    base_name = file_name[:-len(matched_ext)]
+    # 如果基本文件名以点结尾且目标后缀以点开始，去掉一个点
+    if base_name.endswith('.') and target_ext.startswith('.'):
+        base_name = base_name[:-1]
+    return base_name
+
+class SuffixMatcher:
+    """
+    预编译的多后缀匹配器，每批只构建一次
+    后缀去掉开头的点号并转为小写后按长度分桶，匹配时每个长度只做一次字典查找
+    优先级与逐个比较时相同：按原始后缀长度降序，长度相同时按列表顺序
+    """
+
+    def __init__(self, src_exts):
+        self._buckets = {}  # 去点小写后缀长度 -> {后缀: (优先级, 去点后缀)}
+        # 去点后为空的后缀（如 '.'）匹配任何文件名但不产生有效后缀，优先级更低的后缀都不会再被匹配
+        self._empty_priority = None
+        for index, ext in enumerate(src_exts):
+            check_ext = ext[1:] if ext.startswith('.') else ext
+            priority = (len(ext), -index)
+            if not check_ext:
+                self._empty_priority = max(priority, self._empty_priority or priority)
                 continue
-                
-            # 获取文件名
-            file_dir = output_folder if output_folder else os.path.dirname(file_path)
-            file_name = os.path.basename(file_path)
-            
-            # 检查文件名是否以任一源后缀结尾（不区分大小写）
-            matched_ext = None
-            for ext in sorted(src_exts, key=len, reverse=True):  # 按长度降序排序，优先匹配最长的后缀
-                # 处理后缀中的点号
-                check_ext = ext[1:] if ext.startswith('.') else ext
-                if file_name.lower().endswith(check_ext.lower()):
-                    matched_ext = check_ext
-                    break
-            
-            # 如果没有匹配的后缀，跳过该文件
-            if not matched_ext:
+            bucket = self._buckets.setdefault(len(check_ext), {})
+            key = check_ext.lower()
+            if key not in bucket or bucket[key][0] < priority:
+                bucket[key] = (priority, check_ext)
+        self._lengths = sorted(self._buckets, reverse=True)
+
+    def match(self, file_name):
+        """返回文件名匹配到的后缀（已去掉开头的点号），没有匹配时返回 None"""
+        lower_name = file_name.lower()
+        best = None
+        for length in self._lengths:
+            if length > len(lower_name):
                 continue
-                
-            # 获取基本文件名（不含匹配的后缀）
-            base_name = file_name[:-len(matched_ext)]
-            # 如果基本文件名以点结尾且目标后缀以点开始，去掉一个点
-            if base_name.endswith('.') and target_ext.startswith('.'):
-                base_name = base_name[:-1]
-                
-            # 构造新文件名
-            new_file_name = f"{base_name}{target_ext}"
-            new_file_path = os.path.join(file_dir, new_file_name)
-            
-            # 检查目标文件是否已存在
-            if os.path.exists(new_file_path):
-                counter = 1
-                while os.path.exists(new_file_path):
-                    new_file_name = f"{base_name}_{counter}{target_ext}"
-                    new_file_path = os.path.join(file_dir, new_file_name)
-                    counter += 1
-            
-            # 复制文件内容并创建新文件
-            with open(file_path, 'rb') as src_file:
-                with open(new_file_path, 'wb') as dst_file:
-                    dst_file.write(src_file.read())
-            if delete_original:
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    failed_files.append((file_path, f"删除原文件失败: {str(e)}"))
-            
-            success_files.append((file_path, new_file_path))
-            
-        except Exception as e:
-            failed_files.append((file_path, str(e)))
-    
-    return success_files, failed_files
+            found = self._buckets[length].get(lower_name[-length:])
+            if found is not None and (best is None or found[0] > best[0]):
+                best = found
+        if best is None or (self._empty_priority is not None and best[0] < self._empty_priority):
+            return None
+        return best[1]
+
+def copy_file(src_path, dst_path, durable=False, cancel=None):
+    """
+    复制文件内容，依次尝试 reflink、copy_file_range、sendfile，最后退回到固定大小缓冲区复制
+    前一种方式中途不可用时，后一种方式从当前偏移继续
+    先复制到临时文件，完成后原子替换为 dst_path；durable 为 True 时返回前确保副本已写盘
+    传入 cancel（进度.CancelToken）时每块之间检查，取消时抛出 进度.Cancelled，临时文件被删除
+    :return: 实际使用的复制方式
+    """
+    with atomic_output(dst_path, durable) as temp_path:
+        src_fd = os.open(src_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            dst_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+            try:
+                method = _copy_fd(src_fd, dst_fd, cancel)
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+    return method
+
+def _copy_fd(src_fd, dst_fd, cancel=None):
+    if _reflink(src_fd, dst_fd):
+        return METHOD_REFLINK
+    if _kernel_copy(getattr(os, 'copy_file_range', None), src_fd, dst_fd, cancel):
+        return METHOD_COPY_FILE_RANGE
+    if _kernel_copy(_sendfile, src_fd, dst_fd, cancel):
+        return METHOD_SENDFILE
+    _buffer_copy(src_fd, dst_fd, cancel)
+    return METHOD_BUFFER
+
+def _reflink(src_fd, dst_fd):
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+def _sendfile(src_fd, dst_fd, count):
+    if not hasattr(os, 'sendfile'):
+        raise OSError("sendfile 不可用")
+    return os.sendfile(dst_fd, src_fd, None, count)
+
+def _kernel_copy(copy_func, src_fd, dst_fd, cancel=None):
+    """用内核复制函数复制到文件结尾，不可用时返回 False"""
+    if copy_func is None:
+        return False
+    try:
+        while True:
+            check_cancel(cancel)
+            if copy_func(src_fd, dst_fd, COPY_CHUNK_SIZE) == 0:
+                return True
+    except OSError:
+        return False
+
+def _buffer_copy(src_fd, dst_fd, cancel=None):
+    while True:
+        check_cancel(cancel)
+        data = os.read(src_fd, COPY_CHUNK_SIZE)
+        if not data:
+            return
+        view = memoryview(data)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
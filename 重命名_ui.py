@@ -1,12 +1,20 @@
 import os
-import configparser
 from PyQt5.QtWidgets import (
     QWidget, QPushButton, QVBoxLayout, QLabel, QLineEdit, 
-    QFileDialog, QHBoxLayout, QMessageBox, QComboBox, QListWidget, QCheckBox
+    QFileDialog, QHBoxLayout, QMessageBox, QComboBox, QListWidget, QCheckBox, QSpinBox, QProgressBar
 )
-from PyQt5.QtCore import QSettings
+from PyQt5.QtCore import QSettings, QThread, pyqtSignal
 from PyQt5.QtGui import QPalette, QColor
-from 重命名 import batch_rename_files
+from 重命名计划 import plan_rename
+from 重命名规则 import RenameRule, plan_rule_rename
+from 重命名 import SuffixMatcher
+from 拖放导入 import FileCollector, dropped_paths
+from 文件遍历 import iter_files
+from 设置 import get_settings
+from 结果列表 import ResultView, ResultBuffer, format_ms
+from 断点续传 import open_journal
+from 进度 import CancelToken, ProgressMeter, format_progress
+from 去重 import DEDUP_SKIP, DEDUP_LINK
 
 # 定义常用文件格式
 COMMON_EXTENSIONS = [
@@ -21,12 +29,153 @@ COMMON_EXTENSIONS = [
     '_utf-8.txt', '_gbk.txt'  # 添加常见的编码后缀
 ]
 
-class RenameToolUI(QWidget):
-    CONFIG_FILE = os.path.join(os.path.dirname(__file__), "rename_config.ini")
+# 规则重命名的大小写转换选项：(显示文字, RenameRule 的 case 参数)
+CASE_OPTIONS = [
+    ('不转换大小写', ''),
+    ('全部小写', 'lower'),
+    ('全部大写', 'upper'),
+    ('单词首字母大写', 'title'),
+    ('首字母大写', 'capitalize'),
+]
+
+# 新文件名已被内容相同的文件占用时的处理：(显示文字, 去重方式)
+DEDUP_OPTIONS = [
+    ('新文件名被占用时总是改用加序号的文件名', ''),
+    ('内容相同时跳过（不再复制出 name_1）', DEDUP_SKIP),
+    ('内容相同时跳过，并把已有文件换成硬链接', DEDUP_LINK),
+]
+
+# 结果表格的列：(表头, 结果字典的键, 显示格式)
+RESULT_COLUMNS = [
+    ('文件', 'file', None),
+    ('状态', 'status', None),
+    ('新文件', 'output', None),
+    ('方式', 'method', None),
+    ('耗时(ms)', 'seconds', format_ms),
+    ('错误', 'error', None),
+]
+
+def make_plan(file_paths, src_exts, target_ext, output_folder, delete_original, rule=None, dedup=None):
+    """生成重命名计划：传入规则时按规则重命名，否则替换后缀；dedup 为去重方式，None 表示不去重"""
+    if rule is not None:
+        return plan_rule_rename(file_paths, rule, output_folder, delete_original, dedup)
+    return plan_rename(file_paths, src_exts, target_ext, output_folder, delete_original, dedup)
+
+class RenameWorker(QThread):
+    """
+    在后台线程中逐个重命名，结果合并成批通过 results_ready 回传，进度字典（见 进度.ProgressMeter）
+    限速后通过 progress 回传；调用 cancel 取消批次
+    batch_done 参数为 (成功数, 处理数, 失败数, 跳过数, 续传跳过数, 是否被取消, 中断原因)
+    """
+    results_ready = pyqtSignal(list)
+    progress = pyqtSignal(dict)
+    batch_done = pyqtSignal(int, int, int, int, int, bool, str)
+
+    def __init__(self, file_paths, src_exts, target_ext, output_folder, delete_original,
+                 journal_params=None, resume=False, rule=None, dedup=None):
+        """
+        journal_params 为识别批次的参数，用于记录批次日志；resume 为 True 时跳过上次已完成的文件
+        rule 为 重命名规则.RenameRule，传入时按规则重命名，忽略 src_exts 和 target_ext
+        dedup 为去重方式（去重.DEDUP_SKIP / DEDUP_LINK），None 表示不去重
+        """
+        super().__init__()
+        self.file_paths = file_paths
+        self.src_exts = src_exts
+        self.target_ext = target_ext
+        self.output_folder = output_folder
+        self.delete_original = delete_original
+        self.journal_params = journal_params
+        self.resume = resume
+        self.rule = rule
+        self.dedup = dedup
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """请求取消：不再开始新的文件，正在复制的文件在块之间停止，不留下不完整的副本"""
+        self.cancel_token.cancel()
+
+    def run(self):
+        success_count = failed_count = skipped_count = processed = 0
+        error = ''
+        buffer = ResultBuffer(self.results_ready.emit)
+        journal = None
+        finished = False
+        try:
+            file_paths = self.file_paths
+            if self.journal_params is not None:
+                journal = open_journal('rename', self.journal_params, self.resume, self.delete_original)
+                file_paths = journal.pending(file_paths)
+            plan = make_plan(
+                file_paths, self.src_exts, self.target_ext, self.output_folder, self.delete_original, self.rule,
+                self.dedup
+            )
+            results = plan.apply(cancel=self.cancel_token, journal=journal)
+            if journal is not None:
+                results = journal.track(results)
+            # 重命名大多只修改元数据，按文件数估算剩余时间
+            meter = ProgressMeter(len(plan), emit=self.progress.emit)
+            for processed, result in enumerate(meter.track(results), 1):
+                if result['skipped']:
+                    skipped_count += 1
+                elif result['success']:
+                    success_count += 1
+                elif not result['cancelled']:
+                    # 中途被取消的文件没有留下副本，不算失败
+                    failed_count += 1
+                buffer.add(result)
+            # 被取消的批次保留日志，勾选续传后可以接着处理剩下的文件
+            finished = not self.cancel_token.cancelled
+        except Exception as e:
+            error = str(e)
+        finally:
+            if journal is not None:
+                journal.close(finished)
+        buffer.flush()
+        resumed = journal.resumed if journal is not None else 0
+        self.batch_done.emit(success_count, processed, failed_count, skipped_count, resumed,
+                             self.cancel_token.cancelled, error)
+
+class RenamePreviewWorker(QThread):
+    """在后台线程中生成重命名计划，预览行合并成批通过 results_ready 回传，plan_ready 参数为 (计划统计, 出错原因)"""
+    results_ready = pyqtSignal(list)
+    plan_ready = pyqtSignal(dict, str)
+
+    def __init__(self, file_paths, src_exts, target_ext, output_folder, delete_original, rule=None, dedup=None):
+        super().__init__()
+        self.file_paths = file_paths
+        self.src_exts = src_exts
+        self.target_ext = target_ext
+        self.output_folder = output_folder
+        self.delete_original = delete_original
+        self.rule = rule
+        self.dedup = dedup
+
+    def run(self):
+        summary = {}
+        error = ''
+        buffer = ResultBuffer(self.results_ready.emit)
+        try:
+            plan = make_plan(
+                self.file_paths, self.src_exts, self.target_ext, self.output_folder, self.delete_original, self.rule,
+                self.dedup
+            )
+            for row in plan.preview():
+                buffer.add(row)
+            summary = plan.summary()
+        except Exception as e:
+            error = str(e)
+        buffer.flush()
+        self.plan_ready.emit(summary, error)
 
+class RenameToolUI(QWidget):
     def __init__(self):
         super().__init__()
         self.selected_files = []  # 初始化文件列表
+        self.selected_folder = ""  # 文件夹模式下选择的文件夹
+        self.dropped_paths = []  # 拖入的文件和文件夹，按与选择文件夹相同的方式决定输出位置
+        self.worker = None
+        self.collector = None
+        self.stopping_collectors = set()  # 已取消、还没结束的导入线程
         self._initialized = False  # 添加初始化标志
         self.init_ui()
         self.load_settings()
@@ -51,12 +200,23 @@ class RenameToolUI(QWidget):
         # 文件选择部分
         file_label = QLabel('选择要重命名的文件(支持多选):')
         self.file_input = QLineEdit()
+        self.file_input.setPlaceholderText('也可以把文件或文件夹拖到窗口中')
         file_button = QPushButton('浏览...')
+        folder_button = QPushButton('选择文件夹...')
+        self.cancel_import_button = QPushButton('取消导入')
+        self.cancel_import_button.hide()
         file_layout = QHBoxLayout()
         file_layout.addWidget(self.file_input)
         file_layout.addWidget(file_button)
+        file_layout.addWidget(folder_button)
+        file_layout.addWidget(self.cancel_import_button)
         layout.addWidget(file_label)
         layout.addLayout(file_layout)
+        self.setAcceptDrops(True)
+
+        # 文件夹模式下是否遍历子文件夹
+        self.recursive_checkbox = QCheckBox('包含子文件夹(选择文件夹时生效)')
+        layout.addWidget(self.recursive_checkbox)
 
         # 源文件后缀选择部分
         src_ext_label = QLabel('选择源文件后缀(支持多选):')
@@ -93,6 +253,31 @@ class RenameToolUI(QWidget):
         layout.addWidget(target_ext_label)
         layout.addLayout(target_ext_layout)
 
+        # 规则重命名：填写正则表达式或模板后按规则生成新文件名，不使用上面的后缀设置
+        rule_label = QLabel('规则重命名(填写后不使用上面的后缀设置，模板字段: {1} 分组 {name} {ext} {n:03} 序号 '
+                            '{date} 修改日期 {encoding} 编码，可加 |lower |upper):')
+        self.pattern_input = QLineEdit()
+        self.pattern_input.setPlaceholderText(r'正则表达式，如 ^(.+?) - (\d+)，为空时匹配所有文件')
+        self.template_input = QLineEdit()
+        self.template_input.setPlaceholderText('新文件名模板，如 {1} E{2:02}{ext}')
+        rule_layout = QHBoxLayout()
+        rule_layout.addWidget(self.pattern_input)
+        rule_layout.addWidget(self.template_input)
+        rule_option_layout = QHBoxLayout()
+        self.case_combo = QComboBox()
+        for text, case in CASE_OPTIONS:
+            self.case_combo.addItem(text, case)
+        rule_option_layout.addWidget(self.case_combo)
+        rule_option_layout.addWidget(QLabel('序号从:'))
+        self.counter_start_spin = QSpinBox()
+        self.counter_start_spin.setRange(0, 999999)
+        self.counter_start_spin.setValue(1)
+        rule_option_layout.addWidget(self.counter_start_spin)
+        rule_option_layout.addStretch()
+        layout.addWidget(rule_label)
+        layout.addLayout(rule_layout)
+        layout.addLayout(rule_option_layout)
+
         # 添加输出文件夹选择
         output_folder_label = QLabel('选择目标文件夹(默认为源文件夹):')
         self.output_folder_input = QLineEdit()
@@ -106,70 +291,100 @@ class RenameToolUI(QWidget):
         # 添加“是否删除原文件”复选框
         self.delete_original_checkbox = QCheckBox("重命名后删除原文件")
         layout.addWidget(self.delete_original_checkbox)
-
-        # 重命名按钮
+        self.resume_checkbox = QCheckBox("断点续传(跳过上次中断前已完成的文件)")
+        layout.addWidget(self.resume_checkbox)
+        # 重复运行时不再堆积内容相同的 name_1、name_2 ...
+        self.dedup_combo = QComboBox()
+        for text, dedup in DEDUP_OPTIONS:
+            self.dedup_combo.addItem(text, dedup)
+        layout.addWidget(self.dedup_combo)
+
+        # 预览和重命名按钮
+        button_layout = QHBoxLayout()
+        self.preview_button = QPushButton('预览')
+        button_layout.addWidget(self.preview_button)
         rename_button = QPushButton('开始重命名')
-        layout.addWidget(rename_button)
+        self.rename_button = rename_button
+        button_layout.addWidget(rename_button)
+        self.cancel_button = QPushButton('取消重命名')
+        self.cancel_button.hide()
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
 
         # 结果显示
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
         self.result_label = QLabel('')
         layout.addWidget(self.result_label)
+        self.result_view = ResultView(RESULT_COLUMNS)
+        layout.addWidget(self.result_view, 1)
 
         # 设置窗口布局
         self.setLayout(layout)
 
         # 绑定按钮事件
         file_button.clicked.connect(self.select_files)
+        folder_button.clicked.connect(self.select_folder)
+        self.preview_button.clicked.connect(self.start_preview)
+        self.cancel_import_button.clicked.connect(lambda: self.cancel_import())
         rename_button.clicked.connect(self.start_rename)
+        self.cancel_button.clicked.connect(self.cancel_rename)
         output_folder_button.clicked.connect(self.select_output_folder)
         self.delete_original_checkbox.stateChanged.connect(self.on_delete_checkbox_changed)
 
         # 在输入框内容变化时调用
         self.src_ext_input.textChanged.connect(self.update_style)
         self.target_ext_input.textChanged.connect(self.update_style)
+        self.pattern_input.textChanged.connect(self.update_style)
+        self.template_input.textChanged.connect(self.update_style)
         # 初始化时也调用一次
         self.update_style()
 
     def load_settings(self):
-        config = configparser.ConfigParser()
-        if os.path.exists(self.CONFIG_FILE):
-            config.read(self.CONFIG_FILE, encoding="utf-8")
-            # 恢复复选框状态
-            delete_original = config.getboolean("main", "delete_original", fallback=False)
-            self.delete_original_checkbox.setChecked(delete_original)
-            # 恢复输出文件夹
-            output_folder = config.get("main", "output_folder", fallback="")
-            self.output_folder_input.setText(output_folder)
-            # 恢复上次源文件夹
-            last_source_folder = config.get("main", "last_source_folder", fallback="")
-            self.last_source_folder = last_source_folder
-            if last_source_folder:
-                self.file_input.setText(f"上次源文件夹: {last_source_folder}")
-        else:
-            self.delete_original_checkbox.setChecked(False)
-            self.output_folder_input.setText("")
-            self.last_source_folder = ""
-
+        settings = get_settings()
+        # 恢复复选框状态
+        self.delete_original_checkbox.setChecked(settings.getboolean("main", "delete_original"))
+        # 恢复输出文件夹
+        self.output_folder_input.setText(settings.get("main", "output_folder"))
+        # 恢复上次源文件夹
+        last_source_folder = settings.get("main", "last_source_folder")
+        self.last_source_folder = last_source_folder
+        if last_source_folder:
+            self.file_input.setText(f"上次源文件夹: {last_source_folder}")
+        # 恢复是否包含子文件夹
+        self.recursive_checkbox.setChecked(settings.getboolean("main", "include_subfolders"))
         # 恢复自定义源文件后缀
-        self.src_ext_input.setText(config.get("main", "src_ext_input", fallback=""))
+        self.src_ext_input.setText(settings.get("main", "src_ext_input"))
         # 恢复自定义目标后缀
-        self.target_ext_input.setText(config.get("main", "target_ext_input", fallback=""))
+        self.target_ext_input.setText(settings.get("main", "target_ext_input"))
+        self.resume_checkbox.setChecked(settings.getboolean("main", "resume"))
+        # 恢复规则重命名的设置
+        self.pattern_input.setText(settings.get("main", "pattern_input"))
+        self.template_input.setText(settings.get("main", "template_input"))
+        case_index = self.case_combo.findData(settings.get("main", "case"))
+        self.case_combo.setCurrentIndex(max(case_index, 0))
+        self.counter_start_spin.setValue(settings.getint("main", "counter_start", 1))
+        dedup_index = self.dedup_combo.findData(settings.get("main", "dedup"))
+        self.dedup_combo.setCurrentIndex(max(dedup_index, 0))
 
     def save_settings(self):
-        config = configparser.ConfigParser()
-        config["main"] = {
-            "delete_original": str(self.delete_original_checkbox.isChecked()),
+        """写入共享设置（内存），由设置模块延迟写盘"""
+        get_settings().update("main", {
+            "delete_original": self.delete_original_checkbox.isChecked(),
             "output_folder": self.output_folder_input.text(),
             "last_source_folder": getattr(self, "last_source_folder", ""),
             "src_ext_input": self.src_ext_input.text(),
             "target_ext_input": self.target_ext_input.text(),
-        }
-        with open(self.CONFIG_FILE, "w", encoding="utf-8") as f:
-            config.write(f)
-
-    def showEvent(self, event):
-        self.load_settings()
-        super().showEvent(event)
+            "include_subfolders": self.recursive_checkbox.isChecked(),
+            "resume": self.resume_checkbox.isChecked(),
+            "pattern_input": self.pattern_input.text(),
+            "template_input": self.template_input.text(),
+            "case": self.case_combo.currentData(),
+            "counter_start": self.counter_start_spin.value(),
+            "dedup": self.dedup_combo.currentData(),
+        })
 
     def hideEvent(self, event):
         self.save_settings()
@@ -212,12 +427,139 @@ class RenameToolUI(QWidget):
             '所有文件 (*.*)'
         )
         if files:
+            self.cancel_import(discard=True)
             self.file_input.setText(f"已选择 {len(files)} 个文件: {files[0]}...")
             self.selected_files = files
+            self.selected_folder = ""
+            self.dropped_paths = []
+            self.result_view.set_files(files)
             # 保存当前源文件夹
             self.last_source_folder = os.path.dirname(files[0])
             # 设置默认输出文件夹为第一个文件所在文件夹
             default_output_folder = os.path.dirname(files[0])
+
+    def select_folder(self):
+        start_dir = getattr(self, "last_source_folder", "")
+        folder_path = QFileDialog.getExistingDirectory(self, '选择要重命名的文件夹', start_dir)
+        if folder_path:
+            self.cancel_import(discard=True)
+            self.file_input.setText(f"已选择文件夹: {folder_path}")
+            self.selected_folder = folder_path
+            self.selected_files = []
+            self.dropped_paths = []
+            self.result_view.clear()
+            self.last_source_folder = folder_path
+
+    def dragEnterEvent(self, event):
+        if dropped_paths(event.mimeData()):
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = dropped_paths(event.mimeData())
+        if paths:
+            event.acceptProposedAction()
+            self.start_import(paths)
+
+    def import_filter(self):
+        """
+        返回导入时筛选文件名的函数：填写了规则时按规则的正则表达式，否则按选择的源文件后缀；
+        都没有（或规则有误）时返回 None，接受所有文件
+        """
+        try:
+            rule = self.get_rename_rule()
+        except ValueError:
+            return None
+        if rule is not None:
+            return lambda file_name: rule.regex.search(file_name) is not None
+        src_exts = self.get_selected_extensions()
+        if not src_exts:
+            return None
+        matcher = SuffixMatcher(src_exts)
+        return lambda file_name: matcher.match(file_name) is not None
+
+    def start_import(self, paths):
+        """在后台线程中展开拖入的文件和文件夹，按后缀（或规则）筛选，找到的文件逐批加入列表"""
+        self.cancel_import(discard=True)
+        self.selected_files = []
+        self.selected_folder = ""
+        self.dropped_paths = list(paths)
+        self.result_view.clear()
+        first = paths[0]
+        self.last_source_folder = first if os.path.isdir(first) else os.path.dirname(first)
+        max_depth = None if self.recursive_checkbox.isChecked() else 0
+        self.collector = FileCollector(paths, accept=self.import_filter(), max_depth=max_depth)
+        self.collector.files_found.connect(self.on_files_found)
+        self.collector.progress.connect(self.on_import_progress)
+        self.collector.collect_done.connect(self.on_import_finished)
+        self.set_busy(True)
+        self.cancel_import_button.show()
+        self.file_input.setText("正在导入拖入的文件...")
+        self.collector.start()
+
+    def cancel_import(self, discard=False):
+        """停止正在进行的导入（不等待线程结束）；discard 为 True 时（重新选择文件）丢弃它还没显示的结果"""
+        if self.collector is None:
+            return
+        if self.collector.isRunning():
+            # 不在界面线程中等待，导入线程在下一个目录项之前停止，结束后由 finished 信号处理
+            self.collector.cancel()
+            if discard:
+                self.keep_until_finished(self.collector)
+        if discard:
+            self.collector = None
+            self.set_busy(False)
+            self.cancel_import_button.hide()
+
+    def keep_until_finished(self, collector):
+        """丢弃仍在停止中的导入线程时保留它的引用，直到 finished，避免 QThread 在运行中被销毁"""
+        self.stopping_collectors.add(collector)
+        collector.finished.connect(lambda: self.stopping_collectors.discard(collector))
+        if collector.isFinished():
+            self.stopping_collectors.discard(collector)
+
+    # 取消后旧的导入线程已经发出、还在排队的信号不再处理
+    def on_files_found(self, file_paths):
+        if self.sender() is not self.collector:
+            return
+        self.selected_files.extend(file_paths)
+        self.result_view.add_results([{'file': file_path} for file_path in file_paths])
+
+    def on_import_progress(self, scanned, accepted):
+        if self.sender() is not self.collector:
+            return
+        self.file_input.setText(f"正在导入：已找到 {accepted} 个文件（已检查 {scanned} 个）...")
+
+    def on_import_finished(self, accepted, cancelled):
+        if self.sender() is not self.collector:
+            return
+        self.set_busy(False)
+        self.cancel_import_button.hide()
+        state = "已取消导入，保留" if cancelled else "已拖入"
+        self.file_input.setText(f"{state} {accepted} 个文件")
+
+    def get_file_source(self):
+        """返回待处理的文件：手动选择的文件列表，或遍历所选文件夹的生成器"""
+        if self.selected_folder:
+            max_depth = None if self.recursive_checkbox.isChecked() else 0
+            return iter_files(self.selected_folder, max_depth=max_depth)
+        return self.selected_files
+
+    def batch_params(self, src_exts, target_ext, output_folder, delete_original, dedup=None):
+        """用于识别同一批次的参数，续传时必须一致"""
+        if self.selected_folder:
+            source = {'folder': os.path.abspath(self.selected_folder),
+                      'recursive': self.recursive_checkbox.isChecked()}
+        else:
+            source = {'files': list(self.selected_files)}
+        params = dict(source, src_exts=list(src_exts), target_ext=target_ext,
+                      output_folder=os.path.abspath(output_folder) if output_folder else None,
+                      delete_original=delete_original, dedup=dedup)
+        if not src_exts:
+            # 规则重命名
+            params.update(pattern=self.pattern_input.text().strip(), template=self.template_input.text().strip(),
+                          case=self.case_combo.currentData(), counter_start=self.counter_start_spin.value())
+        return params
+
     def on_delete_checkbox_changed(self, state):
         if not getattr(self, '_initialized', False):
             return
@@ -231,62 +573,177 @@ class RenameToolUI(QWidget):
             if reply != QMessageBox.Yes:
                 self.delete_original_checkbox.setChecked(False)
 
-    def start_rename(self):
+    def get_rename_rule(self):
+        """填写了正则表达式或模板时返回编译好的 RenameRule，否则返回 None；规则有误时抛出 ValueError"""
+        pattern = self.pattern_input.text().strip()
+        template = self.template_input.text().strip()
+        if not pattern and not template:
+            return None
+        return RenameRule(pattern, template, self.case_combo.currentData(),
+                          start=self.counter_start_spin.value())
+
+    def get_rename_params(self):
+        """
+        检查输入，返回 (源后缀列表, 目标后缀, 输出文件夹, 是否删除原文件, 规则, 去重方式)，输入有误时提示并返回 None
+        填写了规则时源后缀列表为空、目标后缀为空字符串
+        """
+        # 检查是否有选择文件
+        if not self.selected_files and not self.selected_folder:
+            QMessageBox.warning(self, '错误', '请选择要重命名的文件！')
+            return None
+
         try:
-            # 检查是否有选择文件
-            if not hasattr(self, 'selected_files') or not self.selected_files:
-                QMessageBox.warning(self, '错误', '请选择要重命名的文件！')
-                return
+            rule = self.get_rename_rule()
+        except ValueError as e:
+            QMessageBox.warning(self, '错误', f'规则有误：{str(e)}')
+            return None
 
+        src_exts, target_ext = [], ''
+        if rule is None:
             # 获取源文件后缀列表
             src_exts = self.get_selected_extensions()
             if not src_exts:
                 QMessageBox.warning(self, '错误', '请选择或输入源文件后缀！')
-                return
+                return None
 
             # 获取目标后缀
             target_ext = self.get_target_extension()
             if not target_ext:
                 QMessageBox.warning(self, '错误', '请选择或输入目标文件后缀！')
+                return None
+
+        # 获取输出文件夹
+        output_folder = self.output_folder_input.text()
+        source_folders = [self.selected_folder] if self.selected_folder else [
+            path for path in self.dropped_paths if os.path.isdir(path)]
+        if not output_folder:
+            # 使用各文件各自所在的文件夹（选择文件夹和拖入时文件可能在不同的子文件夹中）
+            output_folder = None if self.selected_folder or self.dropped_paths else os.path.dirname(
+                self.selected_files[0])
+        elif not os.path.isdir(output_folder):
+            QMessageBox.warning(self, '错误', '目标文件夹不存在！')
+            return None
+        elif len(source_folders) == 1 and os.path.samefile(output_folder, source_folders[0]):
+            # 目标文件夹就是（唯一的）源文件夹时，在各文件所在的子文件夹中重命名
+            output_folder = None
+
+        # 获取删除原文件的选项
+        delete_original = self.delete_original_checkbox.isChecked()
+        dedup = self.dedup_combo.currentData() or None
+        return src_exts, target_ext, output_folder, delete_original, rule, dedup
+
+    def set_busy(self, busy):
+        self.preview_button.setEnabled(not busy)
+        self.rename_button.setEnabled(not busy)
+
+    def start_preview(self):
+        """生成重命名计划并在表格中显示每个文件的新文件名，不修改任何文件"""
+        try:
+            params = self.get_rename_params()
+            if params is None:
                 return
+            self.set_busy(True)
+            self.result_label.setText("正在生成重命名计划...")
+            self.result_view.clear()
+            self.worker = RenamePreviewWorker(self.get_file_source(), *params)
+            self.worker.results_ready.connect(self.result_view.add_results)
+            self.worker.plan_ready.connect(self.on_preview_finished)
+            self.worker.start()
 
-            # 获取输出文件夹
-            output_folder = self.output_folder_input.text()
-            if not output_folder:
-                # 使用源文件所在文件夹
-                output_folder = os.path.dirname(self.selected_files[0])
-            elif not os.path.isdir(output_folder):
-                QMessageBox.warning(self, '错误', '目标文件夹不存在！')
-                return
+        except Exception as e:
+            self.set_busy(False)
+            QMessageBox.critical(self, '错误', f'发生错误：{str(e)}')
 
-            # 获取删除原文件的选项
-            delete_original = self.delete_original_checkbox.isChecked()
+    def on_preview_finished(self, summary, error):
+        self.set_busy(False)
+        if error:
+            self.result_label.setText(f"生成重命名计划失败：{error}")
+            return
+        message = f"预览：将重命名 {summary['rename']}/{summary['total']} 个文件"
+        if summary['conflict']:
+            message += f"，{summary['conflict']} 个新文件名已被占用，改用加序号的文件名"
+        if summary['duplicate']:
+            message += f"，{summary['duplicate']} 个与已有文件内容相同，不再复制"
+        if summary['cycles']:
+            message += f"，{summary['cycles']} 组文件互换名字（经临时文件名完成）"
+        if summary['skipped']:
+            message += f"，跳过 {summary['skipped']} 个（后缀或规则不匹配）"
+        if summary['error']:
+            message += f"，{summary['error']} 个无法处理"
+        self.result_label.setText(message)
 
-            # 执行重命名
-            success_files, failed_files = batch_rename_files(
-                self.selected_files, src_exts, target_ext, output_folder, delete_original
+    def start_rename(self):
+        try:
+            params = self.get_rename_params()
+            if params is None:
+                return
+            src_exts, target_ext, output_folder, delete_original, rule, dedup = params
+
+            # 在后台线程中执行重命名，结果逐批显示在表格中
+            self.set_busy(True)
+            self.show_progress(True)
+            self.result_label.setText("正在重命名...")
+            if self.selected_folder:
+                self.result_view.clear()
+            else:
+                self.result_view.set_files(self.selected_files)
+            self.worker = RenameWorker(
+                self.get_file_source(), src_exts, target_ext, output_folder, delete_original,
+                self.batch_params(src_exts, target_ext, output_folder, delete_original, dedup),
+                self.resume_checkbox.isChecked(), rule, dedup
             )
+            self.worker.results_ready.connect(self.result_view.add_results)
+            self.worker.progress.connect(self.on_rename_progress)
+            self.worker.batch_done.connect(self.on_rename_finished)
+            self.worker.start()
 
-            # 显示结果
-            result_message = f"重命名完成！\n成功：{len(success_files)}/{len(self.selected_files)} 个文件"
-            if success_files:
-                result_message += "\n\n成功重命名的文件："
-                for old_path, new_path in success_files:
-                    result_message += f"\n{os.path.basename(old_path)} -> {os.path.basename(new_path)}"
-            
-            if failed_files:
-                result_message += "\n\n失败的文件："
-                for file_path, error in failed_files:
-                    result_message += f"\n{os.path.basename(file_path)}: {error}"
-
-            self.result_label.setText(result_message)
-            QMessageBox.information(self, '重命名结果', result_message)
-            
-            self.save_settings()  # 操作后也保存一次
-            
         except Exception as e:
+            self.set_busy(False)
+            self.show_progress(False)
             QMessageBox.critical(self, '错误', f'发生错误：{str(e)}')
 
+    def show_progress(self, running):
+        """显示或隐藏进度条和取消按钮"""
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(running)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setVisible(running)
+
+    def cancel_rename(self):
+        if isinstance(self.worker, RenameWorker) and self.worker.isRunning():
+            self.worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.result_label.setText("正在取消，等待正在复制的文件停止...")
+
+    def on_rename_progress(self, progress):
+        if not self.cancel_button.isEnabled():
+            return
+        if progress['percent'] is not None:
+            self.progress_bar.setValue(int(progress['percent'] * 10))
+        self.result_label.setText(f"正在重命名 {format_progress(progress)}")
+
+    def on_rename_finished(self, success_count, processed, failed_count, skipped_count, resumed, cancelled, error):
+        self.set_busy(False)
+        self.show_progress(False)
+        if cancelled:
+            result_message = (f"已取消！\n成功：{success_count} 个文件，"
+                              "其余文件没有处理，也没有留下不完整的副本\n"
+                              "勾选“断点续传”后再次开始，可以接着处理剩下的文件")
+        else:
+            result_message = f"重命名完成！\n成功：{success_count}/{processed} 个文件"
+        if resumed:
+            result_message += f"\n续传：跳过上次已完成的 {resumed} 个文件"
+        if skipped_count:
+            result_message += f"\n跳过：{skipped_count} 个文件（后缀或规则不匹配）"
+        if failed_count:
+            result_message += f"\n失败：{failed_count} 个文件，可在列表中按状态“失败”筛选查看原因"
+        if error:
+            result_message += f"\n\n重命名中断：{error}"
+
+        self.result_label.setText(result_message)
+        QMessageBox.information(self, '重命名结果', result_message)
+        self.save_settings()  # 操作后也保存一次
+
     def update_style(self):
         # 判断自定义源后缀
         if self.src_ext_input.text().strip():
@@ -307,3 +764,10 @@ class RenameToolUI(QWidget):
         else:
             self.target_ext_input.setStyleSheet("color: gray; background: #f0f0f0;")
             self.target_ext_combo.setStyleSheet("color: black;")
+
+        # 判断规则重命名
+        for rule_input in (self.pattern_input, self.template_input):
+            if rule_input.text().strip():
+                rule_input.setStyleSheet("color: black; background: #fffbe6;")
+            else:
+                rule_input.setStyleSheet("color: gray; background: #f0f0f0;")
@@ -0,0 +1,209 @@
+import os
+import re
+import time
+from 重命名计划 import build_plan
+from 重命名 import collect_results
+from 编码转换 import detect_encoding
+from 编码缓存 import open_cache, CACHE_FILE
+
+# 模板中的字段：{字段}、{字段:格式}、{字段|转换}、{字段:格式|转换|转换}，{{ 和 }} 表示花括号本身
+FIELD_PATTERN = re.compile(r'\{\{|\}\}|\{([^{}:|]+)(?::([^{}|]*))?((?:\|\w+)*)\}')
+# 默认的日期格式
+DEFAULT_DATE_FORMAT = '%Y%m%d'
+# 文件名中不能使用的字符（按 Windows 的规则），替换为下划线
+INVALID_NAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+# 大小写转换
+CASE_TRANSFORMS = {
+    'upper': str.upper,
+    'lower': str.lower,
+    'title': str.title,
+    'capitalize': str.capitalize,
+    'swapcase': str.swapcase,
+    'strip': str.strip,
+}
+
+class RenameRule:
+    """
+    正则表达式 + 模板的重命名规则，每批只编译一次
+    pattern 在文件名中查找（re.search），不匹配的文件跳过；匹配的文件按 template 生成新文件名
+    模板字段：
+        {0} {1} ... 正则的分组（0 为整个匹配），{分组名} 为命名分组
+        {name} 原文件名去掉扩展名，{ext} 原扩展名（含点号）
+        {n} 序号（按文件顺序，从 start 开始每次加 step）
+        {date} 文件修改日期，{today} 批次开始的日期，格式默认为 %Y%m%d，如 {date:%Y-%m-%d}
+        {encoding} 检测到的文件编码（使用 targets 的 cache_path 指定的编码检测缓存）
+    数字字段可以指定格式，如 {n:03}、{1:02}；字段后可以加 |upper |lower |title |capitalize |swapcase |strip
+    case 为整体的大小写转换，作用于新文件名中扩展名之前的部分
+    """
+
+    def __init__(self, pattern='', template='', case=None, ignore_case=True, start=1, step=1):
+        """
+        :param pattern: 正则表达式，为空时匹配所有文件
+        :param template: 新文件名模板，为空时为 {name}{ext}（只做大小写转换）
+        :raises ValueError: 正则表达式或模板有误
+        """
+        try:
+            self.regex = re.compile(pattern or '', re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            raise ValueError(f"正则表达式有误: {str(e)}")
+        if case and case not in CASE_TRANSFORMS:
+            raise ValueError(f"不支持的大小写转换: {case}")
+        self.template = template or '{name}{ext}'
+        self.case = CASE_TRANSFORMS[case] if case else None
+        self.start = start
+        self.step = step
+        self.today = time.localtime()
+        self._uses_encoding = False
+        self._cache = None      # {encoding} 字段使用的编码检测缓存，由 targets 设置
+        self.parts = self._compile(self.template)
+        # 字面文字合并成一个格式字符串，生成文件名时只调用各字段的取值函数再格式化一次
+        self._format = ''.join(
+            part.replace('{', '{{').replace('}', '}}') if isinstance(part, str) else '{}' for part in self.parts
+        )
+        self._getters = tuple(part for part in self.parts if not isinstance(part, str))
+
+    def _compile(self, template):
+        """把模板编译为 字符串 / 取值函数 的列表，取值函数的参数为 (匹配, 文件路径, 文件名, 序号)"""
+        parts = []
+        position = 0
+        for found in FIELD_PATTERN.finditer(template):
+            literal = template[position:found.start()]
+            position = found.end()
+            if found.group(0) in ('{{', '}}'):
+                literal += found.group(0)[0]
+            if literal:
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += literal
+                else:
+                    parts.append(literal)
+            if found.group(1) is None:
+                continue
+            parts.append(self._field(found.group(1).strip(), found.group(2), found.group(3)))
+        rest = template[position:]
+        if '{' in rest or '}' in rest:
+            raise ValueError(f"模板中的花括号不成对: {template}")
+        if rest:
+            parts.append(rest)
+        return parts
+
+    def _field(self, field, spec, transforms):
+        getter = self._getter(field, spec)
+        for transform in transforms.split('|')[1:]:
+            if transform not in CASE_TRANSFORMS:
+                raise ValueError(f"不支持的转换: |{transform}")
+            getter = _chain(getter, CASE_TRANSFORMS[transform])
+        return getter
+
+    def _getter(self, field, spec):
+        # isdecimal 而不是 isdigit：'²'、'①' 之类的字符 isdigit 为 True，却不能用 int 转换
+        if field.isdecimal():
+            group = int(field)
+            if group > self.regex.groups:
+                raise ValueError(f"正则表达式中没有第 {group} 个分组")
+            return _group_getter(group, spec)
+        if field in self.regex.groupindex:
+            return _group_getter(field, spec)
+        if field == 'name':
+            return lambda match, file_path, file_name, counter: split_ext(file_name)[0]
+        if field == 'ext':
+            return lambda match, file_path, file_name, counter: split_ext(file_name)[1]
+        if field == 'n':
+            spec = spec or ''
+            return lambda match, file_path, file_name, counter: format(counter, spec)
+        if field == 'date':
+            date_format = spec or DEFAULT_DATE_FORMAT
+            return lambda match, file_path, file_name, counter: time.strftime(
+                date_format, time.localtime(os.stat(file_path).st_mtime)
+            )
+        if field == 'today':
+            today = time.strftime(spec or DEFAULT_DATE_FORMAT, self.today)
+            return lambda match, file_path, file_name, counter: today
+        if field == 'encoding':
+            self._uses_encoding = True
+            return lambda match, file_path, file_name, counter: (
+                detect_encoding(file_path, cache=self._cache)[0] or 'unknown'
+            )
+        raise ValueError(f"模板中的字段不存在: {{{field}}}")
+
+    def new_name(self, file_path, counter=None):
+        """返回文件按规则生成的新文件名，不匹配或生成的文件名为空时返回 None"""
+        file_name = os.path.basename(file_path)
+        match = self.regex.search(file_name)
+        if match is None:
+            return None
+        return self._render(match, file_path, file_name, self.start if counter is None else counter)
+
+    def _render(self, match, file_path, file_name, counter):
+        name = self._format.format(*[getter(match, file_path, file_name, counter) for getter in self._getters])
+        name = INVALID_NAME_CHARS.sub('_', name).strip()
+        if self.case is not None:
+            base_name, ext = split_ext(name)
+            name = self.case(base_name) + ext
+        return name if name not in ('', '.', '..') else None
+
+    def targets(self, file_paths, output_folder=None, cache_path=CACHE_FILE):
+        """
+        逐个产出 重命名计划.build_plan 需要的 (源文件, 输出文件夹, 基本名, 后缀)，不匹配的文件输出文件夹为 None
+        :param cache_path: {encoding} 字段使用的编码检测缓存数据库路径，None 表示不使用缓存
+        """
+        if self._uses_encoding:
+            self._cache = open_cache(cache_path) if cache_path else None
+        search = self.regex.search
+        render = self._render
+        basename = os.path.basename
+        dirname = os.path.dirname
+        counter = self.start
+        step = self.step
+        for file_path in file_paths:
+            file_name = basename(file_path)
+            match = search(file_name)
+            try:
+                name = None if match is None else render(match, file_path, file_name, counter)
+            except Exception as e:
+                # 如 {date}、{encoding} 读取文件失败
+                yield file_path, None, f"生成新文件名失败: {str(e)}", None
+                continue
+            if name is None:
+                yield file_path, None, None, None
+                continue
+            counter += step
+            base_name, ext = split_ext(name)
+            yield file_path, output_folder or dirname(file_path), base_name, ext
+
+def split_ext(file_name):
+    """同 os.path.splitext，但只处理文件名（不含路径），在逐个文件的循环中更快"""
+    index = file_name.rfind('.')
+    # 没有点号，或者只有开头的点号（如 .bashrc）时没有扩展名
+    if index <= 0 or not file_name[:index].strip('.'):
+        return file_name, ''
+    return file_name[:index], file_name[index:]
+
+def _group_getter(group, spec):
+    if not spec:
+        return lambda match, file_path, file_name, counter: match.group(group) or ''
+
+    def getter(match, file_path, file_name, counter):
+        value = match.group(group) or ''
+        # 数字分组按数字格式化，如 {1:03} 把 7 变成 007
+        return format(int(value), spec) if value.isdecimal() else format(value, spec)
+    return getter
+
+def _chain(getter, transform):
+    return lambda match, file_path, file_name, counter: transform(getter(match, file_path, file_name, counter))
+
+def plan_rule_rename(file_paths, rule, output_folder=None, delete_original=False, dedup=None,
+                     cache_path=CACHE_FILE):
+    """
+    按规则生成重命名计划，返回 重命名计划.RenamePlan；dedup 同 重命名计划.build_plan
+    :param cache_path: 内容哈希缓存（去重）和 {encoding} 字段的编码检测缓存所在的数据库路径，None 表示都不缓存
+    """
+    return build_plan(rule.targets(file_paths, output_folder, cache_path), delete_original, dedup, cache_path)
+
+def rule_rename_files(file_paths, rule, output_folder=None, delete_original=False, timings=None, dedup=None):
+    """
+    按规则批量重命名文件，其余参数和返回值同 重命名.batch_rename_files
+    :param rule: RenameRule
+    """
+    plan = plan_rule_rename(file_paths, rule, output_folder, delete_original, dedup)
+    return collect_results(plan.apply(), timings)
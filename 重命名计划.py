@@ -0,0 +1,461 @@
+import os
+import time
+import queue
+import threading
+from 重命名 import (
+    SuffixMatcher, suffix_base_name, copy_file, METHOD_RENAME, METHOD_DRY_RUN, METHOD_DUPLICATE
+)
+from 日志 import log_operation
+from 进度 import Cancelled
+from 编码缓存 import CACHE_FILE
+from 去重 import DEDUP_LINK, open_hash_cache, same_content, link_duplicate
+from 断点续传 import CYCLE_TEMP_SUFFIX
+
+# 多线程执行时，结果队列已满的工作线程每隔这么多秒检查一次消费方是否已停止
+STOP_POLL_INTERVAL = 0.1
+
+# 计划中每个源文件的状态
+PLAN_RENAME = 0     # 按期望的文件名重命名
+PLAN_CONFLICT = 1   # 期望的文件名已被占用，改用加序号的文件名
+PLAN_SKIPPED = 2    # 没有匹配的后缀（或规则），或删除原文件时新文件名与源文件相同，不处理
+PLAN_ERROR = 3      # 无法处理（如源文件不存在）
+PLAN_DUPLICATE = 4  # 期望的文件名已被内容相同的文件占用（去重模式），不再复制
+
+class RenamePlan:
+    """
+    完整的批量重命名计划：先在内存中算出所有 旧文件 -> 新文件，可以预览，再一次性执行
+    files / outputs / states 为按输入顺序排列的源文件、新文件（跳过或出错时为 None）和状态
+    删除原文件时，新文件名可以使用本批次中会被移走的源文件的名字，此时按依赖顺序执行；
+    形成循环的（如 a -> b、b -> a）先把其中一个源文件改成临时名字，cycles 为循环个数
+    去重模式下内容重复的文件，新文件即为占用该文件名的已有文件
+    """
+
+    def __init__(self, delete_original=False, dedup=None, cache_path=CACHE_FILE):
+        """
+        :param dedup: 去重方式（去重.DEDUP_SKIP / DEDUP_LINK），None 表示不去重
+        :param cache_path: 内容哈希缓存数据库路径，None 表示每次都重新计算哈希
+        """
+        self.delete_original = delete_original
+        self.dedup = dedup
+        self.hash_cache = open_hash_cache(cache_path) if dedup and cache_path else None
+        self.files = []
+        self.outputs = []
+        self.states = []
+        self.errors = {}    # 下标 -> 错误信息
+        self.chains = []    # 必须依次执行的步骤列表 [(下标, 源路径, 目标路径), ...]
+        self.singles = []   # 不依赖其他文件、也不被其他文件依赖的下标
+        self.cycles = 0
+        self.journal = None
+        self._devices = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def summary(self):
+        """返回计划统计 {'total', 'rename', 'conflict', 'duplicate', 'skipped', 'error', 'cycles'}"""
+        counts = [0, 0, 0, 0, 0]
+        for state in self.states:
+            counts[state] += 1
+        return {
+            'total': len(self.files),
+            'rename': counts[PLAN_RENAME] + counts[PLAN_CONFLICT],
+            'conflict': counts[PLAN_CONFLICT],
+            'duplicate': counts[PLAN_DUPLICATE],
+            'skipped': counts[PLAN_SKIPPED],
+            'error': counts[PLAN_ERROR],
+            'cycles': self.cycles,
+        }
+
+    def preview(self):
+        """逐个产出预览行 {'file', 'output', 'skipped', 'conflict', 'duplicate', 'error'}，可直接放入结果表格"""
+        for index, file_path in enumerate(self.files):
+            state = self.states[index]
+            yield {
+                'file': file_path,
+                'output': self.outputs[index],
+                'skipped': state == PLAN_SKIPPED,
+                'conflict': state == PLAN_CONFLICT,
+                'duplicate': state == PLAN_DUPLICATE,
+                'error': self.errors.get(index),
+            }
+
+    def apply(self, dry_run=False, workers=1, cancel=None, journal=None):
+        """
+        执行计划，按完成顺序产出结果字典
+        {'file', 'success', 'skipped', 'output', 'method', 'bytes', 'seconds', 'cancelled', 'error'}，
+        跳过的文件 skipped 为 True；删除原文件失败时 output 和 error 都有值
+        每一步执行前确认目标文件不存在（计划之后才出现的同名文件不会被覆盖）；
+        内容重复的文件执行前再次确认目标文件内容仍然相同，之后不复制（删除原文件时直接删除源文件），
+        DEDUP_LINK 时把目标文件换成源文件的硬链接，结果的 method 为 METHOD_DUPLICATE 或 METHOD_HARDLINK
+        :param dry_run: 不操作文件系统，只按计划产出结果
+        :param workers: 线程数；互相依赖的文件总在同一线程中依次执行
+        :param cancel: 进度.CancelToken；取消后不再开始新的文件，正在复制的文件在块之间停止（结果的
+                       cancelled 为 True，不留下副本）。互相依赖的一组文件（含循环改名）开始后总是执行完，
+                       不会停在临时文件名上
+        :param journal: 断点续传.BatchJournal；循环改名把源文件改成临时名字前先在日志中记录临时文件名，
+                        进程崩溃后续传时可以完成或撤回
+        消费方提前停止迭代（break、出错或关闭生成器）时不再开始新的文件，已开始的一组文件执行完后才返回
+        """
+        self.journal = journal
+        for index, state in enumerate(self.states):
+            if state == PLAN_SKIPPED or state == PLAN_ERROR:
+                result = _new_result(self.files[index])
+                result['skipped'] = state == PLAN_SKIPPED
+                result['error'] = self.errors.get(index)
+                yield result
+        tasks = [chain for chain in self.chains]
+        tasks.extend(self.singles)
+        if workers <= 1:
+            for task in tasks:
+                if cancel is not None and cancel.cancelled:
+                    return
+                steps = self._run_task(task, dry_run, cancel)
+                try:
+                    # 不用 yield from：关闭本生成器时不能连带关闭 steps
+                    for result in steps:
+                        yield result
+                finally:
+                    # 消费方在一组文件中途停止时把剩下的步骤执行完，不停在临时文件名上
+                    for _ in steps:
+                        pass
+            return
+
+        finished = object()
+        results = queue.Queue(maxsize=1024)
+        stop = threading.Event()
+        shards = [[] for _ in range(workers)]
+        for task in tasks:
+            # 同一输出文件夹的文件尽量由同一线程处理
+            target = task[0][2] if isinstance(task, list) else self.outputs[task]
+            shards[hash(os.path.dirname(target)) % workers].append(task)
+
+        def put(item):
+            # 消费方处理较慢时在这里等待；消费方已停止时放弃
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=STOP_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    pass
+
+        def work(shard):
+            try:
+                for task in shard:
+                    if stop.is_set() or cancel is not None and cancel.cancelled:
+                        break
+                    # 消费方已停止时结果不再交出，但已开始的一组文件仍然执行完
+                    for result in self._run_task(task, dry_run, cancel):
+                        put(result)
+            finally:
+                put(finished)
+
+        threads = [threading.Thread(target=work, args=(shard,), daemon=True) for shard in shards]
+        for thread in threads:
+            thread.start()
+        try:
+            remaining = workers
+            while remaining:
+                result = results.get()
+                if result is finished:
+                    remaining -= 1
+                else:
+                    yield result
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _run_task(self, task, dry_run, cancel=None):
+        if not isinstance(task, list):
+            yield self._move(task, self.files[task], self.outputs[task], dry_run, cancel)
+            return
+        failed = set()
+        for index, src, dst in task:
+            if index in failed:
+                continue
+            if dst == self.outputs[index]:
+                yield self._move(index, src, dst, dry_run)
+                continue
+            # 循环中的第一个文件先改成临时名字
+            if dry_run:
+                continue
+            try:
+                if self.journal is not None:
+                    self.journal.record_temp(src, dst, self.outputs[index])
+                os.replace(src, dst)
+            except OSError as e:
+                failed.add(index)
+                result = _new_result(self.files[index])
+                result['error'] = f"改为临时文件名失败: {str(e)}"
+                yield result
+
+    def _device(self, folder):
+        device = self._devices.get(folder)
+        if device is None:
+            device = os.stat(folder or '.').st_dev
+            self._devices[folder] = device
+        return device
+
+    def _move(self, index, src, dst, dry_run, cancel=None):
+        result = _new_result(self.files[index])
+        start = time.perf_counter()
+        try:
+            if dry_run:
+                result['method'] = METHOD_DRY_RUN
+            elif self.states[index] == PLAN_DUPLICATE:
+                result['bytes'] = os.path.getsize(src)
+                result['method'] = self._dedup(src, dst, result)
+            else:
+                st = os.stat(src)
+                result['bytes'] = st.st_size
+                # 删除原文件且只改大小写时（不区分大小写的系统上）目标路径就是源文件本身
+                case_only = self.delete_original and (
+                    os.path.normcase(os.path.abspath(src)) == os.path.normcase(os.path.abspath(dst)))
+                if not case_only and os.path.lexists(dst):
+                    raise FileExistsError(f"目标文件已存在: {dst}")
+                if case_only or self.delete_original and st.st_dev == self._device(os.path.dirname(dst)):
+                    # 同一文件系统内只修改元数据
+                    os.replace(src, dst)
+                    result['method'] = METHOD_RENAME
+                else:
+                    # 要删除原文件时，副本写盘后才删除
+                    result['method'] = copy_file(src, dst, durable=self.delete_original, cancel=cancel)
+                    if self.delete_original:
+                        try:
+                            os.remove(src)
+                        except Exception as e:
+                            result['error'] = f"删除原文件失败: {str(e)}"
+            result['output'] = dst
+            result['success'] = result['error'] is None
+        except Cancelled as e:
+            result['error'] = str(e)
+            result['cancelled'] = True
+        except Exception as e:
+            result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        log_operation('rename', result)
+        return result
+
+    def _dedup(self, src, dst, result):
+        """处理内容重复的文件，返回落地方式；删除原文件失败时记录在 result 中"""
+        # 计划之后目标文件被改动过时不再视为重复，也不覆盖它
+        if not same_content(src, dst, self.hash_cache):
+            raise FileExistsError(f"目标文件已存在且内容与源文件不同: {dst}")
+        if self.delete_original:
+            # 内容已在目标文件中，源文件直接删除
+            try:
+                os.remove(src)
+            except Exception as e:
+                result['error'] = f"删除原文件失败: {str(e)}"
+            return METHOD_DUPLICATE
+        if self.dedup == DEDUP_LINK:
+            return link_duplicate(src, dst)
+        return METHOD_DUPLICATE
+
+    def is_duplicate(self, file_path, existing_path):
+        """去重模式下判断已有文件与源文件内容是否相同，无法读取时视为不同"""
+        if not self.dedup:
+            return False
+        try:
+            return same_content(file_path, existing_path, self.hash_cache)
+        except OSError:
+            return False
+
+def _new_result(file_path):
+    return {
+        'file': file_path,
+        'success': False,
+        'skipped': False,
+        'output': None,
+        'method': None,
+        'bytes': 0,
+        'seconds': 0.0,
+        'cancelled': False,
+        'error': None,
+    }
+
+def plan_rename(file_paths, src_exts, target_ext, output_folder=None, delete_original=False, dedup=None,
+                cache_path=CACHE_FILE):
+    """
+    为批量修改后缀生成重命名计划，参数同 重命名.batch_rename_files，cache_path 同 build_plan
+    :return: RenamePlan
+    """
+    matcher = src_exts if isinstance(src_exts, SuffixMatcher) else SuffixMatcher(src_exts)
+    target_ext = target_ext if target_ext.startswith('.') else f'.{target_ext}'
+
+    def targets():
+        for file_path in file_paths:
+            base_name = suffix_base_name(os.path.basename(file_path), matcher, target_ext)
+            if base_name is None:
+                yield file_path, None, None, None
+            else:
+                yield file_path, output_folder or os.path.dirname(file_path), base_name, target_ext
+
+    return build_plan(targets(), delete_original, dedup, cache_path)
+
+def build_plan(targets, delete_original=False, dedup=None, cache_path=CACHE_FILE):
+    """
+    由期望的新文件名生成重命名计划
+    每个输出文件夹只用 os.scandir 扫描一次，之后的判断都在内存中完成
+    :param targets: (源文件, 输出文件夹, 基本名, 后缀) 的可迭代对象，输出文件夹为 None 表示跳过该文件
+                    （此时基本名不为空则表示无法处理该文件，基本名为错误信息）；
+                    期望的新文件名已被占用时改为 基本名_1 + 后缀、基本名_2 + 后缀 ...
+    :param delete_original: 是否移走源文件；为 True 时本批次源文件的名字可以被其他文件使用，
+                            新文件名与源文件相同的文件跳过
+    :param dedup: 去重方式（去重.DEDUP_SKIP / DEDUP_LINK）：期望的新文件名已被已有文件占用时，与已有的
+                  基本名 + 后缀、基本名_1 + 后缀 ... 逐个先比较大小、再比较内容哈希，内容相同的不再改用加序号的
+                  文件名，而是作为重复文件跳过（或建立硬链接）；只与输出文件夹中已有的文件比较，
+                  不比较本批次中的其他源文件
+    :param cache_path: 内容哈希缓存数据库路径，以文件身份为键，重复运行时不必重新计算；None 表示不缓存
+    """
+    plan = RenamePlan(delete_original, dedup, cache_path)
+    folder_keys = {}   # 文件夹 -> 规范化的绝对路径
+    snapshots = {}     # 规范化的文件夹 -> 其中的文件名集合（规范化）
+
+    def folder_key(folder):
+        key = folder_keys.get(folder)
+        if key is None:
+            key = os.path.normcase(os.path.abspath(folder))
+            folder_keys[folder] = key
+        return key
+
+    def snapshot(key):
+        names = snapshots.get(key)
+        if names is None:
+            names = set()
+            try:
+                with os.scandir(key) as entries:
+                    for entry in entries:
+                        names.add(os.path.normcase(entry.name))
+            except OSError:
+                pass
+            snapshots[key] = names
+        return names
+
+    # 第一遍：确认源文件存在，记录会被移走的源文件
+    wanted = []        # (下标, 输出文件夹, 基本名, 后缀)
+    vacating = {}      # (文件夹, 文件名) -> 下标，删除原文件时这些名字会被腾出
+    for index, (file_path, folder, base_name, ext) in enumerate(targets):
+        plan.files.append(file_path)
+        plan.outputs.append(None)
+        if folder is None:
+            if base_name:
+                plan.states.append(PLAN_ERROR)
+                plan.errors[index] = base_name
+            else:
+                plan.states.append(PLAN_SKIPPED)
+            continue
+        source_dir, source_name = os.path.split(file_path)
+        source_key = (folder_key(source_dir), os.path.normcase(source_name))
+        if source_key[1] not in snapshot(source_key[0]):
+            plan.states.append(PLAN_ERROR)
+            plan.errors[index] = "文件不存在"
+            continue
+        if delete_original and folder_key(folder) == source_key[0] and f"{base_name}{ext}" == source_name:
+            # 新文件名就是源文件名，不需要改动
+            plan.states.append(PLAN_SKIPPED)
+            continue
+        plan.states.append(PLAN_RENAME)
+        wanted.append((index, folder, base_name, ext))
+        if delete_original:
+            vacating[source_key] = index
+
+    existing = {}      # (文件夹, 基本名, 后缀) -> 已有的 基本名+后缀、基本名_1+后缀 ... 的路径（去重时使用）
+
+    def occupants(key, names, folder, base_name, ext):
+        """返回输出文件夹中已有的、序号连续的同名文件（以前运行时分配的文件名），不含本批次会移走的源文件"""
+        paths = existing.get((key, base_name, ext))
+        if paths is None:
+            paths = []
+            name = f"{base_name}{ext}"
+            counter = 1
+            while os.path.normcase(name) in names:
+                if (key, os.path.normcase(name)) not in vacating:
+                    paths.append(os.path.join(folder, name))
+                name = f"{base_name}_{counter}{ext}"
+                counter += 1
+            existing[(key, base_name, ext)] = paths
+        return paths
+
+    # 第二遍：分配不冲突的新文件名，记录依赖（新文件名是另一个待移走的源文件）
+    claimed = set()
+    counters = {}
+    depends_on = {}    # 下标 -> 必须先移走的源文件的下标
+    for index, folder, base_name, ext in wanted:
+        key = folder_key(folder)
+        names = snapshot(key)
+        name = f"{base_name}{ext}"
+        name_key = (key, os.path.normcase(name))
+        if name_key in claimed or (name_key[1] in names and name_key not in vacating):
+            duplicate = None
+            if dedup:
+                for existing_path in occupants(key, names, folder, base_name, ext):
+                    if plan.is_duplicate(plan.files[index], existing_path):
+                        duplicate = existing_path
+                        break
+            if duplicate is not None:
+                plan.states[index] = PLAN_DUPLICATE
+                plan.outputs[index] = duplicate
+                continue
+            counter = counters.get((key, base_name, ext), 1)
+            while True:
+                name = f"{base_name}_{counter}{ext}"
+                name_key = (key, os.path.normcase(name))
+                counter += 1
+                if name_key not in claimed and (name_key[1] not in names or name_key in vacating):
+                    break
+            counters[(key, base_name, ext)] = counter
+            plan.states[index] = PLAN_CONFLICT
+        claimed.add(name_key)
+        plan.outputs[index] = os.path.join(folder, name)
+        blocker = vacating.get(name_key)
+        if blocker is not None and blocker != index:
+            depends_on[index] = blocker
+
+    _order(plan, [index for index, _, _, _ in wanted], depends_on)
+    return plan
+
+def _order(plan, indexes, depends_on):
+    """
+    按依赖排出执行顺序：每个文件最多依赖一个文件、最多被一个文件依赖，依赖关系只会形成链或环
+    链从最末端开始执行；环先把第一个文件改成临时名字，其余依次执行后再从临时名字改为新文件名
+    """
+    depended = set(depends_on.values())
+    chain_of = {}   # 下标 -> 所在的步骤列表
+    temp_suffix = f".{os.getpid()}{CYCLE_TEMP_SUFFIX}"
+    for start in indexes:
+        if start in chain_of:
+            continue
+        if start not in depends_on and start not in depended:
+            plan.singles.append(start)
+            continue
+        path = []
+        positions = {}
+        node = start
+        while node is not None and node not in chain_of and node not in positions:
+            positions[node] = len(path)
+            path.append(node)
+            node = depends_on.get(node)
+        steps = []
+        rest = path
+        if node is not None and node in positions:
+            cycle = path[positions[node]:]
+            rest = path[:positions[node]]
+            head = cycle[0]
+            temp_path = plan.files[head] + temp_suffix
+            steps.append((head, plan.files[head], temp_path))
+            for member in reversed(cycle[1:]):
+                steps.append((member, plan.files[member], plan.outputs[member]))
+            steps.append((head, temp_path, plan.outputs[head]))
+            plan.cycles += 1
+        for member in reversed(rest):
+            steps.append((member, plan.files[member], plan.outputs[member]))
+        if node is not None and node in chain_of:
+            # 依赖的文件已在之前的链中，接在那条链的末尾执行
+            chain = chain_of[node]
+            chain.extend(steps)
+        else:
+            chain = steps
+            plan.chains.append(chain)
+        for member in path:
+            chain_of[member] = chain